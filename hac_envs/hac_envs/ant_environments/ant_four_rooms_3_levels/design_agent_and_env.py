@@ -97,6 +97,15 @@ def design_agent_and_env(FLAGS):
     # a = np.concatenate((sim.data.qpos[:2], np.array([4 if sim.data.qvel[i] > 4 else -4 if sim.data.qvel[i] < -4 else sim.data.qvel[i] for i in range(3)])))
     project_state_to_subgoal = lambda sim, state: np.concatenate((sim.data.qpos[:2], np.array([1 if sim.data.qpos[2] > 1 else sim.data.qpos[2]]), np.array([3 if sim.data.qvel[i] > 3 else -3 if sim.data.qvel[i] < -3 else sim.data.qvel[i] for i in range(2)])))
 
+    # Batched versions of the projection functions which map states of shape (N, state_dim) to end goals and subgoals without accessing the simulation.  The state consists of the joint positions followed by the joint velocities.  End goals are written into out if it is given.
+    n_qpos = len(initial_joint_ranges)
+    def project_states_to_end_goals(states, out=None):
+        if out is None:
+            return states[:, :3]
+        out[:] = states[:, :3]
+        return out
+    project_states_to_subgoals = lambda states: np.concatenate((states[:, :2], np.minimum(states[:, 2:3], max_height), np.clip(states[:, n_qpos:n_qpos + 2], -max_velo, max_velo)), axis=1)
+
 
     # Set subgoal achievement thresholds
     velo_threshold = 0.8
@@ -145,6 +154,6 @@ def design_agent_and_env(FLAGS):
 
 
     # Instantiate and return environment
-    env = Environment(model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions, timesteps_per_action, FLAGS.show)
+    env = Environment(model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions, timesteps_per_action, FLAGS.show, project_states_to_end_goals, project_states_to_subgoals)
 
     return env
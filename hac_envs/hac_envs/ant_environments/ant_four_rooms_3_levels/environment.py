@@ -1,19 +1,24 @@
 import os
-from tkinter import *
-from tkinter import ttk
-import time
 import numpy as np
-from mujoco_py import load_model_from_path, MjSim, MjViewer
+from mujoco_py import MjSim
+
+from ... import model_cache, ur5_kinematics
+from ...reset_engine import sample_initial_states
 
 class Environment():
 
-    def __init__(self, model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions = 1200, num_frames_skip = 10, show = False):
+    def __init__(self, model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions = 1200, num_frames_skip = 10, show = False, project_states_to_end_goals = None, project_states_to_subgoals = None):
 
         self.name = model_name
 
-        # Create Mujoco Simulation
-        self.model = load_model_from_path(os.path.join(os.path.dirname(__file__), "mujoco_files", model_name))
+        # Create Mujoco Simulation. The compiled model is cached and shared by
+        # all environments in this process, apart from visualized ones which
+        # change site colors when displaying subgoals (see use_private_model).
+        self._model_path = os.path.join(os.path.dirname(__file__), "mujoco_files", model_name)
+        self.shared_model = not show
+        self.model = model_cache.load_model(self._model_path, shared = self.shared_model)
         self.sim = MjSim(self.model)
+        self._displayed_subgoals = None
 
         # Set dimensions and ranges of states, actions, and goals in order to configure actor/critic networks
         if model_name == "pendulum.xml":
@@ -31,6 +36,10 @@ class Environment():
         self.project_state_to_end_goal = project_state_to_end_goal
         self.project_state_to_subgoal = project_state_to_subgoal
 
+        # Optional batched projection functions mapping states of shape (N, state_dim) without accessing the simulation, project_states_to_end_goals writes into its optional argument out if given
+        self.project_states_to_end_goals = project_states_to_end_goals
+        self.project_states_to_subgoals = project_states_to_subgoals
+
 
         # Convert subgoal bounds to symmetric bounds and offset.  Need these to properly configure subgoal actor networks
         self.subgoal_bounds_symmetric = np.zeros((len(self.subgoal_bounds)))
@@ -53,101 +62,61 @@ class Environment():
 
         self.max_actions = max_actions
 
+        # Number of candidate end goals drawn at once when rejection sampling UR5 goals
+        self.goal_candidates_per_draw = 32
+
         # Implement visualization if necessary
         self.visualize = show  # Visualization boolean
         if self.visualize:
+            # imported here to keep rendering dependencies off the headless path
+            from mujoco_py import MjViewer
             self.viewer = MjViewer(self.sim)
         self.num_frames_skip = num_frames_skip
 
+        # In headless mode, goal and subgoal markers are not updated
+        self.headless = False
 
-    # Get state, which concatenates joint positions and velocities
-    def get_state(self):
 
+    # Get state, which concatenates joint positions and velocities. If out is
+    # given, the state is written into it instead of a newly allocated array.
+    def get_state(self, out = None):
+
+        if out is None:
+            if self.name == "pendulum.xml":
+                return np.concatenate([np.cos(self.sim.data.qpos),np.sin(self.sim.data.qpos),
+                                   self.sim.data.qvel])
+            else:
+                return np.concatenate((self.sim.data.qpos, self.sim.data.qvel))
+
+        qpos = self.sim.data.qpos
+        n_qpos = len(qpos)
         if self.name == "pendulum.xml":
-            return np.concatenate([np.cos(self.sim.data.qpos),np.sin(self.sim.data.qpos),
-                               self.sim.data.qvel])
+            np.cos(qpos, out=out[:n_qpos])
+            np.sin(qpos, out=out[n_qpos:2*n_qpos])
+            out[2*n_qpos:] = self.sim.data.qvel
         else:
-            return np.concatenate((self.sim.data.qpos, self.sim.data.qvel))
+            out[:n_qpos] = qpos
+            out[n_qpos:] = self.sim.data.qvel
+        return out
 
-    # Reset simulation to state within initial state specified by user
-    def reset_sim(self, next_goal = None):
+    # Reset simulation to state within initial state specified by user. The
+    # initial state (joint positions and velocities) can also be passed
+    # directly, e.g. when drawn from a pool by ResetEngine.
+    def reset_sim(self, next_goal = None, initial_state = None):
 
         # Reset controls
         self.sim.data.ctrl[:] = 0
 
-        if self.name == "ant_reacher.xml":
-            while True:
-                # Reset joint positions and velocities
-                for i in range(len(self.sim.data.qpos)):
-                    self.sim.data.qpos[i] = np.random.uniform(self.initial_state_space[i][0],self.initial_state_space[i][1])
-
-                for i in range(len(self.sim.data.qvel)):
-                    self.sim.data.qvel[i] = np.random.uniform(self.initial_state_space[len(self.sim.data.qpos) + i][0],self.initial_state_space[len(self.sim.data.qpos) + i][1])
-
-                # Ensure initial ant position is more than min_dist away from goal
-                min_dist = 8
-                if np.linalg.norm(next_goal[:2] - self.sim.data.qpos[:2]) > min_dist:
-                    break
-
-        elif self.name == "ant_four_rooms.xml":
-
-            # Choose initial start state to be different than room containing the end goal
-
-            # Determine which of four rooms contains goal
-            goal_room = 0
-
-            if next_goal[0] < 0 and next_goal[1] > 0:
-                goal_room = 1
-            elif next_goal[0] < 0 and next_goal[1] < 0:
-                goal_room = 2
-            elif next_goal[0] > 0 and next_goal[1] < 0:
-                goal_room = 3
-
-
-            # Place ant in room different than room containing goal
-            # initial_room = (goal_room + 2) % 4
-
-
-            initial_room = np.random.randint(0,4)
-            while initial_room == goal_room:
-                initial_room = np.random.randint(0,4)
-
-
-            # Set initial joint positions and velocities
-            for i in range(len(self.sim.data.qpos)):
-                self.sim.data.qpos[i] = np.random.uniform(self.initial_state_space[i][0],self.initial_state_space[i][1])
+        # Draw joint positions and velocities in one call. For the ant tasks,
+        # the initial position depends on the goal (minimum distance for
+        # ant reacher, different room for ant four rooms).
+        if initial_state is None:
+            end_goals = None if next_goal is None else np.atleast_2d(next_goal)
+            initial_state = sample_initial_states(self, 1, end_goals)[0]
 
-            for i in range(len(self.sim.data.qvel)):
-                self.sim.data.qvel[i] = np.random.uniform(self.initial_state_space[len(self.sim.data.qpos) + i][0],self.initial_state_space[len(self.sim.data.qpos) + i][1])
-
-            # Move ant to correct room
-            self.sim.data.qpos[0] = np.random.uniform(3,6.5)
-            self.sim.data.qpos[1] = np.random.uniform(3,6.5)
-
-            # If goal should be in top left quadrant
-            if initial_room == 1:
-                self.sim.data.qpos[0] *= -1
-
-            # Else if goal should be in bottom left quadrant
-            elif initial_room == 2:
-                self.sim.data.qpos[0] *= -1
-                self.sim.data.qpos[1] *= -1
-
-            # Else if goal should be in bottom right quadrant
-            elif initial_room == 3:
-                self.sim.data.qpos[1] *= -1
-
-            # print("Goal Room: %d" % goal_room)
-            # print("Initial Ant Room: %d" % initial_room)
-
-        else:
-
-            # Reset joint positions and velocities
-            for i in range(len(self.sim.data.qpos)):
-                self.sim.data.qpos[i] = np.random.uniform(self.initial_state_space[i][0],self.initial_state_space[i][1])
-
-            for i in range(len(self.sim.data.qvel)):
-                self.sim.data.qvel[i] = np.random.uniform(self.initial_state_space[len(self.sim.data.qpos) + i][0],self.initial_state_space[len(self.sim.data.qpos) + i][1])
+        n_qpos = len(self.sim.data.qpos)
+        self.sim.data.qpos[:] = initial_state[:n_qpos]
+        self.sim.data.qvel[:] = initial_state[n_qpos:]
 
         self.sim.step()
 
@@ -155,61 +124,33 @@ class Environment():
         return self.get_state()
 
     # Execute low-level action for number of frames specified by num_frames_skip
-    def execute_action(self, action):
+    def execute_action(self, action, out = None):
 
         self.sim.data.ctrl[:] = action
-        for _ in range(self.num_frames_skip):
-            self.sim.step()
-            if self.visualize:
+        if self.visualize:
+            for _ in range(self.num_frames_skip):
+                self.sim.step()
                 self.viewer.render()
+        else:
+            for _ in range(self.num_frames_skip):
+                self.sim.step()
 
-        return self.get_state()
+        return self.get_state(out)
 
 
     # Visualize end goal.  This function may need to be adjusted for new environments.
     def display_end_goal(self,end_goal):
 
+        if self.headless:
+            return
+
         # Goal can be visualized by changing the location of the relevant site object.
         if self.name == "pendulum.xml":
             self.sim.data.mocap_pos[0] = np.array([0.5*np.sin(end_goal[0]),0,0.5*np.cos(end_goal[0])+0.6])
         elif self.name == "ur5.xml":
 
-            theta_1 = end_goal[0]
-            theta_2 = end_goal[1]
-            theta_3 = end_goal[2]
-
-            # shoulder_pos_1 = np.array([0,0,0,1])
-            upper_arm_pos_2 = np.array([0,0.13585,0,1])
-            forearm_pos_3 = np.array([0.425,0,0,1])
-            wrist_1_pos_4 = np.array([0.39225,-0.1197,0,1])
-
-
-            # Transformation matrix from shoulder to base reference frame
-            T_1_0 = np.array([[1,0,0,0],[0,1,0,0],[0,0,1,0.089159],[0,0,0,1]])
-
-            # Transformation matrix from upper arm to shoulder reference frame
-            T_2_1 = np.array([[np.cos(theta_1), -np.sin(theta_1), 0, 0],[np.sin(theta_1), np.cos(theta_1), 0, 0],[0,0,1,0],[0,0,0,1]])
-
-            # Transformation matrix from forearm to upper arm reference frame
-            T_3_2 = np.array([[np.cos(theta_2),0,np.sin(theta_2),0],[0,1,0,0.13585],[-np.sin(theta_2),0,np.cos(theta_2),0],[0,0,0,1]])
-
-            # Transformation matrix from wrist 1 to forearm reference frame
-            T_4_3 = np.array([[np.cos(theta_3),0,np.sin(theta_3),0.425],[0,1,0,0],[-np.sin(theta_3),0,np.cos(theta_3),0],[0,0,0,1]])
-
-            # Determine joint position relative to original reference frame
-            # shoulder_pos = T_1_0.dot(shoulder_pos_1)
-            upper_arm_pos = T_1_0.dot(T_2_1).dot(upper_arm_pos_2)[:3]
-            forearm_pos = T_1_0.dot(T_2_1).dot(T_3_2).dot(forearm_pos_3)[:3]
-            wrist_1_pos = T_1_0.dot(T_2_1).dot(T_3_2).dot(T_4_3).dot(wrist_1_pos_4)[:3]
-
-            joint_pos = [upper_arm_pos, forearm_pos, wrist_1_pos]
-
-            """
-            print("\nEnd Goal Joint Pos: ")
-            print("Upper Arm Pos: ", joint_pos[0])
-            print("Forearm Pos: ", joint_pos[1])
-            print("Wrist Pos: ", joint_pos[2])
-            """
+            # Determine joint positions relative to base reference frame
+            joint_pos = ur5_kinematics.joint_positions(end_goal)[0]
 
             for i in range(3):
                 self.sim.data.mocap_pos[i] = joint_pos[i]
@@ -228,43 +169,14 @@ class Environment():
 
         if self.name == "ur5.xml":
 
-            goal_possible = False
-            while not goal_possible:
-                end_goal = np.zeros(shape=(self.end_goal_dim,))
-                end_goal[0] = np.random.uniform(self.goal_space_test[0][0],self.goal_space_test[0][1])
-
-                end_goal[1] = np.random.uniform(self.goal_space_test[1][0],self.goal_space_test[1][1])
-                end_goal[2] = np.random.uniform(self.goal_space_test[2][0],self.goal_space_test[2][1])
-
-                # Next need to ensure chosen joint angles result in achievable task (i.e., desired end effector position is above ground)
-
-                theta_1 = end_goal[0]
-                theta_2 = end_goal[1]
-                theta_3 = end_goal[2]
-
-                # shoulder_pos_1 = np.array([0,0,0,1])
-                upper_arm_pos_2 = np.array([0,0.13585,0,1])
-                forearm_pos_3 = np.array([0.425,0,0,1])
-                wrist_1_pos_4 = np.array([0.39225,-0.1197,0,1])
-
-                # Transformation matrix from shoulder to base reference frame
-                T_1_0 = np.array([[1,0,0,0],[0,1,0,0],[0,0,1,0.089159],[0,0,0,1]])
-
-                # Transformation matrix from upper arm to shoulder reference frame
-                T_2_1 = np.array([[np.cos(theta_1), -np.sin(theta_1), 0, 0],[np.sin(theta_1), np.cos(theta_1), 0, 0],[0,0,1,0],[0,0,0,1]])
-
-                # Transformation matrix from forearm to upper arm reference frame
-                T_3_2 = np.array([[np.cos(theta_2),0,np.sin(theta_2),0],[0,1,0,0.13585],[-np.sin(theta_2),0,np.cos(theta_2),0],[0,0,0,1]])
-
-                # Transformation matrix from wrist 1 to forearm reference frame
-                T_4_3 = np.array([[np.cos(theta_3),0,np.sin(theta_3),0.425],[0,1,0,0],[-np.sin(theta_3),0,np.cos(theta_3),0],[0,0,0,1]])
-
-                forearm_pos = T_1_0.dot(T_2_1).dot(T_3_2).dot(forearm_pos_3)[:3]
-                wrist_1_pos = T_1_0.dot(T_2_1).dot(T_3_2).dot(T_4_3).dot(wrist_1_pos_4)[:3]
-
-                # Make sure wrist 1 pos is above ground so can actually be reached
-                if np.absolute(end_goal[0]) > np.pi/4 and forearm_pos[2] > 0.05 and wrist_1_pos[2] > 0.15:
-                    goal_possible = True
+            # Draw blocks of candidate goals and keep the first one which results in an achievable task (i.e., desired end effector position is above ground)
+            goal_space = np.array(self.goal_space_test)
+            while True:
+                candidates = np.random.uniform(goal_space[:,0], goal_space[:,1], size=(self.goal_candidates_per_draw, self.end_goal_dim))
+                reachable = ur5_kinematics.reachable_goals(candidates)
+                if reachable.any():
+                    end_goal = candidates[np.argmax(reachable)]
+                    break
 
 
         elif self.name == "ant_four_rooms.xml":
@@ -308,74 +220,73 @@ class Environment():
         return end_goal
 
 
-    # Visualize all subgoals
-    def display_subgoals(self,subgoals):
+    # Switch to a private copy of the model so that site colors can be changed
+    # for visualization. Called before a viewer is attached, the state of the
+    # simulation and the displayed subgoals are kept.
+    def use_private_model(self):
 
-        # Display up to 10 subgoals and end goal
-        if len(subgoals) <= 11:
-            subgoal_ind = 0
-        else:
-            subgoal_ind = len(subgoals) - 11
+        if not self.shared_model:
+            return
 
+        model = model_cache.load_model(self._model_path, shared = False)
+        sim = MjSim(model)
+        sim.set_state(self.sim.get_state())
+        sim.data.mocap_pos[:] = self.sim.data.mocap_pos
+        sim.data.mocap_quat[:] = self.sim.data.mocap_quat
+        sim.data.ctrl[:] = self.sim.data.ctrl
+        sim.forward()
+        self.model = model
+        self.sim = sim
+        self.shared_model = False
 
-        for i in range(1,min(len(subgoals),11)):
-            if self.name == "pendulum.xml":
-                self.sim.data.mocap_pos[i] = np.array([0.5*np.sin(subgoals[subgoal_ind][0]),0,0.5*np.cos(subgoals[subgoal_ind][0])+0.6])
-                # Visualize subgoal
-                self.sim.model.site_rgba[i][3] = 1
-                subgoal_ind += 1
+        if self._displayed_subgoals is not None:
+            self.display_subgoals(self._displayed_subgoals)
 
-            elif self.name == "ur5.xml":
 
-                theta_1 = subgoals[subgoal_ind][0]
-                theta_2 = subgoals[subgoal_ind][1]
-                theta_3 = subgoals[subgoal_ind][2]
+    # Make subgoal sites visible. Site colors of the shared model are left
+    # untouched as all environments in the process use them.
+    def _show_sites(self, sites):
 
-                # shoulder_pos_1 = np.array([0,0,0,1])
-                upper_arm_pos_2 = np.array([0,0.13585,0,1])
-                forearm_pos_3 = np.array([0.425,0,0,1])
-                wrist_1_pos_4 = np.array([0.39225,-0.1197,0,1])
+        if not self.shared_model:
+            self.sim.model.site_rgba[sites, 3] = 1
 
 
-                # Transformation matrix from shoulder to base reference frame
-                T_1_0 = np.array([[1,0,0,0],[0,1,0,0],[0,0,1,0.089159],[0,0,0,1]])
-
-                # Transformation matrix from upper arm to shoulder reference frame
-                T_2_1 = np.array([[np.cos(theta_1), -np.sin(theta_1), 0, 0],[np.sin(theta_1), np.cos(theta_1), 0, 0],[0,0,1,0],[0,0,0,1]])
-
-                # Transformation matrix from forearm to upper arm reference frame
-                T_3_2 = np.array([[np.cos(theta_2),0,np.sin(theta_2),0],[0,1,0,0.13585],[-np.sin(theta_2),0,np.cos(theta_2),0],[0,0,0,1]])
-
-                # Transformation matrix from wrist 1 to forearm reference frame
-                T_4_3 = np.array([[np.cos(theta_3),0,np.sin(theta_3),0.425],[0,1,0,0],[-np.sin(theta_3),0,np.cos(theta_3),0],[0,0,0,1]])
+    # Visualize all subgoals
+    def display_subgoals(self,subgoals):
 
-                # Determine joint position relative to original reference frame
-                # shoulder_pos = T_1_0.dot(shoulder_pos_1)
-                upper_arm_pos = T_1_0.dot(T_2_1).dot(upper_arm_pos_2)[:3]
-                forearm_pos = T_1_0.dot(T_2_1).dot(T_3_2).dot(forearm_pos_3)[:3]
-                wrist_1_pos = T_1_0.dot(T_2_1).dot(T_3_2).dot(T_4_3).dot(wrist_1_pos_4)[:3]
+        if self.headless:
+            return
 
-                joint_pos = [upper_arm_pos, forearm_pos, wrist_1_pos]
+        self._displayed_subgoals = subgoals
 
-                """
-                print("\nSubgoal %d Joint Pos: " % i)
-                print("Upper Arm Pos: ", joint_pos[0])
-                print("Forearm Pos: ", joint_pos[1])
-                print("Wrist Pos: ", joint_pos[2])
-                """
+        # Display up to 10 subgoals and end goal
+        if len(subgoals) <= 11:
+            subgoal_ind = 0
+        else:
+            subgoal_ind = len(subgoals) - 11
 
-                # Designate site position for upper arm, forearm and wrist
-                for j in range(3):
-                    self.sim.data.mocap_pos[3 + 3*(i-1) + j] = np.copy(joint_pos[j])
-                    self.sim.model.site_rgba[3 + 3*(i-1) + j][3] = 1
+        # UR5 joint positions of all displayed subgoals are computed in one batch
+        if self.name == "ur5.xml":
+            n_displayed = max(min(len(subgoals),11) - 1, 0)
+            if n_displayed > 0:
+                angles = np.array([subgoals[subgoal_ind + k][:3] for k in range(n_displayed)])
+                joint_pos = ur5_kinematics.joint_positions(angles).reshape(-1, 3)
 
-                # print("\nLayer %d Predicted Pos: " % i, wrist_1_pos[:3])
+                # Designate site positions for upper arm, forearm and wrist
+                self.sim.data.mocap_pos[3:3 + 3*n_displayed] = joint_pos
+                self._show_sites(slice(3, 3 + 3*n_displayed))
+            return
 
+        for i in range(1,min(len(subgoals),11)):
+            if self.name == "pendulum.xml":
+                self.sim.data.mocap_pos[i] = np.array([0.5*np.sin(subgoals[subgoal_ind][0]),0,0.5*np.cos(subgoals[subgoal_ind][0])+0.6])
+                # Visualize subgoal
+                self._show_sites(i)
                 subgoal_ind += 1
 
             elif self.name == "ant_reacher.xml" or self.name == "ant_four_rooms.xml":
                 self.sim.data.mocap_pos[i][:3] = np.copy(subgoals[subgoal_ind][:3])
-                self.sim.model.site_rgba[i][3] = 1
+                self._show_sites(i)
 
                 subgoal_ind += 1
 
@@ -383,5 +294,5 @@ class Environment():
                 # Visualize desired gripper position, which is elements 18-21 in subgoal vector
                 self.sim.data.mocap_pos[i] = subgoals[subgoal_ind]
                 # Visualize subgoal
-                self.sim.model.site_rgba[i][3] = 1
+                self._show_sites(i)
                 subgoal_ind += 1
@@ -99,6 +99,10 @@ def design_agent_and_env(FLAGS):
     # Provide state to subgoal projection function.
     project_state_to_subgoal = lambda sim, state: np.concatenate((np.array([bound_angle(sim.data.qpos[i]) for i in range(len(sim.data.qpos))]),np.array([4 if sim.data.qvel[i] > 4 else -4 if sim.data.qvel[i] < -4 else sim.data.qvel[i] for i in range(len(sim.data.qvel))])))
 
+    # Batched versions of the projection functions which map states of shape (N, state_dim) to end goals and subgoals without accessing the simulation.  The state consists of the 3 joint positions followed by the 3 joint velocities and np.fmod bounds angles like bound_angle.  End goals are written into out if it is given.
+    project_states_to_end_goals = lambda states, out=None: np.fmod(states[:, :3], 2*np.pi, out=out)
+    project_states_to_subgoals = lambda states: np.concatenate((np.fmod(states[:, :3], 2*np.pi), np.clip(states[:, 3:6], -4, 4)), axis=1)
+
 
     # Set subgoal achievement thresholds
     velo_threshold = 2
@@ -145,7 +149,7 @@ def design_agent_and_env(FLAGS):
 
 
     # Instantiate and return environment
-    env = Environment(model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions, timesteps_per_action, FLAGS.show)
+    env = Environment(model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions, timesteps_per_action, FLAGS.show, project_states_to_end_goals, project_states_to_subgoals)
 
     return env
     
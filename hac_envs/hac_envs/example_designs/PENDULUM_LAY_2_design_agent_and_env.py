@@ -89,6 +89,16 @@ def design_agent_and_env(FLAGS):
     # Provide state to subgoal projection function.
     project_state_to_subgoal = lambda sim, state: np.array([bound_angle(sim.data.qpos[0]), 15 if state[2] > 15 else -15 if state[2] < -15 else state[2]])
 
+    # Batched versions of the projection functions which map states of shape (N, state_dim) to end goals and subgoals without accessing the simulation.  The pendulum angle is recovered from its cosine and sine, np.arctan2 yields the same range as bound_angle (up to floating point error).  End goals are written into out if it is given.
+    def project_states_to_end_goals(states, out=None):
+        if out is None:
+            out = np.empty((len(states), 2))
+        np.arctan2(states[:, 1], states[:, 0], out=out[:, 0])
+        # clip velocity with ufuncs, np.clip allocates temporary arrays
+        np.minimum(np.maximum(states[:, 2], -15, out=out[:, 1]), 15, out=out[:, 1])
+        return out
+    project_states_to_subgoals = project_states_to_end_goals
+
 
     # Set subgoal achievement thresholds
     subgoal_thresholds = np.array([np.deg2rad(9.5), 0.6])
@@ -134,6 +144,6 @@ def design_agent_and_env(FLAGS):
 
 
     # Instantiate and return environment
-    env = Environment(model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions, timesteps_per_action, FLAGS.show)
+    env = Environment(model_name, goal_space_train, goal_space_test, project_state_to_end_goal, end_goal_thresholds, initial_state_space, subgoal_bounds, project_state_to_subgoal, subgoal_thresholds, max_actions, timesteps_per_action, FLAGS.show, project_states_to_end_goals, project_states_to_subgoals)
 
     return env
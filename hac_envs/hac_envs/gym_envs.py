@@ -1,7 +1,5 @@
-from .design_agent_and_env import design_agent_and_env as design_agent_and_env_ur5
-from .example_designs.PENDULUM_LAY_2_design_agent_and_env import design_agent_and_env as design_agent_and_env_pendulum
-from .ant_environments.ant_four_rooms_3_levels.design_agent_and_env import design_agent_and_env as design_agent_and_env_ant_four_rooms
-from .gym_wrapper import GymWrapper
+# Design modules are imported inside the factories so that gym.make only
+# loads the modules of the requested environment.
 
 
 class Flags():
@@ -14,19 +12,45 @@ class Flags():
         self.layers = None
         self.time_scale = None
 
-def ur5_reacher():
-    flags = Flags()
-    hac_env = design_agent_and_env_ur5(flags)
-    return GymWrapper(hac_env)
+def _design_ur5():
+    from .design_agent_and_env import design_agent_and_env
+    return design_agent_and_env
 
-def pendulum():
-    flags = Flags()
-    hac_env = design_agent_and_env_pendulum(flags)
-    return GymWrapper(hac_env)
+def _design_pendulum():
+    from .example_designs.PENDULUM_LAY_2_design_agent_and_env import design_agent_and_env
+    return design_agent_and_env
 
-def ant_four_rooms():
-    flags = Flags()
-    hac_env = design_agent_and_env_ant_four_rooms(flags)
-    return GymWrapper(hac_env)
+def _design_ant_four_rooms():
+    from .ant_environments.ant_four_rooms_3_levels.design_agent_and_env import design_agent_and_env
+    return design_agent_and_env
 
+def _env(design, preallocate_obs, reset_pool_size, headless):
+    from .gym_wrapper import GymWrapper
+    hac_env = design()(Flags())
+    return GymWrapper(hac_env, preallocate_obs=preallocate_obs, reset_pool_size=reset_pool_size,
+            headless=headless)
 
+def ur5_reacher(preallocate_obs=False, reset_pool_size=None, headless=False):
+    return _env(_design_ur5, preallocate_obs, reset_pool_size, headless)
+
+def pendulum(preallocate_obs=False, reset_pool_size=None, headless=False):
+    return _env(_design_pendulum, preallocate_obs, reset_pool_size, headless)
+
+def ant_four_rooms(preallocate_obs=False, reset_pool_size=None, headless=False):
+    return _env(_design_ant_four_rooms, preallocate_obs, reset_pool_size, headless)
+
+def _vec_env(design, n_envs, reset_pool_size):
+    from .vec_environment import VecEnvironment
+    from .vec_gym_wrapper import VecGymWrapper
+    design_agent_and_env = design()
+    hac_envs = [design_agent_and_env(Flags()) for _ in range(n_envs)]
+    return VecGymWrapper(VecEnvironment(hac_envs, reset_pool_size))
+
+def vec_ur5_reacher(n_envs, reset_pool_size=None):
+    return _vec_env(_design_ur5, n_envs, reset_pool_size)
+
+def vec_pendulum(n_envs, reset_pool_size=None):
+    return _vec_env(_design_pendulum, n_envs, reset_pool_size)
+
+def vec_ant_four_rooms(n_envs, reset_pool_size=None):
+    return _vec_env(_design_ant_four_rooms, n_envs, reset_pool_size)
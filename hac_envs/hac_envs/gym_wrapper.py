@@ -1,9 +1,48 @@
 from gym import GoalEnv, spaces
-from inspect import getargspec
-from mujoco_py import MjViewer
+from inspect import signature
 import numpy as np
 
-from .environment import Environment
+from .reset_engine import ResetEngine
+
+
+def get_spaces(hac_env, observation_space_bounds=None):
+    """Return action space and dict observation space of HAC environment."""
+
+    # action space
+    action_low = hac_env.action_offset - hac_env.action_bounds
+    action_high = hac_env.action_offset + hac_env.action_bounds
+    action_space = spaces.Box(low=action_low, high=action_high, dtype=np.float32)
+
+    # partial observation space
+    if observation_space_bounds is None:
+        # appropriate for UR5 and Pendulum
+        partial_obs_space = spaces.Box(
+            low=-np.inf, 
+            high=np.inf, 
+            shape=(hac_env.state_dim,), 
+            dtype=np.float32
+        )
+    else:
+        partial_obs_space = spaces.Box(
+            low=observation_space_bounds[:, 0], 
+            high=observation_space_bounds[:, 1], 
+            dtype=np.float32
+        )
+
+    # goal spaces (Use goal space used for training in original paper)
+    goal_low = np.array(hac_env.goal_space_train)[:, 0]
+    goal_high = np.array(hac_env.goal_space_train)[:, 1]
+    desired_goal_space = spaces.Box(low=goal_low, high=goal_high, dtype=np.float32)
+    achieved_goal_space = desired_goal_space
+
+    # observation space, including desired and achieved goal
+    observation_space = spaces.Dict({
+        "observation": partial_obs_space,
+        "desired_goal": desired_goal_space,
+        "achieved_goal": achieved_goal_space
+        })
+
+    return action_space, observation_space
 
 
 class GymWrapper(GoalEnv):
@@ -12,50 +51,69 @@ class GymWrapper(GoalEnv):
     Assumes hac_env is an instance of Environment as defined in the 
     original Hierarchical Actor-Critic implementation at 
     https://github.com/andrew-j-levy/Hierarchical-Actor-Critc-HAC-
+
+    If preallocate_obs is True, step and reset write state, desired and 
+    achieved goal into persistent buffers and always return the same 
+    observation dict. The observation is then only valid until the next 
+    call to step or reset. Consumers that keep observations (e.g. in 
+    episode transitions) have to copy them, for example with copy_obs. 
+    If the design provides batched projection functions, the achieved 
+    goal is written directly into its buffer instead of being projected 
+    into a new array first.
+
+    If reset_pool_size is given, goals and initial states are drawn in 
+    batches of this size by a ResetEngine instead of one at a time.
+
+    In headless mode, markers of goals and subgoals are not updated. The 
+    latest end goal and subgoals are displayed once a viewer is attached 
+    by calling render, which ends headless mode.
     """
 
-    def __init__(self, hac_env, observation_space_bounds=None):
+    def __init__(self, hac_env, observation_space_bounds=None, preallocate_obs=False, reset_pool_size=None,
+            headless=False):
+        assert not (headless and hac_env.visualize), "A visualized environment cannot be headless"
         self.hac_env = hac_env
         self.max_episode_length = hac_env.max_actions
         self.viewer = None
-
-        # action space
-        action_low = hac_env.action_offset - hac_env.action_bounds
-        action_high = hac_env.action_offset + hac_env.action_bounds
-        self.action_space = spaces.Box(low=action_low, high=action_high, dtype=np.float32)
-
-        # partial observation space
-        if observation_space_bounds is None:
-            # appropriate for UR5 and Pendulum
-            partial_obs_space = spaces.Box(
-                low=-np.inf, 
-                high=np.inf, 
-                shape=(hac_env.state_dim,), 
-                dtype=np.float32
-            )
-        else:
-            partial_obs_space = spaces.Box(
-                low=observation_space_bounds[:, 0], 
-                high=observation_space_bounds[:, 1], 
-                dtype=np.float32
-            )
-
-        # goal spaces (Use goal space used for training in original paper)
-        goal_low = np.array(hac_env.goal_space_train)[:, 0]
-        goal_high = np.array(hac_env.goal_space_train)[:, 1]
-        desired_goal_space = spaces.Box(low=goal_low, high=goal_high, dtype=np.float32)
-        achieved_goal_space = desired_goal_space
-
-        # observation space, including desired and achieved goal
-        self.observation_space = spaces.Dict({
-            "observation": partial_obs_space,
-            "desired_goal": desired_goal_space,
-            "achieved_goal": achieved_goal_space
-            })
+        self.preallocate_obs = preallocate_obs
+        self.hac_env.headless = headless
+        self._deferred_subgoal_update = None
+
+        # Only the ant environments take the next goal as argument in reset_sim
+        self._reset_takes_goal = "next_goal" in signature(hac_env.reset_sim).parameters
+        self.reset_engine = None if reset_pool_size is None else ResetEngine(hac_env, reset_pool_size)
+
+        self.action_space, self.observation_space = get_spaces(hac_env, observation_space_bounds)
+        self._end_goal_thresholds = np.asarray(hac_env.end_goal_thresholds)
+
+        if preallocate_obs:
+            self._state = np.zeros(hac_env.state_dim)
+            self._obs = {
+                "observation": self._state,
+                "desired_goal": np.zeros(hac_env.end_goal_dim),
+                "achieved_goal": np.zeros(hac_env.end_goal_dim)
+                }
+            # batches of one state and goal sharing memory with the buffers, 
+            # a batched projection writes the achieved goal without allocating
+            self._states = self._state[np.newaxis]
+            self._achieved_goals = self._obs["achieved_goal"][np.newaxis]
 
         self.reset()
 
+    @staticmethod
+    def copy_obs(obs):
+        """Return copy of observation dict which is safe to keep."""
+
+        return {key: np.array(value) for key, value in obs.items()}
+
     def _get_obs(self, state):
+        if self.preallocate_obs:
+            # state is the buffer self._state
+            if self.hac_env.project_states_to_end_goals is not None:
+                self.hac_env.project_states_to_end_goals(self._states, out=self._achieved_goals)
+            else:
+                self._obs["achieved_goal"][:] = self.hac_env.project_state_to_end_goal(self.hac_env.sim, state)
+            return self._obs
         achieved_goal = self.hac_env.project_state_to_end_goal(self.hac_env.sim, state)
         obs = { 
             "observation": state,
@@ -65,16 +123,22 @@ class GymWrapper(GoalEnv):
         return obs
 
     def compute_reward(self, achieved_goal, desired_goal, info):
-        tolerance = self.hac_env.end_goal_thresholds
-        reward = 0.
-        for a_goal, d_goal, tol in zip(achieved_goal, desired_goal, tolerance):
-            if np.absolute(a_goal - d_goal) > tol:
-                reward = -1.
-                break
-        return reward
+        """Return reward of 0 if achieved goal is within thresholds of desired goal, -1 otherwise.
+
+        Accepts single goals or batches of goals of shape (N, goal_dim), 
+        in which case an array of N rewards is returned.
+        """
+
+        exceeds_tol = np.absolute(np.asarray(achieved_goal) - np.asarray(desired_goal)) > self._end_goal_thresholds
+        if exceeds_tol.ndim == 1:
+            return -1. if exceeds_tol.any() else 0.
+        return np.where(exceeds_tol.any(axis=-1), -1., 0.)
 
     def step(self, action):
-        state = self.hac_env.execute_action(action)
+        if self.preallocate_obs:
+            state = self.hac_env.execute_action(action, out=self._state)
+        else:
+            state = self.hac_env.execute_action(action)
         self.n_steps += 1
         obs = self._get_obs(state)
         info = {}
@@ -83,20 +147,32 @@ class GymWrapper(GoalEnv):
         return obs, reward, done, info
 
     def reset(self, **kwargs):
-        self.desired_goal = self.hac_env.get_next_goal(test=False)
-        spec = getargspec(self.hac_env.reset_sim)
-        if "next_goal" in spec.args:
-            state = self.hac_env.reset_sim(self.desired_goal)
+        if self.reset_engine is not None:
+            self.desired_goal, state = self.reset_engine.reset()
         else:
-            state = self.hac_env.reset_sim()
+            self.desired_goal = self.hac_env.get_next_goal(test=False)
+            if self._reset_takes_goal:
+                state = self.hac_env.reset_sim(self.desired_goal)
+            else:
+                state = self.hac_env.reset_sim()
+        if self.preallocate_obs:
+            self._obs["desired_goal"][:] = self.desired_goal
+            self._state[:] = state
+            state = self._state
         obs = self._get_obs(state)
         self.n_steps = 0
         return obs
 
     def update_subgoals(self, subgoals):
+        if self.hac_env.headless:
+            self._deferred_subgoal_update = (self.update_subgoals, (subgoals,))
+            return
         self.hac_env.display_subgoals(subgoals + [None])
 
     def update_timed_subgoals(self, timed_subgoals, tolerances):
+        if self.hac_env.headless:
+            self._deferred_subgoal_update = (self.update_timed_subgoals, (timed_subgoals, tolerances))
+            return
         subgoals = [tg.goal for tg in timed_subgoals if tg is not None]
         # NOTE: Visualization of time component of timed subgoals is not supported
         # by HAC environments.
@@ -104,5 +180,16 @@ class GymWrapper(GoalEnv):
 
     def render(self, mode):
         if self.viewer is None:
+            from mujoco_py import MjViewer
+            # marker colors are only changed on a private model
+            self.hac_env.use_private_model()
             self.viewer = MjViewer(self.hac_env.sim)
+            if self.hac_env.headless:
+                # leave headless mode and show markers skipped so far
+                self.hac_env.headless = False
+                self.hac_env.display_end_goal(self.desired_goal)
+                if self._deferred_subgoal_update is not None:
+                    update, args = self._deferred_subgoal_update
+                    self._deferred_subgoal_update = None
+                    update(*args)
         self.viewer.render()
@@ -0,0 +1,113 @@
+"""Process-level cache of compiled MuJoCo models.
+
+Parsing and compiling a model XML is done at most once per process. The
+compiled model is additionally stored on disk in MuJoCo's binary (mjb)
+format if the environment variable HAC_ENVS_MODEL_CACHE_DIR points to a
+directory. Cache files are keyed by a hash of the XML file, all included
+XML files and referenced assets (meshes, textures, height fields), so
+edited models are recompiled automatically.
+"""
+
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+
+import mujoco_py
+from mujoco_py import load_model_from_mjb, load_model_from_path
+
+
+CACHE_DIR_ENV_VAR = "HAC_ENVS_MODEL_CACHE_DIR"
+
+# Elements whose file attribute refers to an asset
+_ASSET_TAGS = {"mesh": "meshdir", "skin": "meshdir", "texture": "texturedir", "hfield": "texturedir"}
+
+# Compiled models in binary format and shared model instances by XML path
+_mjb = {}
+_shared_models = {}
+
+
+def _referenced_files(path, asset_dirs=None):
+    """Return all files the model XML at path depends on, including itself."""
+
+    xml_dir = os.path.dirname(path)
+    asset_dirs = {} if asset_dirs is None else dict(asset_dirs)
+    root = ET.parse(path).getroot()
+    for compiler in root.iter("compiler"):
+        for attr in ("meshdir", "texturedir"):
+            if attr in compiler.attrib:
+                asset_dirs[attr] = compiler.attrib[attr]
+
+    files = [path]
+    for element in root.iter():
+        if "file" not in element.attrib:
+            continue
+        if element.tag == "include":
+            files += _referenced_files(os.path.join(xml_dir, element.attrib["file"]), asset_dirs)
+        elif element.tag in _ASSET_TAGS:
+            asset_dir = asset_dirs.get(_ASSET_TAGS[element.tag], "")
+            files.append(os.path.join(xml_dir, asset_dir, element.attrib["file"]))
+    return files
+
+
+def model_hash(path):
+    """Return hash of the model XML at path, its includes and assets."""
+
+    h = hashlib.sha256(mujoco_py.__version__.encode())
+    for file_path in _referenced_files(path):
+        with open(file_path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _compile(path):
+    """Return compiled model at path in binary format and the model, if it was built."""
+
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, os.path.basename(path) + "." + model_hash(path) + ".mjb")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read(), None
+
+    model = load_model_from_path(path)
+    mjb = model.get_mjb()
+
+    if cache_dir:
+        # write to temporary file first so concurrent workers never read a partial file
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.write(mjb)
+        os.replace(tmp_path, cache_path)
+    return mjb, model
+
+
+def load_model(path, shared=True):
+    """Return MjModel of the XML file at path, compiling it at most once per process.
+
+    If shared is True, all callers get the same MjModel instance, which
+    therefore has to be treated as read-only. Pass shared=False to get a
+    private copy, e.g. if site colors are changed for visualization
+    (environments switch to one with use_private_model before rendering).
+    """
+
+    path = os.path.abspath(path)
+    if shared and path in _shared_models:
+        return _shared_models[path]
+
+    model = None
+    if path not in _mjb:
+        _mjb[path], model = _compile(path)
+    if model is None:
+        model = load_model_from_mjb(_mjb[path])
+
+    if shared:
+        _shared_models[path] = model
+    return model
+
+
+def clear_cache():
+    """Forget all models compiled in this process (the disk cache is kept)."""
+
+    _mjb.clear()
+    _shared_models.clear()
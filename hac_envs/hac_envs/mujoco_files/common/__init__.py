@@ -20,7 +20,6 @@ from __future__ import division
 from __future__ import print_function
 
 import os
-from dm_control.utils import resources
 
 _SUITE_DIR = os.path.dirname(os.path.dirname(__file__))
 _FILENAMES = [
@@ -29,10 +28,25 @@ _FILENAMES = [
     "common/visual.xml",
 ]
 
-ASSETS = {filename: resources.GetResource(os.path.join(_SUITE_DIR, filename))
-          for filename in _FILENAMES}
+_assets = None
+
+
+def _read(path):
+  with open(path, "rb") as f:
+    return f.read()
+
+
+def __getattr__(name):
+  # ASSETS are only read from disk on first access
+  global _assets
+  if name == "ASSETS":
+    if _assets is None:
+      _assets = {filename: _read(os.path.join(_SUITE_DIR, filename))
+                 for filename in _FILENAMES}
+    return _assets
+  raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def read_model(model_filename):
   """Reads a model XML file and returns its contents as a string."""
-  return resources.GetResource(os.path.join(_SUITE_DIR, model_filename))
+  return _read(os.path.join(_SUITE_DIR, model_filename))
@@ -0,0 +1,134 @@
+"""Batched sampling of end goals and initial states of HAC environments."""
+
+from inspect import signature
+
+import numpy as np
+
+from . import ur5_kinematics
+
+
+# Minimum distance between initial ant position and goal in the ant reacher task
+ANT_REACHER_MIN_DIST = 8
+
+
+def _room_positions(rooms):
+    """Return random xy positions in the given rooms of the four rooms maze.
+
+    Room 0 is the top right quadrant, rooms 1, 2 and 3 follow counter-clockwise.
+    """
+
+    xy = np.random.uniform(3, 6.5, size=(len(rooms), 2))
+    xy[(rooms == 1) | (rooms == 2), 0] *= -1
+    xy[(rooms == 2) | (rooms == 3), 1] *= -1
+    return xy
+
+
+def _goal_rooms(goals):
+    """Return index of the room of the four rooms maze containing each goal."""
+
+    rooms = np.zeros(len(goals), dtype=np.int64)
+    rooms[(goals[:, 0] < 0) & (goals[:, 1] > 0)] = 1
+    rooms[(goals[:, 0] < 0) & (goals[:, 1] < 0)] = 2
+    rooms[(goals[:, 0] > 0) & (goals[:, 1] < 0)] = 3
+    return rooms
+
+
+def sample_end_goals(env, n, test=False):
+    """Draw n end goals from the same distribution as env.get_next_goal.
+
+    In contrast to get_next_goal, the goals are not displayed.
+    """
+
+    if env.name == "ur5.xml":
+        # Rejection sampling of goals which result in an achievable task
+        goal_space = np.array(env.goal_space_test)
+        goals = np.zeros((0, env.end_goal_dim))
+        while len(goals) < n:
+            candidates = np.random.uniform(goal_space[:, 0], goal_space[:, 1], size=(max(n, env.goal_candidates_per_draw), env.end_goal_dim))
+            goals = np.concatenate((goals, candidates[ur5_kinematics.reachable_goals(candidates)]))
+        return goals[:n]
+
+    elif env.name == "ant_four_rooms.xml":
+        goals = np.zeros((n, env.end_goal_dim))
+        goals[:, :2] = _room_positions(np.random.randint(0, 4, size=n))
+        goals[:, 2] = np.random.uniform(0.45, 0.55, size=n)
+        return goals
+
+    elif not test and env.goal_space_train is not None:
+        goal_space = np.array(env.goal_space_train)
+    else:
+        assert env.goal_space_test is not None, "Need goal space for testing. Set goal_space_test variable in \"design_env.py\" file"
+        goal_space = np.array(env.goal_space_test)
+    return np.random.uniform(goal_space[:, 0], goal_space[:, 1], size=(n, len(goal_space)))
+
+
+def sample_initial_states(env, n, end_goals=None):
+    """Draw n initial states (joint positions and velocities) in one pass.
+
+    The ant tasks constrain the initial state relative to the end goal, so
+    end_goals of shape (n, end_goal_dim) have to be given for them.
+    """
+
+    space = np.array(env.initial_state_space)
+    states = np.random.uniform(space[:, 0], space[:, 1], size=(n, len(space)))
+
+    if env.name == "ant_reacher.xml":
+        # Resample initial states which are too close to the goal
+        while True:
+            too_close = np.linalg.norm(end_goals[:, :2] - states[:, :2], axis=1) <= ANT_REACHER_MIN_DIST
+            n_too_close = np.count_nonzero(too_close)
+            if n_too_close == 0:
+                break
+            states[too_close] = np.random.uniform(space[:, 0], space[:, 1], size=(n_too_close, len(space)))
+
+    elif env.name == "ant_four_rooms.xml":
+        # Place ant in a room different from the one containing the goal
+        initial_rooms = (_goal_rooms(end_goals) + np.random.randint(1, 4, size=n)) % 4
+        states[:, :2] = _room_positions(initial_rooms)
+
+    return states
+
+
+class ResetEngine():
+    """Resets an Environment from a pool of pre-sampled (goal, initial state) pairs.
+
+    Goals and initial states are drawn pool_size at a time with vectorized
+    calls and satisfy the same constraints as those sampled by
+    get_next_goal and reset_sim. The pool is refilled when it runs empty.
+    """
+
+    def __init__(self, env, pool_size=256, test=False):
+        self.env = env
+        self.pool_size = pool_size
+        self.test = test
+        self.n_qpos = len(env.sim.data.qpos)
+
+        # Only the ant environments take the next goal as argument in reset_sim
+        self.reset_takes_goal = "next_goal" in signature(env.reset_sim).parameters
+
+        self._goals = None
+        self._initial_states = None
+        self._index = pool_size
+
+    def refill(self):
+        """Sample a new pool of end goals and matching initial states."""
+
+        self._goals = sample_end_goals(self.env, self.pool_size, self.test)
+        self._initial_states = sample_initial_states(self.env, self.pool_size, self._goals)
+        self._index = 0
+
+    def reset(self):
+        """Reset simulation to the next pair in the pool, return goal and state."""
+
+        if self._index >= self.pool_size:
+            self.refill()
+        end_goal = self._goals[self._index]
+        initial_state = self._initial_states[self._index]
+        self._index += 1
+
+        self.env.display_end_goal(end_goal)
+        if self.reset_takes_goal:
+            state = self.env.reset_sim(end_goal, initial_state=initial_state)
+        else:
+            state = self.env.reset_sim(initial_state=initial_state)
+        return end_goal, state
@@ -0,0 +1,173 @@
+from importlib import import_module
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+# Commands sent from the pool to its workers. Only these single bytes and
+# the acknowledgement are exchanged per step, all data goes through shared
+# memory.
+_STEP = b"s"
+_RESET = b"r"
+_CLOSE = b"c"
+_ACK = b"k"
+
+_GOAL_KEYS = ("observation", "desired_goal", "achieved_goal")
+
+
+def _buffer_layout(observation_space, action_space, n_envs):
+    """Return dict mapping buffer names to shape and dtype."""
+
+    layout = {}
+    for key in _GOAL_KEYS:
+        shape = (n_envs,) + observation_space[key].shape
+        layout[key] = (shape, np.float64)
+        layout["terminal_" + key] = (shape, np.float64)
+    layout["action"] = ((n_envs,) + action_space.shape, np.float64)
+    layout["reward"] = ((n_envs,), np.float64)
+    layout["done"] = ((n_envs,), np.bool_)
+    return layout
+
+
+def _attach_buffers(layout, names):
+    """Map shared memory blocks to numpy arrays."""
+
+    blocks = {}
+    arrays = {}
+    for key, (shape, dtype) in layout.items():
+        blocks[key] = shared_memory.SharedMemory(name=names[key])
+        # the pool owns the blocks, keep the resource tracker of the worker
+        # from unlinking them when the worker exits
+        resource_tracker.unregister(blocks[key]._name, "shared_memory")
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+    return blocks, arrays
+
+
+def _worker(conn, env_id, env_module, index, n_envs, env_kwargs):
+    import gym
+    # registers the environment
+    import_module(env_module)
+    env = gym.make(env_id, **env_kwargs)
+
+    # send spaces once and receive names of shared memory blocks
+    conn.send((env.observation_space, env.action_space, env.max_episode_length))
+    layout = _buffer_layout(env.observation_space, env.action_space, n_envs)
+    blocks, arrays = _attach_buffers(layout, conn.recv())
+
+    def write_obs(obs, prefix=""):
+        for key in _GOAL_KEYS:
+            arrays[prefix + key][index] = obs[key]
+
+    try:
+        while True:
+            cmd = conn.recv_bytes()
+            if cmd == _STEP:
+                obs, reward, done, _ = env.step(arrays["action"][index])
+                arrays["reward"][index] = reward
+                arrays["done"][index] = done
+                if done:
+                    write_obs(obs, "terminal_")
+                    obs = env.reset()
+                write_obs(obs)
+            elif cmd == _RESET:
+                write_obs(env.reset())
+                arrays["done"][index] = False
+            elif cmd == _CLOSE:
+                break
+            conn.send_bytes(_ACK)
+    finally:
+        for block in blocks.values():
+            block.close()
+        env.close()
+        conn.close()
+
+
+class SubprocEnvPool():
+    """Runs instances of a goal-based gym environment in worker processes.
+
+    Each worker writes observations, achieved and desired goals, rewards and
+    done flags of its environment into a row of preallocated shared memory
+    arrays. Per step, only single byte commands are sent over the pipes.
+    Finished environments are reset automatically by their worker, the final
+    observation is stored in the info dict under "terminal_observation".
+
+    The returned observation dict and the reward and done arrays are views
+    on shared memory which are overwritten in every call to step and reset.
+    Copy them if they have to be kept.
+
+    Keyword arguments for the environments can be given in env_kwargs.
+    Requires python 3.8 or higher (multiprocessing.shared_memory).
+    """
+
+    def __init__(self, env_id, n_envs, env_module="hac_envs", start_method=None, env_kwargs=None):
+        self.env_id = env_id
+        self.num_envs = n_envs
+        self._closed = True
+
+        ctx = mp.get_context(start_method)
+        self._conns = []
+        self._processes = []
+        for i in range(n_envs):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(child_conn, env_id, env_module, i, n_envs, env_kwargs or {}),
+                    daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+        # spaces are reported by the workers so the parent does not have to build an env
+        spaces = [conn.recv() for conn in self._conns]
+        self.observation_space, self.action_space, self.max_episode_length = spaces[0]
+
+        layout = _buffer_layout(self.observation_space, self.action_space, n_envs)
+        self._blocks = {}
+        self._arrays = {}
+        for key, (shape, dtype) in layout.items():
+            n_bytes = max(int(np.prod(shape))*np.dtype(dtype).itemsize, 1)
+            self._blocks[key] = shared_memory.SharedMemory(create=True, size=n_bytes)
+            self._arrays[key] = np.ndarray(shape, dtype=dtype, buffer=self._blocks[key].buf)
+        names = {key: block.name for key, block in self._blocks.items()}
+        for conn in self._conns:
+            conn.send(names)
+
+        self._obs = {key: self._arrays[key] for key in _GOAL_KEYS}
+        self._closed = False
+
+    def _broadcast(self, cmd):
+        for conn in self._conns:
+            conn.send_bytes(cmd)
+        for conn in self._conns:
+            conn.recv_bytes()
+
+    def step(self, actions):
+        self._arrays["action"][:] = actions
+        self._broadcast(_STEP)
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(self._arrays["done"]):
+            infos[i]["terminal_observation"] = {
+                key: self._arrays["terminal_" + key][i].copy() for key in _GOAL_KEYS}
+        return self._obs, self._arrays["reward"], self._arrays["done"], infos
+
+    def reset(self):
+        self._broadcast(_RESET)
+        return self._obs
+
+    def close(self):
+        if self._closed:
+            return
+        for conn in self._conns:
+            conn.send_bytes(_CLOSE)
+        for process in self._processes:
+            process.join()
+        for conn in self._conns:
+            conn.close()
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._closed = True
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
@@ -0,0 +1,73 @@
+"""Forward kinematics of the UR5 arm used for goal sampling and visualization."""
+
+import numpy as np
+
+
+# Positions of upper arm, forearm and wrist 1 joints in the reference frames
+# of upper arm, forearm and wrist 1 (homogeneous coordinates)
+JOINT_POS_LOCAL = np.array([
+    [0, 0.13585, 0, 1],
+    [0.425, 0, 0, 1],
+    [0.39225, -0.1197, 0, 1]
+    ])
+
+# Transformation matrix from shoulder to base reference frame
+T_1_0 = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0.089159], [0, 0, 0, 1]])
+
+
+def joint_positions(angles):
+    """Return positions of upper arm, forearm and wrist 1 joints in the base frame.
+
+    angles: Array of shape (N, 3) (or (3,)) containing shoulder pan, shoulder
+        lift and elbow angles.
+    Returns array of shape (N, 3, 3) indexed by configuration, joint and
+    coordinate.
+    """
+
+    angles = np.atleast_2d(angles)[:, :3]
+    n = angles.shape[0]
+    c = np.cos(angles)
+    s = np.sin(angles)
+
+    # T[:, 0]: upper arm to shoulder (rotation about z)
+    # T[:, 1]: forearm to upper arm (rotation about y)
+    # T[:, 2]: wrist 1 to forearm (rotation about y)
+    T = np.zeros((n, 3, 4, 4))
+    T[:, :, 3, 3] = 1.
+    T[:, 0, 0, 0] = c[:, 0]
+    T[:, 0, 0, 1] = -s[:, 0]
+    T[:, 0, 1, 0] = s[:, 0]
+    T[:, 0, 1, 1] = c[:, 0]
+    T[:, 0, 2, 2] = 1.
+    for k in (1, 2):
+        T[:, k, 0, 0] = c[:, k]
+        T[:, k, 0, 2] = s[:, k]
+        T[:, k, 1, 1] = 1.
+        T[:, k, 2, 0] = -s[:, k]
+        T[:, k, 2, 2] = c[:, k]
+    T[:, 1, 1, 3] = 0.13585
+    T[:, 2, 0, 3] = 0.425
+
+    # Chain transformations to get frames of all three joints relative to base
+    frames = np.empty_like(T)
+    frames[:, 0] = np.matmul(T_1_0, T[:, 0])
+    frames[:, 1] = np.matmul(frames[:, 0], T[:, 1])
+    frames[:, 2] = np.matmul(frames[:, 1], T[:, 2])
+
+    # Transform all joint positions in one pass
+    return np.einsum("nkij,kj->nki", frames, JOINT_POS_LOCAL)[:, :, :3]
+
+
+def reachable_goals(angles):
+    """Return boolean mask of end goals (joint angles) that are reachable.
+
+    An end goal is considered reachable if the forearm and wrist 1 joints are
+    above the ground and the shoulder pan is sufficiently far from the initial
+    configuration.
+    """
+
+    angles = np.atleast_2d(angles)
+    joint_pos = joint_positions(angles)
+    return ((np.absolute(angles[:, 0]) > np.pi/4)
+            & (joint_pos[:, 1, 2] > 0.05)
+            & (joint_pos[:, 2, 2] > 0.15))
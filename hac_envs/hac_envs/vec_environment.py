@@ -0,0 +1,132 @@
+from inspect import signature
+
+import numpy as np
+from mujoco_py import MjSimPool
+
+from .reset_engine import ResetEngine
+
+
+class VecEnvironment():
+    """Steps the simulations of several HAC environments in lockstep.
+
+    All environments are assumed to be instances of Environment created from
+    the same design (same model, goal spaces, thresholds and projection
+    functions). Sub-environments whose episode has ended are reset
+    automatically. The arrays returned by reset and step are preallocated and
+    overwritten in every call, so consumers have to copy them if they want
+    to keep the data.
+
+    If reset_pool_size is given, each sub-environment draws goals and
+    initial states in batches of this size from a ResetEngine.
+    """
+
+    def __init__(self, envs, reset_pool_size=None):
+        assert len(envs) > 0, "Need at least one environment"
+        self.envs = envs
+        self.num_envs = len(envs)
+
+        env = envs[0]
+        assert all(e.name == env.name for e in envs), "All environments have to use the same model"
+        self.name = env.name
+        self.state_dim = env.state_dim
+        self.action_dim = env.action_dim
+        self.end_goal_dim = env.end_goal_dim
+        self.end_goal_thresholds = np.asarray(env.end_goal_thresholds)
+        self.max_actions = env.max_actions
+        self.num_frames_skip = env.num_frames_skip
+
+        # Sub-environments are never rendered, so their markers are not updated
+        for e in envs:
+            e.headless = True
+
+        # Simulations are stepped in parallel for num_frames_skip frames
+        self.sim_pool = MjSimPool([e.sim for e in envs], nsubsteps=self.num_frames_skip)
+
+        # Only the ant environments take the next goal as argument in reset_sim
+        self._reset_takes_goal = "next_goal" in signature(env.reset_sim).parameters
+        if reset_pool_size is None:
+            self.reset_engines = None
+        else:
+            self.reset_engines = [ResetEngine(e, reset_pool_size) for e in envs]
+
+        # Preallocated output arrays
+        self.states = np.zeros((self.num_envs, self.state_dim))
+        self.achieved_goals = np.zeros((self.num_envs, self.end_goal_dim))
+        self.desired_goals = np.zeros((self.num_envs, self.end_goal_dim))
+        self.rewards = np.zeros(self.num_envs)
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+        self.n_steps = np.zeros(self.num_envs, dtype=np.int64)
+        self._abs_diff = np.zeros((self.num_envs, self.end_goal_dim))
+        self._within_tol = np.zeros((self.num_envs, self.end_goal_dim), dtype=bool)
+
+    # Project all states at once if the design provides a batched projection function
+    def _project_states_to_end_goals(self):
+        project_states_to_end_goals = self.envs[0].project_states_to_end_goals
+        if project_states_to_end_goals is not None:
+            self.achieved_goals[:] = project_states_to_end_goals(self.states)
+        else:
+            for i, env in enumerate(self.envs):
+                self.achieved_goals[i] = env.project_state_to_end_goal(env.sim, self.states[i])
+
+    # Reward of 0 if achieved goal is within thresholds of desired goal in all dimensions, -1 otherwise.
+    # Accepts a single goal (returns a float) or goals with any leading batch shape.
+    def compute_reward(self, achieved_goals, desired_goals):
+        exceeds_tol = np.absolute(np.asarray(achieved_goals) - np.asarray(desired_goals)) > self.end_goal_thresholds
+        if exceeds_tol.ndim == 1:
+            return -1. if exceeds_tol.any() else 0.
+        return np.where(exceeds_tol.any(axis=-1), -1., 0.)
+
+    # Rewards of the current achieved and desired goals written into the preallocated arrays
+    def _compute_step_rewards(self):
+        np.subtract(self.achieved_goals, self.desired_goals, out=self._abs_diff)
+        np.absolute(self._abs_diff, out=self._abs_diff)
+        np.less_equal(self._abs_diff, self.end_goal_thresholds, out=self._within_tol)
+        self.rewards[:] = np.where(self._within_tol.all(axis=1), 0., -1.)
+
+    # Sample new goal and initial state for sub-environment i
+    def reset_env(self, i):
+        env = self.envs[i]
+        if self.reset_engines is not None:
+            self.desired_goals[i], self.states[i] = self.reset_engines[i].reset()
+        else:
+            self.desired_goals[i] = env.get_next_goal(test=False)
+            if self._reset_takes_goal:
+                self.states[i] = env.reset_sim(self.desired_goals[i])
+            else:
+                self.states[i] = env.reset_sim()
+        self.achieved_goals[i] = env.project_state_to_end_goal(env.sim, self.states[i])
+        self.n_steps[i] = 0
+
+    # Reset all sub-environments
+    def reset(self):
+        for i in range(self.num_envs):
+            self.reset_env(i)
+        self.dones[:] = False
+        return self.states, self.achieved_goals, self.desired_goals
+
+    # Execute one low-level action per sub-environment, each for num_frames_skip frames
+    def step(self, actions):
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_envs, self.action_dim)
+
+        for env, action in zip(self.envs, actions):
+            env.sim.data.ctrl[:] = action
+        self.sim_pool.step()
+
+        for i, env in enumerate(self.envs):
+            env.get_state(out=self.states[i])
+        self._project_states_to_end_goals()
+        self.n_steps += 1
+
+        self._compute_step_rewards()
+        np.logical_or(self.rewards == 0., self.n_steps >= self.max_actions, out=self.dones)
+
+        # Keep final state of finished episodes before resetting the sub-environments
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(self.dones):
+            infos[i]["terminal_state"] = self.states[i].copy()
+            infos[i]["terminal_achieved_goal"] = self.achieved_goals[i].copy()
+            infos[i]["terminal_desired_goal"] = self.desired_goals[i].copy()
+            self.reset_env(i)
+
+        return self.states, self.achieved_goals, self.desired_goals, self.rewards, self.dones, infos
@@ -0,0 +1,46 @@
+from .gym_wrapper import get_spaces
+
+
+class VecGymWrapper():
+    """Wraps VecEnvironment in a batched version of GymWrapper.
+
+    Observation and action spaces refer to a single sub-environment. Actions
+    are passed as (num_envs, action_dim) array and observations are returned
+    as dict of stacked arrays. Finished sub-environments are reset
+    automatically, their final observation is stored in the info dict under
+    the key "terminal_observation".
+
+    The returned observation dict and the reward and done arrays are reused
+    in every call to step and reset. Copy them if they have to be kept.
+    """
+
+    def __init__(self, vec_env, observation_space_bounds=None):
+        self.vec_env = vec_env
+        self.num_envs = vec_env.num_envs
+        self.max_episode_length = vec_env.max_actions
+
+        self.action_space, self.observation_space = get_spaces(vec_env.envs[0], observation_space_bounds)
+
+        self._obs = {
+            "observation": vec_env.states,
+            "desired_goal": vec_env.desired_goals,
+            "achieved_goal": vec_env.achieved_goals
+            }
+
+    def compute_reward(self, achieved_goal, desired_goal, info):
+        return self.vec_env.compute_reward(achieved_goal, desired_goal)
+
+    def step(self, actions):
+        _, _, _, rewards, dones, infos = self.vec_env.step(actions)
+        for info in infos:
+            if "terminal_state" in info:
+                info["terminal_observation"] = {
+                    "observation": info.pop("terminal_state"),
+                    "desired_goal": info.pop("terminal_desired_goal"),
+                    "achieved_goal": info.pop("terminal_achieved_goal")
+                    }
+        return self._obs, rewards, dones, infos
+
+    def reset(self):
+        self.vec_env.reset()
+        return self._obs
@@ -0,0 +1,94 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from scripts.run.subtask_spec_factories.ant_four_rooms_subtask_spec_factory import AntFourRoomsSubtaskSpecFactory
+from scripts.run.subtask_spec_factories.box_subtask_spec_factory import BatchedGoalsMixin
+from scripts.run.subtask_spec_factories.pendulum_hac_subtask_factory import PendulumHACSubtaskSpecFactory
+from scripts.run.subtask_spec_factories.ur5_reacher_subtask_spec_factory import UR5ReacherSubtaskSpecFactory
+
+
+# maps for single observations as implemented before batching
+
+def ur5_bound_angle(angle):
+    bounded_angle = np.absolute(angle) % (2*np.pi)
+    if angle < 0:
+        bounded_angle = -bounded_angle
+    return bounded_angle
+
+
+def ur5_subgoal(partial_obs, n_angles=3):
+    angles = np.array([ur5_bound_angle(a) for a in partial_obs[:n_angles]])
+    ang_vels = np.clip(partial_obs[n_angles:], -4.0, 4.0)
+    return np.concatenate((angles, ang_vels))
+
+
+def pendulum_bound_angle(angle):
+    bounded_angle = angle % (2*np.pi)
+    if np.absolute(bounded_angle) > np.pi:
+        bounded_angle = -(np.pi - bounded_angle % np.pi)
+    return bounded_angle
+
+
+def pendulum_subgoal(partial_obs):
+    angle = np.sign(partial_obs[1])*np.arccos(partial_obs[0])
+    return np.array([pendulum_bound_angle(angle), np.clip(partial_obs[2], -15, 15)])
+
+
+def ant_subgoal(partial_obs, n_coords=15):
+    pos = np.concatenate((partial_obs[:2], np.clip(partial_obs[2:3], -np.inf, 1.)))
+    vels = np.clip(partial_obs[n_coords:n_coords + 2], -3.0, 3.0)
+    return np.concatenate((pos, vels))
+
+
+def criterion(achieved_goal, desired_goal, factorization, thresholds):
+    for factor, threshold in zip(factorization, thresholds):
+        if np.linalg.norm(achieved_goal[factor] - desired_goal[factor]) >= threshold:
+            return False
+    return True
+
+
+def env_with_obs_dim(obs_dim):
+    return SimpleNamespace(observation_space={"observation": SimpleNamespace(shape=(obs_dim,))})
+
+
+def compare(name, single_map, batched_map, obs):
+    t_start = time.perf_counter()
+    expected = np.stack([single_map(o) for o in obs])
+    t_single = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    result = batched_map(obs)
+    t_batched = time.perf_counter() - t_start
+    assert np.allclose(result, expected), f"{name} differs."
+    print(f"{name:22s} per observation {t_single:8.4f} s  batched {t_batched:8.4f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-observation and batched goal maps and criterion.")
+    parser.add_argument("--n", default=100000, type=int, help="Number of observations.")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    ur5_obs = rng.uniform(-20., 20., (args.n, 6))
+    ur5_map, _ = UR5ReacherSubtaskSpecFactory.get_map_to_subgoal_and_subgoal_space(env_with_obs_dim(6))
+    compare("UR5 subgoal", ur5_subgoal, ur5_map, ur5_obs)
+
+    angles = rng.uniform(-np.pi, np.pi, args.n)
+    pendulum_obs = np.stack((np.cos(angles), np.sin(angles), rng.uniform(-20., 20., args.n)), axis=-1)
+    pendulum_map, _ = PendulumHACSubtaskSpecFactory.get_map_to_subgoal_and_subgoal_space(env_with_obs_dim(3))
+    compare("Pendulum subgoal", pendulum_subgoal, pendulum_map, pendulum_obs)
+
+    ant_obs = rng.uniform(-5., 5., (args.n, 30))
+    ant_map, _ = AntFourRoomsSubtaskSpecFactory.get_map_to_subgoal_and_subgoal_space(env_with_obs_dim(30))
+    compare("AntFourRooms subgoal", ant_subgoal, ant_map, ant_obs)
+
+    # goal achievement criterion with per-dimension thresholds (as for UR5)
+    spec = BatchedGoalsMixin()
+    spec.factorization = [[i] for i in range(6)]
+    spec._goal_achievement_threshold = [0.1]*3 + [0.5]*3
+    achieved = ur5_map(ur5_obs)
+    desired = achieved + rng.normal(scale=0.1, size=achieved.shape)
+    compare("criterion", lambda g: criterion(g[0], g[1], spec.factorization, spec._goal_achievement_threshold),
+            lambda g: spec.batched_goal_achievement_criterion(g[:, 0], g[:, 1]), np.stack((achieved, desired), axis=1))
@@ -0,0 +1,44 @@
+import argparse
+import time
+
+import gym
+import numpy as np
+
+import hac_envs
+
+
+def scalar_rewards(env, achieved_goals, desired_goals):
+    return np.array([env.compute_reward(a, d, {}) for a, d in zip(achieved_goals, desired_goals)])
+
+
+def sample_goal_pairs(env, batch_size):
+    """Return achieved and desired goals of which roughly half are within the thresholds."""
+
+    goal_space = env.observation_space["desired_goal"]
+    desired_goals = np.random.uniform(goal_space.low, goal_space.high, size=(batch_size,) + goal_space.shape)
+    offsets = np.random.uniform(-2., 2., size=desired_goals.shape)*env.hac_env.end_goal_thresholds
+    achieved_goals = desired_goals + offsets*(np.random.rand(batch_size, 1) < 0.5)
+    return achieved_goals, desired_goals
+
+
+if __name__ == "__main__":
+    # tests/test_compute_reward.py checks the batched rewards against the previous loop
+    parser = argparse.ArgumentParser(description="Compare scalar and batched compute_reward of GymWrapper.")
+    parser.add_argument("--env", default="AntFourRooms-v1", help="Gym id of environment.")
+    parser.add_argument("--batch_sizes", default=[512, 4096, 32768, 100000], type=int, nargs="+", help="Relabeling batch sizes.")
+    args = parser.parse_args()
+
+    env = gym.make(args.env).unwrapped
+    print(f"{args.env}")
+    for batch_size in args.batch_sizes:
+        achieved_goals, desired_goals = sample_goal_pairs(env, batch_size)
+
+        t_start = time.perf_counter()
+        scalar = scalar_rewards(env, achieved_goals, desired_goals)
+        t_scalar = time.perf_counter() - t_start
+
+        t_start = time.perf_counter()
+        batched = env.compute_reward(achieved_goals, desired_goals, {})
+        t_batched = time.perf_counter() - t_start
+
+        print(f"  batch {batch_size:6d}: scalar {1e3*t_scalar:9.2f} ms, batched {1e3*t_batched:7.2f} ms ({t_scalar/t_batched:.0f}x)")
@@ -0,0 +1,85 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from gym import spaces as gym_spaces
+
+from graph_rl.spaces import BoxSpace, DictSpace
+from graph_rl.subtasks import DictInfoHidingTGSubtaskSpec
+
+from scripts.run.subtask_spec_factories.compiled_dict_obs import CompiledDictInfoHidingTGSubtaskSpec
+from scripts.run.subtask_spec_factories.tennis2d_subtask_spec_factory import Tennis2DSubtaskSpecFactory
+
+
+def make_env():
+    """Object with observation space shaped like the one of Tennis2D."""
+
+    items = {
+            **{f"joint_{i}_angle": gym_spaces.Box(-np.pi, np.pi, shape=(1,)) for i in range(3)},
+            **{f"joint_{i}_angular_vel": gym_spaces.Box(-10., 10., shape=(1,)) for i in range(3)},
+            "ball_pos": gym_spaces.Box(-5., 5., shape=(2,)),
+            "ball_vel": gym_spaces.Box(-20., 20., shape=(2,))
+            }
+    return SimpleNamespace(observation_space=gym_spaces.Dict({
+        "observation": gym_spaces.Dict(items),
+        "achieved_goal": gym_spaces.Box(-5., 5., shape=(3,)),
+        "desired_goal": gym_spaces.Box(-5., 5., shape=(3,))
+        }))
+
+
+def make_env_obs(env, rng):
+    items = env.observation_space["observation"].spaces
+    return {"observation": {key: rng.uniform(-1., 1., space.shape) for key, space in items.items()}}
+
+
+def step(spec, obs_space, env_obs, desired_goal):
+    """Work of a subtask per env step: partial obs, achieved goal, criterion, flat observation."""
+
+    partial_obs = spec.map_to_partial_obs(env_obs, None)
+    achieved_goal = spec.map_to_goal(partial_obs)
+    achieved = spec.goal_achievement_criterion(achieved_goal, desired_goal, None)
+    flat_obs = obs_space.flatten_value({"partial_observation": partial_obs, "desired_goal": desired_goal,
+        "delta_t_ach": np.array([0.5])})
+    return achieved_goal, achieved, flat_obs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-step subtask overhead of dict and compiled flat observations.")
+    parser.add_argument("--n_steps", default=100000, type=int, help="Number of steps.")
+    args = parser.parse_args()
+
+    env = make_env()
+    params = {"goal_achievement_threshold": {"angle_threshold": 0.3, "angular_vel_threshold": 1.0}}
+    partial_obs_keys, goal_keys, thresholds = Tennis2DSubtaskSpecFactory._get_dicts(params, 0)
+    specs = {
+            "dict": DictInfoHidingTGSubtaskSpec(thresholds, partial_obs_keys, goal_keys, env, delta_t_max=20.),
+            "compiled": CompiledDictInfoHidingTGSubtaskSpec(thresholds, partial_obs_keys, goal_keys, env, delta_t_max=20.)
+            }
+
+    rng = np.random.default_rng(0)
+    env_obs_list = [make_env_obs(env, rng) for _ in range(1000)]
+    # desired goals are parent actions unflattened by the goal space
+    goal_space = specs["dict"].goal_space
+    flat_desired_goals = [goal_space.flatten_value(specs["dict"].map_to_goal(specs["dict"].map_to_partial_obs(o, None)))
+        + rng.normal(scale=0.2, size=goal_space.get_flat_dim()) for o in env_obs_list]
+
+    for name, spec in specs.items():
+        spec.obs_space = DictSpace({"partial_observation": spec.partial_obs_space, "desired_goal": spec.goal_space,
+            "delta_t_ach": BoxSpace([-1.], [1.])})
+        spec.desired_goals = [spec.goal_space.unflatten_value(g) for g in flat_desired_goals]
+    # results agree up to float32 precision of the compiled layout
+    for i, env_obs in enumerate(env_obs_list):
+        results = {name: step(spec, spec.obs_space, env_obs, spec.desired_goals[i]) for name, spec in specs.items()}
+        for key in goal_keys:
+            assert np.allclose(results["dict"][0][key], results["compiled"][0][key], atol=1e-6)
+        assert results["dict"][1] == results["compiled"][1]
+        assert np.allclose(results["dict"][2], results["compiled"][2], atol=1e-6)
+    print(repr(results["compiled"][0]))
+
+    for name, spec in specs.items():
+        t_start = time.perf_counter()
+        for i in range(args.n_steps):
+            step(spec, spec.obs_space, env_obs_list[i % 1000], spec.desired_goals[i % 1000])
+        t = (time.perf_counter() - t_start)/args.n_steps
+        print(f"{name:8s}: {1e6*t:6.2f} us/step")
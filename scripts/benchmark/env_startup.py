@@ -0,0 +1,49 @@
+import argparse
+import os
+import tempfile
+import time
+
+from hac_envs import gym_envs, model_cache
+
+
+ENV_FACTORIES = {
+        "ur5.xml": gym_envs.ur5_reacher,
+        "pendulum.xml": gym_envs.pendulum,
+        "ant_four_rooms.xml": gym_envs.ant_four_rooms
+        }
+
+
+def benchmark_construction(factory, n_envs, clear_process_cache):
+    """Return mean time in seconds needed to construct an environment."""
+
+    t_total = 0.
+    for _ in range(n_envs):
+        if clear_process_cache:
+            model_cache.clear_cache()
+        t_start = time.perf_counter()
+        env = factory()
+        t_total += time.perf_counter() - t_start
+        env.close()
+    return t_total/n_envs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold and warm construction time of hac_envs environments.")
+    parser.add_argument("--n_envs", default=10, type=int, help="Number of environments constructed per measurement.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for model_name, factory in ENV_FACTORIES.items():
+            os.environ.pop(model_cache.CACHE_DIR_ENV_VAR, None)
+            cold = benchmark_construction(factory, args.n_envs, True)
+
+            os.environ[model_cache.CACHE_DIR_ENV_VAR] = cache_dir
+            # populate disk cache
+            benchmark_construction(factory, 1, True)
+            disk = benchmark_construction(factory, args.n_envs, True)
+            process = benchmark_construction(factory, args.n_envs, False)
+
+            print(f"{model_name}")
+            print(f"  cold:                {1e3*cold:8.2f} ms")
+            print(f"  warm (disk cache):   {1e3*disk:8.2f} ms ({cold/disk:.1f}x)")
+            print(f"  warm (process cache):{1e3*process:8.2f} ms ({cold/process:.1f}x)")
@@ -0,0 +1,53 @@
+import argparse
+import time
+
+import gym
+import numpy as np
+
+import hac_envs
+from hac_envs.subproc_env_pool import SubprocEnvPool
+
+
+def benchmark_single_env(env_id, n_steps):
+    """Return environment steps per second of a single env in this process."""
+
+    env = gym.make(env_id)
+    env.reset()
+    t_start = time.perf_counter()
+    for _ in range(n_steps):
+        _, _, done, _ = env.step(env.action_space.sample())
+        if done:
+            env.reset()
+    t_elapsed = time.perf_counter() - t_start
+    env.close()
+    return n_steps/t_elapsed
+
+
+def benchmark_env_pool(env_id, n_envs, n_steps):
+    """Return environment steps per second summed over all envs in the pool."""
+
+    pool = SubprocEnvPool(env_id, n_envs)
+    pool.reset()
+    n_batches = max(n_steps//n_envs, 1)
+    actions = np.stack([pool.action_space.sample() for _ in range(n_envs)])
+    t_start = time.perf_counter()
+    for _ in range(n_batches):
+        pool.step(actions)
+    t_elapsed = time.perf_counter() - t_start
+    pool.close()
+    return n_batches*n_envs/t_elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare throughput of single env and subprocess env pool.")
+    parser.add_argument("--env", default="AntFourRooms-v1", help="Gym id of environment.")
+    parser.add_argument("--n_steps", default=20000, type=int, help="Number of environment steps per measurement.")
+    parser.add_argument("--n_envs", default=[2, 4, 8], type=int, nargs="+", help="Pool sizes to benchmark.")
+    args = parser.parse_args()
+
+    single = benchmark_single_env(args.env, args.n_steps)
+    print(f"{args.env}")
+    print(f"single env:     {single:10.1f} steps/s")
+    for n_envs in args.n_envs:
+        pooled = benchmark_env_pool(args.env, n_envs, args.n_steps)
+        print(f"pool ({n_envs:2d} envs): {pooled:10.1f} steps/s ({pooled/single:.2f}x)")
@@ -0,0 +1,52 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from scripts.run.goal_sampling_strategies.tennis2d_gss import Tennis2DGSS
+
+
+def loop_tennis2d_gss(episode_transitions, n_hindsight_goals):
+    """Tennis2DGSS for HAC transitions as before stacking episodes into arrays."""
+
+    indices = []
+    for i, trans in enumerate(episode_transitions):
+        achieved_goal = trans.subtask_tr.info["achieved_generalized_goal"]
+        if achieved_goal[2] == 1.:
+            indices.append(i)
+
+    assert len(indices) <= 1
+    return indices
+
+
+def make_episode(rng, n_transitions):
+    """HAC transitions with Tennis2D goals (contact flag at index 2)."""
+
+    contact = rng.integers(n_transitions)
+    return [SimpleNamespace(
+        subtask_tr=SimpleNamespace(info={"achieved_generalized_goal":
+            np.array([rng.uniform(), rng.uniform(), float(i == contact)])}),
+        algo_info={"child_be_deterministic": False},
+        child_feedback={"has_achieved": False},
+        env_info=SimpleNamespace(done=False)) for i in range(n_transitions)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of eager hindsight goal sampling (one call per transition).")
+    parser.add_argument("--episode_lengths", default=[8, 64, 512], type=int, nargs="+", help="Episode lengths.")
+    parser.add_argument("--n_episodes", default=200, type=int, help="Episodes per measurement.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    strategies = {"loop": loop_tennis2d_gss, "arrays": Tennis2DGSS()}
+    for n_transitions in args.episode_lengths:
+        episodes = [make_episode(rng, n_transitions) for _ in range(args.n_episodes)]
+        results = {}
+        for name, strategy in strategies.items():
+            t_start = time.perf_counter()
+            results[name] = [[strategy(episode, 3) for _ in episode] for episode in episodes]
+            results[name + "_us"] = (time.perf_counter() - t_start)/(args.n_episodes*n_transitions)*1e6
+        assert results["loop"] == results["arrays"]
+        print(f"{n_transitions:4d} transitions: loop {results['loop_us']:7.2f} us/call, "
+                f"arrays {results['arrays_us']:7.2f} us/call")
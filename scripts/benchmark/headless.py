@@ -0,0 +1,47 @@
+import argparse
+import time
+
+import gym
+import numpy as np
+
+import hac_envs
+
+
+ENV_IDS = ["UR5Reacher-v1", "AntFourRooms-v1"]
+
+
+def benchmark_steps(env_id, n_steps, headless, n_subgoals):
+    """Return mean time per step in microseconds, including resets and subgoal updates.
+
+    Subgoals are updated after every step as done by the HAC graph of graph_rl."""
+
+    env = gym.make(env_id, headless=headless).unwrapped
+    subgoal_bounds = np.array(env.hac_env.subgoal_bounds)
+    subgoals = [np.random.uniform(subgoal_bounds[:, 0], subgoal_bounds[:, 1]) for _ in range(n_subgoals)]
+    actions = [env.action_space.sample().astype(np.float64) for _ in range(n_steps)]
+
+    env.reset()
+    t_start = time.perf_counter()
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        env.update_subgoals(subgoals)
+        if done:
+            env.reset()
+    t_elapsed = time.perf_counter() - t_start
+    env.close()
+    return 1e6*t_elapsed/n_steps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per step cost of default and headless hac_envs environments.")
+    parser.add_argument("--env", default=ENV_IDS, nargs="+", help="Gym ids of environments.")
+    parser.add_argument("--n_steps", default=20000, type=int, help="Number of environment steps per measurement.")
+    parser.add_argument("--n_subgoals", default=2, type=int, help="Number of subgoals displayed per step.")
+    args = parser.parse_args()
+
+    for env_id in args.env:
+        default = benchmark_steps(env_id, args.n_steps, False, args.n_subgoals)
+        headless = benchmark_steps(env_id, args.n_steps, True, args.n_subgoals)
+        print(f"{env_id}")
+        print(f"  default:  {default:8.1f} us/step")
+        print(f"  headless: {headless:8.1f} us/step (saves {default - headless:.1f} us/step)")
@@ -0,0 +1,49 @@
+import argparse
+import subprocess
+import sys
+
+
+# Modules which should never be imported when creating an environment without rendering
+UNWANTED_MODULES = ["tkinter", "dm_control", "mujoco_py.mjviewer", "glfw"]
+
+
+def import_times(code):
+    """Run code in a fresh interpreter with -X importtime.
+
+    Returns list of (module, self time in us, cumulative time in us, depth).
+    """
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1)//2
+        times.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Break down import time of hac_envs and environment creation.")
+    parser.add_argument("--env", default="AntFourRooms-v1", help="Gym id of environment.")
+    parser.add_argument("--top", default=15, type=int, help="Number of slowest top-level imports to show.")
+    args = parser.parse_args()
+
+    stages = {
+            "import hac_envs": "import hac_envs",
+            "gym.make": f"import gym, hac_envs; gym.make('{args.env}')"
+            }
+    for stage, code in stages.items():
+        times = import_times(code)
+        total = sum(t[1] for t in times)
+        print(f"{stage}: {1e-3*total:.1f} ms in {len(times)} modules")
+        # top-level packages only, cumulative time includes their submodules
+        top_level = sorted((t for t in times if t[3] == 0), key=lambda t: -t[2])
+        for name, _, cumulative_us, _ in top_level[:args.top]:
+            print(f"  {1e-3*cumulative_us:9.1f} ms  {name}")
+        imported = {t[0] for t in times}
+        unwanted = [m for m in UNWANTED_MODULES if m in imported]
+        if unwanted:
+            print(f"  WARNING: imported {', '.join(unwanted)}")
@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import numpy as np
+
+from scripts.run.interruption_policies.batched import ScalarInterruptionPolicyAdapter, stack_obs
+from scripts.run.interruption_policies.tennis2d import tennis_2d_ip
+
+
+def scalar_tennis_2d_ip(env_obs, subtask_obs):
+    """Interruption policy for a single env as before batching."""
+
+    return env_obs["achieved_goal"][2] == 1.
+
+
+def make_obs(rng):
+    """Observations shaped like those of Tennis2D."""
+
+    env_obs = {
+            "observation": {
+                **{f"joint_{i}_angle": rng.uniform(-1., 1., 1) for i in range(3)},
+                **{f"joint_{i}_angular_vel": rng.uniform(-1., 1., 1) for i in range(3)},
+                "ball_position": rng.uniform(-1., 1., 2),
+                "ball_velocity": rng.uniform(-1., 1., 2)
+                },
+            "achieved_goal": np.array([rng.uniform(), rng.uniform(), float(rng.random() < 0.01)]),
+            "desired_goal": rng.uniform(-1., 1., 3)
+            }
+    subtask_obs = {
+            "partial_observation": rng.uniform(-1., 1., 6),
+            "desired_goal": rng.uniform(-1., 1., 6)
+            }
+    return env_obs, subtask_obs
+
+
+def time_per_million_steps(evaluate, n_evaluations, n_envs):
+    t_start = time.perf_counter()
+    for _ in range(n_evaluations):
+        evaluate()
+    return (time.perf_counter() - t_start)/(n_evaluations*n_envs)*1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interruption policy overhead per 1M env steps on Tennis2D observations.")
+    parser.add_argument("--n_envs", default=[1, 8, 64, 512], type=int, nargs="+", help="Numbers of parallel envs.")
+    parser.add_argument("--n_steps", default=200000, type=int, help="Env steps per measurement.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    adapter = ScalarInterruptionPolicyAdapter(scalar_tennis_2d_ip)
+    print(" n_envs  per-env scalar  scalar adapter  batched   (seconds per 1M env steps)")
+    for n_envs in args.n_envs:
+        obs = [make_obs(rng) for _ in range(n_envs)]
+        env_obs = stack_obs([o[0] for o in obs])
+        subtask_obs = stack_obs([o[1] for o in obs])
+        expected = np.array([scalar_tennis_2d_ip(*o) for o in obs])
+        assert np.array_equal(adapter.batched(env_obs, subtask_obs), expected)
+        assert np.array_equal(tennis_2d_ip.batched(env_obs, subtask_obs), expected)
+        assert [tennis_2d_ip(*o) for o in obs] == expected.tolist()
+
+        n_evaluations = max(args.n_steps//n_envs, 1)
+        t_loop = time_per_million_steps(lambda: [scalar_tennis_2d_ip(*o) for o in obs], n_evaluations, n_envs)
+        t_adapter = time_per_million_steps(lambda: adapter.batched(env_obs, subtask_obs), n_evaluations, n_envs)
+        t_batched = time_per_million_steps(lambda: tennis_2d_ip.batched(env_obs, subtask_obs), n_evaluations, n_envs)
+        print(f"{n_envs:7d}  {t_loop:14.3f}  {t_adapter:14.3f}  {t_batched:7.3f}")
+
+    # single env as evaluated by the nodes of a graph
+    env_obs, subtask_obs = make_obs(rng)
+    t_scalar = time_per_million_steps(lambda: scalar_tennis_2d_ip(env_obs, subtask_obs), args.n_steps, 1)
+    t_single = time_per_million_steps(lambda: tennis_2d_ip(env_obs, subtask_obs), args.n_steps, 1)
+    print(f"single env: scalar {t_scalar:.3f} s, batched policy called with single env {t_single:.3f} s per 1M steps")
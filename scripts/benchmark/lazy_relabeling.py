@@ -0,0 +1,107 @@
+import argparse
+import time
+
+import numpy as np
+import tianshou as ts
+
+from scripts.run.lazy_relabeling import HindsightReplayBuffer
+
+
+def criterion(achieved_goals, desired_goals):
+    return np.linalg.norm(achieved_goals - desired_goals, axis=-1) < 0.1
+
+
+def make_episode(length, partial_dim, goal_dim, rng):
+    partial_obs = np.cumsum(rng.normal(scale=0.05, size=(length + 1, partial_dim)), axis=0)
+    return {
+            "partial_obs": partial_obs,
+            "ach_goals": partial_obs[1:, :goal_dim],
+            "desired_goal": rng.uniform(-1., 1., goal_dim),
+            "actions": rng.uniform(-1., 1., (length, goal_dim))
+            }
+
+
+def add_eager(buffer, episode, n_hindsight_goals, rng):
+    """Future strategy as in HAC with every hindsight goal transition stored."""
+
+    n = len(episode["actions"])
+    for i in range(n):
+        goals = [episode["desired_goal"]]
+        indices = rng.integers(i + 1, n, size=min(n_hindsight_goals, n - 1 - i)) if i < n - 1 else []
+        goals += [episode["ach_goals"][j] for j in indices]
+        for goal in goals:
+            achieved = criterion(episode["ach_goals"][i][None], goal[None])[0]
+            buffer.add(
+                    obs = np.concatenate((goal, episode["partial_obs"][i])),
+                    act = episode["actions"][i],
+                    rew = 0. if achieved else -1.,
+                    done = achieved,
+                    obs_next = np.concatenate((goal, episode["partial_obs"][i + 1])))
+
+
+def add_lazy(buffer, episode, n_hindsight_goals):
+    n = len(episode["actions"])
+    goal = episode["desired_goal"]
+    for i in range(n):
+        achieved = criterion(episode["ach_goals"][i][None], goal[None])[0]
+        buffer.add(
+                obs = np.concatenate((goal, episode["partial_obs"][i])),
+                act = episode["actions"][i],
+                rew = 0. if achieved else -1.,
+                done = achieved,
+                obs_next = np.concatenate((goal, episode["partial_obs"][i + 1])),
+                ach_goal = episode["ach_goals"][i],
+                goal_low = np.int32(1),
+                goal_high = np.int32(n - i),
+                n_goals = np.float32(min(n_hindsight_goals, n - 1 - i)))
+
+
+def buffer_bytes(buffer):
+    return sum(v.nbytes for v in buffer._meta.__dict__.values() if isinstance(v, np.ndarray))
+
+
+def time_sampling(buffer, batch_size, n_batches):
+    t_start = time.perf_counter()
+    rewards = []
+    for _ in range(n_batches):
+        batch, _ = buffer.sample(batch_size)
+        rewards.append(np.mean(batch.rew))
+    return (time.perf_counter() - t_start)/n_batches, np.mean(rewards)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare eager and lazy hindsight relabeling (HAC, future strategy).")
+    parser.add_argument("--n_episodes", default=2000, type=int, help="Number of episodes.")
+    parser.add_argument("--episode_length", default=50, type=int, help="Transitions per episode.")
+    parser.add_argument("--n_hindsight_goals", default=3, type=int, help="Hindsight goals per transition.")
+    parser.add_argument("--partial_dim", default=30, type=int, help="Dimension of partial observation.")
+    parser.add_argument("--goal_dim", default=3, type=int, help="Dimension of goal.")
+    parser.add_argument("--batch_size", default=1024, type=int, help="Batch size.")
+    parser.add_argument("--n_batches", default=500, type=int, help="Number of sampled batches.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    episodes = [make_episode(args.episode_length, args.partial_dim, args.goal_dim, rng)
+            for _ in range(args.n_episodes)]
+    size = args.n_episodes*args.episode_length*(args.n_hindsight_goals + 1)
+    eager = ts.data.ReplayBuffer(size = size)
+    lazy = HindsightReplayBuffer(args.n_episodes*args.episode_length, slice(0, args.goal_dim), criterion,
+            max_n_goals = args.n_hindsight_goals)
+
+    t_start = time.perf_counter()
+    for episode in episodes:
+        add_eager(eager, episode, args.n_hindsight_goals, rng)
+    t_eager = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    for episode in episodes:
+        add_lazy(lazy, episode, args.n_hindsight_goals)
+    t_lazy = time.perf_counter() - t_start
+
+    np.random.seed(0)
+    sample_eager, rew_eager = time_sampling(eager, args.batch_size, args.n_batches)
+    sample_lazy, rew_lazy = time_sampling(lazy, args.batch_size, args.n_batches)
+
+    for name, buffer, t_add, t_sample, rew in (("eager", eager, t_eager, sample_eager, rew_eager),
+            ("lazy", lazy, t_lazy, sample_lazy, rew_lazy)):
+        print(f"{name:5s}: {len(buffer):9d} rows  {buffer_bytes(buffer)/2**20:9.1f} MiB  "
+                f"add {t_add:6.2f} s  sample {1e6*t_sample:8.1f} us/batch  mean reward {rew:.4f}")
@@ -0,0 +1,88 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from scripts.run.state_checkpoints import restore_logs, snapshot_logs
+
+
+LOG_FILES = {
+        "session_train.csv": ("return", "length", "step", "time", "success", "return_success"),
+        "session_test.csv": ("return", "length", "step", "time", "success", "return_success"),
+        "subtask_0_train.csv": ("achieved", "n_actions", "step", "time"),
+        "subtask_1_train.csv": ("achieved", "n_actions", "step", "time"),
+        }
+
+
+def append_rows(log_dir, n_rows, rng):
+    """Append n_rows rows of random numbers to every CSV log (creating it if necessary)."""
+
+    for name, columns in LOG_FILES.items():
+        path = os.path.join(log_dir, name)
+        new_file = not os.path.isfile(path)
+        with open(path, "a") as f:
+            if new_file:
+                f.write("#{\"t_start\": 0.0}\n" + ",".join(columns) + "\n")
+            values = rng.uniform(-100., 100., size=(n_rows, len(columns)))
+            f.write("".join(",".join(f"{v:.6f}" for v in row) + "\n" for row in values))
+    with open(os.path.join(log_dir, "session.json"), "w") as f:
+        f.write("{\"n_rows\": %d}" % n_rows)
+
+
+if __name__ == "__main__":
+    # tests/test_log_resume.py checks that both ways give the same logs
+    parser = argparse.ArgumentParser(description="Compare resuming logs via a copy of the log directory "
+            "with truncating them to recorded offsets.")
+    parser.add_argument("--n_rows", default=[10000, 100000, 1000000], type=int, nargs="+", help="Rows per CSV log at the time of the previous snapshot.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_rows in args.n_rows:
+        base_dir = tempfile.mkdtemp()
+        try:
+            log_dir = os.path.join(base_dir, "log")
+            os.makedirs(log_dir)
+            checkpoint_dir = os.path.join(base_dir, "checkpoint")
+            os.makedirs(checkpoint_dir)
+            # previous snapshot, afterwards training continues
+            append_rows(log_dir, n_rows, rng)
+            offsets = snapshot_logs(log_dir, checkpoint_dir)
+            append_rows(log_dir, n_rows//10, rng)
+
+            # snapshot by copying the log directory
+            t_start = time.perf_counter()
+            shutil.copytree(log_dir, os.path.join(base_dir, "state_log"))
+            t_copy = time.perf_counter() - t_start
+            copy_size = sum(os.path.getsize(os.path.join(base_dir, "state_log", n)) for n in os.listdir(log_dir))
+
+            # snapshot by recording offsets
+            shutil.rmtree(checkpoint_dir)
+            os.makedirs(checkpoint_dir)
+            t_start = time.perf_counter()
+            offsets = snapshot_logs(log_dir, checkpoint_dir, offsets)
+            t_offsets = time.perf_counter() - t_start
+
+            # rows written after the snapshot (e.g. before the process was killed)
+            append_rows(log_dir, n_rows//10, rng)
+            with open(os.path.join(log_dir, "session_extra.csv"), "w") as f:
+                f.write("a,b\n")
+            shutil.copytree(log_dir, os.path.join(base_dir, "log_offsets"))
+
+            # resume by replacing the log directory with the copy
+            t_start = time.perf_counter()
+            shutil.rmtree(log_dir)
+            shutil.copytree(os.path.join(base_dir, "state_log"), log_dir)
+            t_copy += time.perf_counter() - t_start
+
+            # resume by truncating
+            t_start = time.perf_counter()
+            restore_logs(os.path.join(base_dir, "log_offsets"), checkpoint_dir, offsets)
+            t_offsets += time.perf_counter() - t_start
+
+            print(f"{n_rows:8d} rows/file: copy {1e3*t_copy:9.2f} ms ({copy_size/2**20:7.1f} MiB extra), "
+                    f"offsets {1e3*t_offsets:8.2f} ms")
+        finally:
+            shutil.rmtree(base_dir)
@@ -0,0 +1,57 @@
+import argparse
+import time
+import tracemalloc
+
+import gym
+import numpy as np
+
+import hac_envs
+
+
+ENV_IDS = ["UR5Reacher-v1", "PendulumHAC-v1", "AntFourRooms-v1"]
+
+
+def _run(env, actions):
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+
+
+def benchmark_obs_path(env_id, n_steps, preallocate_obs):
+    """Return steps per second and mean bytes allocated (peak) per step."""
+
+    env = gym.make(env_id, preallocate_obs=preallocate_obs)
+    env.reset()
+    actions = [env.action_space.sample().astype(np.float64) for _ in range(n_steps)]
+
+    t_start = time.perf_counter()
+    _run(env, actions)
+    steps_per_s = n_steps/(time.perf_counter() - t_start)
+
+    # tracemalloc slows down stepping, so allocations are measured in a
+    # separate pass
+    tracemalloc.start()
+    allocated = 0
+    for action in actions:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        _run(env, [action])
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    env.close()
+    return steps_per_s, allocated/n_steps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare default and preallocated observation path of hac_envs.")
+    parser.add_argument("--env", default=ENV_IDS, nargs="+", help="Gym ids of environments.")
+    parser.add_argument("--n_steps", default=5000, type=int, help="Number of environment steps per measurement.")
+    args = parser.parse_args()
+
+    for env_id in args.env:
+        print(f"{env_id}")
+        for preallocate_obs in (False, True):
+            steps_per_s, allocated = benchmark_obs_path(env_id, args.n_steps, preallocate_obs)
+            label = "preallocated" if preallocate_obs else "default"
+            print(f"  {label:12s} {steps_per_s:10.1f} steps/s {allocated:10.1f} bytes allocated/step")
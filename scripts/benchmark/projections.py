@@ -0,0 +1,51 @@
+import argparse
+from inspect import signature
+import time
+
+import numpy as np
+
+from hac_envs import gym_envs
+
+
+DESIGNS = {
+        "UR5Reacher": gym_envs._design_ur5,
+        "PendulumHAC": gym_envs._design_pendulum,
+        "AntFourRooms": gym_envs._design_ant_four_rooms
+        }
+
+
+def collect_projections(hac_env, n_states):
+    """Step env with random actions, return states and their scalar projections."""
+
+    states, end_goals, subgoals = [], [], []
+    if "next_goal" in signature(hac_env.reset_sim).parameters:
+        hac_env.reset_sim(hac_env.get_next_goal(test=False))
+    else:
+        hac_env.reset_sim()
+    for _ in range(n_states):
+        action = np.random.uniform(-hac_env.action_bounds, hac_env.action_bounds)
+        state = hac_env.execute_action(action)
+        states.append(state)
+        end_goals.append(hac_env.project_state_to_end_goal(hac_env.sim, state))
+        subgoals.append(hac_env.project_state_to_subgoal(hac_env.sim, state))
+    return np.array(states), np.array(end_goals), np.array(subgoals)
+
+
+if __name__ == "__main__":
+    # tests/test_projections.py checks that both give the same goals
+    parser = argparse.ArgumentParser(description="Measure speed of batched projection functions and their deviation from scalar ones.")
+    parser.add_argument("--n_states", default=10000, type=int, help="Number of states to project.")
+    args = parser.parse_args()
+
+    for name, design in DESIGNS.items():
+        hac_env = design()(gym_envs.Flags())
+        hac_env.headless = True
+        states, end_goals, subgoals = collect_projections(hac_env, args.n_states)
+
+        t_start = time.perf_counter()
+        batched_end_goals = hac_env.project_states_to_end_goals(states)
+        batched_subgoals = hac_env.project_states_to_subgoals(states)
+        t_batched = time.perf_counter() - t_start
+
+        max_err = max(np.abs(batched_end_goals - end_goals).max(), np.abs(batched_subgoals - subgoals).max())
+        print(f"{name}: {args.n_states} states projected in {1e3*t_batched:.2f} ms, max. abs. deviation {max_err:.1e}")
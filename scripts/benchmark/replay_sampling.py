@@ -0,0 +1,49 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import tianshou as ts
+
+from scripts.run.replay_buffers import MemmapReplayBuffer
+
+
+def fill(buffer, n_transitions, obs_dim, act_dim, rng):
+    for _ in range(n_transitions):
+        buffer.add(
+                obs = rng.standard_normal(obs_dim).astype(np.float32),
+                act = rng.uniform(-1., 1., act_dim).astype(np.float32),
+                rew = float(rng.uniform(-1., 0.)),
+                done = bool(rng.random() < 0.05),
+                obs_next = rng.standard_normal(obs_dim).astype(np.float32))
+
+
+def time_sampling(buffer, batch_size, n_batches, seed):
+    np.random.seed(seed)
+    t_start = time.perf_counter()
+    for _ in range(n_batches):
+        batch, _ = buffer.sample(batch_size)
+    return (time.perf_counter() - t_start)/n_batches, batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sampling from in-memory and memory-mapped replay buffers.")
+    parser.add_argument("--n_transitions", default=1000000, type=int, help="Transitions in the buffers.")
+    parser.add_argument("--obs_dim", default=40, type=int, help="Dimension of flat observation (incl. goal).")
+    parser.add_argument("--act_dim", default=4, type=int, help="Dimension of flat action.")
+    parser.add_argument("--batch_size", default=512, type=int, help="Batch size.")
+    parser.add_argument("--n_batches", default=2000, type=int, help="Number of sampled batches.")
+    args = parser.parse_args()
+
+    buffers = {
+            "memory": ts.data.ReplayBuffer(size = args.n_transitions),
+            "memmap": MemmapReplayBuffer(args.n_transitions, replay_dir=tempfile.gettempdir())
+            }
+    for buffer in buffers.values():
+        fill(buffer, args.n_transitions, args.obs_dim, args.act_dim, np.random.default_rng(0))
+
+    results = {name: time_sampling(buffer, args.batch_size, args.n_batches, seed=0) for name, buffer in buffers.items()}
+    for key in ("obs", "act", "rew", "done", "obs_next"):
+        assert np.array_equal(results["memory"][1][key], results["memmap"][1][key]), f"Sampled {key} differs."
+    for name, (t, _) in results.items():
+        print(f"{name:7s}: {1e6*t:8.1f} us/batch ({args.batch_size/t/1e6:.2f}M transitions/s)")
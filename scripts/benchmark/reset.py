@@ -0,0 +1,36 @@
+import argparse
+import time
+
+import gym
+
+import hac_envs
+
+
+ENV_IDS = ["UR5Reacher-v1", "PendulumHAC-v1", "AntFourRooms-v1"]
+
+
+def benchmark_reset(env_id, n_resets, reset_pool_size):
+    """Return resets per second of a gym wrapped HAC environment."""
+
+    env = gym.make(env_id, reset_pool_size=reset_pool_size)
+    t_start = time.perf_counter()
+    for _ in range(n_resets):
+        env.reset()
+    t_elapsed = time.perf_counter() - t_start
+    env.close()
+    return n_resets/t_elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare resets with and without pre-sampled initial state pool.")
+    parser.add_argument("--env", default=ENV_IDS, nargs="+", help="Gym ids of environments.")
+    parser.add_argument("--n_resets", default=10000, type=int, help="Number of resets per measurement.")
+    parser.add_argument("--pool_size", default=256, type=int, help="Size of pool of goals and initial states.")
+    args = parser.parse_args()
+
+    for env_id in args.env:
+        default = benchmark_reset(env_id, args.n_resets, None)
+        pooled = benchmark_reset(env_id, args.n_resets, args.pool_size)
+        print(f"{env_id}")
+        print(f"  default: {default:10.1f} resets/s")
+        print(f"  pool:    {pooled:10.1f} resets/s ({pooled/default:.2f}x)")
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import copy
+import os
+import queue
+import threading
+import time
+
+import torch
+
+
+def snapshot_tensors(obj):
+    """Return copy of nested dicts/lists in which all tensors are copied to the CPU.
+
+    The _metadata attribute of state dicts is copied as well."""
+
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    elif isinstance(obj, dict):
+        snapshot = OrderedDict() if isinstance(obj, OrderedDict) else {}
+        for key, value in obj.items():
+            snapshot[key] = snapshot_tensors(value)
+        # load_state_dict uses the versions of the modules recorded in _metadata
+        if hasattr(obj, "_metadata"):
+            snapshot._metadata = copy.deepcopy(obj._metadata)
+        return snapshot
+    elif isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot_tensors(value) for value in obj)
+    return obj
+
+
+def save_atomic(obj, path):
+    """Save obj with torch.save so that path either holds the old or the complete new file."""
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # persist the rename
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class AsyncCheckpointWriter():
+    """Writes checkpoints on a background thread.
+
+    save only copies the tensors to a staging snapshot, serialization and
+    writing to disk happen on the writer thread. At most max_in_flight
+    checkpoints are staged at a time, save blocks until a slot is free.
+    For every checkpoint, the time save blocked the caller (stall_time) and
+    the time needed for writing it (write_time) are recorded in records.
+    """
+
+    def __init__(self, max_in_flight=2):
+        self.records = []
+        self._slots = threading.Semaphore(max_in_flight)
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._write_checkpoints, daemon=True)
+        self._thread.start()
+
+    def _write_checkpoints(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            snapshot, path, record = item
+            try:
+                t_start = time.perf_counter()
+                save_atomic(snapshot, path)
+                record["write_time"] = time.perf_counter() - t_start
+            except Exception as e:
+                self._error = e
+            finally:
+                self._slots.release()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Writing checkpoint failed.") from error
+
+    def save(self, obj, path):
+        """Stage snapshot of obj (e.g. graph parameters) to be written to path."""
+
+        self._raise_error()
+        t_start = time.perf_counter()
+        self._slots.acquire()
+        snapshot = snapshot_tensors(obj)
+        record = {"path": path, "stall_time": time.perf_counter() - t_start}
+        self.records.append(record)
+        self._queue.put((snapshot, path, record))
+
+    def close(self):
+        """Wait until all staged checkpoints are written."""
+
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
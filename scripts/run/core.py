@@ -5,9 +5,9 @@ import argparse
 
 import gym
 import graph_rl
-import dyn_rl_benchmarks
-import hac_envs
 
+from .checkpoint_writer import AsyncCheckpointWriter
+from .env_suites import import_env_suite
 from .graphs import create_graph
 from .models import get_mlp_models
 from .subtask_spec_factories.string_to_subtask_spec_class import get_subtask_spec_factory_class
@@ -38,11 +38,41 @@ def load_params(dir, verbose=False):
     return run_params, graph_params, varied_hps
 
 
+def make_env(run_params):
+    """Get env from gym.
+
+    Only the package registering the env is imported. Keyword arguments 
+    for the env (e.g. headless for hac_envs) can be given in 
+    run_params["env_kwargs"]. If run_params["n_envs"] is larger than one, 
+    a pool of environments running in worker processes is returned 
+    instead. The pool is meant for data collection and benchmarks, 
+    training steps a single environment (see check_single_env)."""
+
+    env_name = run_params["env"]
+    n_envs = run_params.get("n_envs", 1)
+    env_kwargs = run_params.get("env_kwargs", {})
+    env_module = import_env_suite(env_name)
+    if n_envs > 1:
+        from hac_envs.subproc_env_pool import SubprocEnvPool
+        return SubprocEnvPool(env_name, n_envs, env_module=env_module, env_kwargs=env_kwargs)
+    else:
+        return gym.make(env_name, **env_kwargs)
+
+
+def check_single_env(run_params):
+    """Raise ValueError if run_params ask for more than one env during training."""
+
+    if run_params.get("n_envs", 1) != 1:
+        raise ValueError("graph_rl.Session steps a single environment, set n_envs to 1 for training "
+                "(pools of environments are only supported for data collection and benchmarks).")
+
+
 def get_env_and_graph(run_params, graph_params):
     """Get env from gym and construct Graph_RL graph."""
 
-    env_name = run_params["env"]
-    env = gym.make(env_name)
+    # fail before building the graph and its replay buffers
+    check_single_env(run_params)
+    env = make_env(run_params)
 
     # specifiy subtask specs
     subtask_spec_cl_name = graph_params["subtask_spec_factory"]
@@ -58,18 +88,47 @@ def get_env_and_graph(run_params, graph_params):
     return env, graph
 
 
+class CheckpointingSession(graph_rl.Session):
+    """Session which lets a checkpoint scheduler act on signals during testing.
+
+    graph_rl.Session only calls back after training episodes, which are 
+    followed by learning and possibly a long test phase."""
+
+    def __init__(self, graph, env, checkpoint_scheduler):
+        super().__init__(graph, env)
+        self.checkpoint_scheduler = checkpoint_scheduler
+
+    def step_env_and_graph(self, env_info, sess_info, *args, **kwargs):
+        if sess_info.testing:
+            self.checkpoint_scheduler.during_testing(self.graph)
+        return super().step_env_and_graph(env_info, sess_info, *args, **kwargs)
+
+
 def run_session(dir, graph, env, run_params, total_step_init=0, 
-        callback=None):
-    """Run session for run and save resulting policy."""
+        callback=None, checkpoint_scheduler=None):
+    """Run session for run and save resulting policy.
+    
+    If a checkpoint_scheduler is given, it is asked after every training
+    episode and before every test step whether the state of the run 
+    should be saved."""
 
-    sess = graph_rl.Session(graph, env)
+    assert getattr(env, "num_envs", 1) == 1, \
+            "graph_rl.Session steps a single environment, set n_envs to 1 for training."
+
+    if checkpoint_scheduler is not None:
+        sess = CheckpointingSession(graph, env, checkpoint_scheduler)
+    else:
+        sess = graph_rl.Session(graph, env)
 
     # directory for saving the model parameters
     save_directory = os.path.join(dir, "model")
     os.makedirs(save_directory, exist_ok = True)
 
-    if "model_save_frequency" in run_params:
-        frequ = run_params["model_save_frequency"]
+    # model parameters are written to disk in the background
+    checkpoint_writer = AsyncCheckpointWriter(run_params.get("max_checkpoints_in_flight", 2))
+
+    frequ = run_params.get("model_save_frequency", None)
+    if frequ is not None or callback is not None or checkpoint_scheduler is not None:
 
         class Cb_after_train_episode:
             def __init__(self):
@@ -77,12 +136,15 @@ def run_session(dir, graph, env, run_params, total_step_init=0,
 
             # callback is executed after each training episode
             def __call__(self, graph, sess_info, ep_return, graph_done):
-                if sess_info.total_step - self.last_model_save >= frequ:
+                if frequ is not None and sess_info.total_step - self.last_model_save >= frequ:
                     self.last_model_save = sess_info.total_step
                     # save model params
                     steps_in_k = int(sess_info.total_step/1000)
                     save_path = os.path.join(save_directory, f"params_{steps_in_k}k.pt")
-                    graph.save_parameters(save_path)
+                    checkpoint_writer.save(graph.get_parameters(), save_path)
+                # save state of run if due
+                if checkpoint_scheduler is not None:
+                    checkpoint_scheduler.after_train_episode(graph, sess_info.total_step)
                 # external part of callback
                 if callback is not None:
                     callback(graph, sess_info, ep_return, graph_done)
@@ -93,28 +155,34 @@ def run_session(dir, graph, env, run_params, total_step_init=0,
 
     tensorboard_log = False if "tensorboard_log" not in run_params else run_params["tensorboard_log"]
 
-    sess_props = sess.run(
-            n_steps=run_params["n_steps"], 
-            max_runtime=run_params["max_runtime"]*60. if "max_runtime" in run_params else None, 
-            learn=True, 
-            render=False, 
-            test=True, 
-            test_render=False, 
-            tensorboard_logdir=os.path.join(dir, "tensorboard") if tensorboard_log else None, 
-            run_name=None, 
-            test_frequency=run_params["test_frequency"], 
-            test_episodes=run_params["n_test_episodes"], 
-            csv_logdir=os.path.join(dir, "log"), 
-            torch_num_threads=run_params.get("torch_num_threads", None),
-            append_run_name_to_log_paths=False, 
-            cb_after_train_episode=cb_after_train_episode, 
-            total_step_init=total_step_init, 
-            append_to_logfiles=total_step_init > 0, 
-            success_reward=run_params.get("success_reward", None))
-
-    # save model params
-    save_path = os.path.join(save_directory, "params.pt")
-    graph.save_parameters(save_path)
+    try:
+        sess_props = sess.run(
+                n_steps=run_params["n_steps"], 
+                max_runtime=run_params["max_runtime"]*60. if "max_runtime" in run_params else None, 
+                learn=True, 
+                render=False, 
+                test=True, 
+                test_render=False, 
+                tensorboard_logdir=os.path.join(dir, "tensorboard") if tensorboard_log else None, 
+                run_name=None, 
+                test_frequency=run_params["test_frequency"], 
+                test_episodes=run_params["n_test_episodes"], 
+                csv_logdir=os.path.join(dir, "log"), 
+                torch_num_threads=run_params.get("torch_num_threads", None),
+                append_run_name_to_log_paths=False, 
+                cb_after_train_episode=cb_after_train_episode, 
+                total_step_init=total_step_init, 
+                append_to_logfiles=total_step_init > 0, 
+                success_reward=run_params.get("success_reward", None))
+
+        # save model params
+        save_path = os.path.join(save_directory, "params.pt")
+        checkpoint_writer.save(graph.get_parameters(), save_path)
+    finally:
+        checkpoint_writer.close()
+        # record how long saving checkpoints stalled training
+        with open(os.path.join(save_directory, "checkpoint_stats.json"), "w") as json_file:
+            json.dump(checkpoint_writer.records, json_file, indent = 4)
 
     return sess_props
 
@@ -131,7 +199,10 @@ def render(args, graph, env, run_params):
             graph.load_parameters(args.model_params_path)
 
     # run session
-    sess = graph_rl.Session(graph, env)
+    if checkpoint_scheduler is not None:
+        sess = CheckpointingSession(graph, env, checkpoint_scheduler)
+    else:
+        sess = graph_rl.Session(graph, env)
     sess.run(
             n_steps = run_params["n_steps"], 
             learn = args.learn, 
@@ -0,0 +1,44 @@
+from importlib import import_module
+
+import gym
+
+
+# Packages registering gym environments and the ids they provide
+ENV_SUITES = {
+        "hac_envs": ["UR5Reacher-v1", "PendulumHAC-v1", "AntReacher-v1", "AntFourRooms-v1"],
+        "dyn_rl_benchmarks": ["Platforms-v1", "Drawbridge-v1", "Tennis2D-v1"]
+        }
+
+# Index mapping env ids to the package registering them
+_env_id_to_suite = {env_id: suite for suite, env_ids in ENV_SUITES.items() for env_id in env_ids}
+
+
+def _registered_env_ids():
+    registry = gym.envs.registry
+    # older gym versions wrap the dict of env specs in a registry object
+    return getattr(registry, "env_specs", registry)
+
+
+def resolve_env_suite(env_id):
+    """Return name of the package which registers the gym environment env_id.
+
+    Ids not listed in ENV_SUITES are looked up by importing the suites one
+    after another. The result is added to the index."""
+
+    if env_id not in _env_id_to_suite:
+        for suite in ENV_SUITES:
+            import_module(suite)
+            if env_id in _registered_env_ids():
+                _env_id_to_suite[env_id] = suite
+                break
+        else:
+            raise ValueError(f"Environment {env_id} is not registered by any of {list(ENV_SUITES)}.")
+    return _env_id_to_suite[env_id]
+
+
+def import_env_suite(env_id):
+    """Import only the package registering env_id and return its name."""
+
+    suite = resolve_env_suite(env_id)
+    import_module(suite)
+    return suite
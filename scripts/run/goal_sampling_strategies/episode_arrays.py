@@ -0,0 +1,138 @@
+from abc import abstractmethod
+
+import numpy as np
+
+# graph_rl.algorithms only imports after graph_rl.graphs (circular imports)
+import graph_rl.graphs
+from graph_rl.algorithms import GoalSamplingStrategy
+
+
+# flags in EpisodeArrays.kinds
+TESTING = 1
+CHILD_ACHIEVED = 2
+ENV_DONE = 4
+
+
+def flatten_goal(goal, goal_space=None):
+    """Flat array of achieved goal (goal part of timed goals).
+
+    Dict goals are flattened with goal_space or, if it is not known, by
+    concatenating their items in sorted order like DictSpace.flatten_value."""
+
+    if isinstance(goal, dict) and "delta_t_ach" in goal:
+        goal = goal["goal"]
+    if isinstance(goal, dict):
+        if goal_space is not None:
+            return goal_space.flatten_value(goal)
+        return np.concatenate([np.ravel(goal[key]) for key in sorted(goal)])
+    return goal
+
+
+class EpisodeArrays():
+    """Episode of a node stacked into arrays (one entry per transition).
+
+    achieved_goals: flat achieved goals after the transitions (goal part of
+        achieved timed goals), shape (n_transitions, goal_dim).
+    t: time after the transitions in env steps (NaN if not available,
+        e.g. for HAC).
+    kinds: combination of the flags TESTING (child used deterministic
+        policy), CHILD_ACHIEVED (child achieved its subgoal) and ENV_DONE.
+    transitions: the transitions of the episode.
+    cache: dict in which strategies can keep results which only depend
+        on the episode.
+
+    The arrays are stacked when they are first accessed.
+    """
+
+    def __init__(self, episode_transitions, goal_space=None):
+        # copy as algorithms clear and reuse the list of episode transitions
+        self.transitions = list(episode_transitions)
+        self.cache = {}
+        self._goal_space = goal_space
+        self._achieved_goals = None
+        self._t = None
+        self._kinds = None
+
+    @property
+    def achieved_goals(self):
+        if self._achieved_goals is None:
+            goals = [flatten_goal(trans.subtask_tr.info["achieved_generalized_goal"], self._goal_space)
+                    for trans in self.transitions]
+            self._achieved_goals = np.array(goals, dtype=float).reshape(len(goals), -1)
+        return self._achieved_goals
+
+    @property
+    def t(self):
+        if self._t is None:
+            self._t = np.array([trans.subtask_tr.info.get("t", np.nan) for trans in self.transitions], dtype=float)
+        return self._t
+
+    @property
+    def kinds(self):
+        if self._kinds is None:
+            kinds = []
+            for trans in self.transitions:
+                kind = 0
+                if trans.algo_info is not None and trans.algo_info.get("child_be_deterministic", False):
+                    kind |= TESTING
+                if trans.child_feedback is not None and trans.child_feedback.get("has_achieved", False):
+                    kind |= CHILD_ACHIEVED
+                if trans.env_info.done:
+                    kind |= ENV_DONE
+                kinds.append(kind)
+            self._kinds = np.array(kinds, dtype=np.int8)
+        return self._kinds
+
+    def __len__(self):
+        return len(self.transitions)
+
+    def is_stack_of(self, episode_transitions):
+        """Whether these arrays were stacked from the transitions in episode_transitions.
+
+        Episodes only grow by appending, so comparing the length and the
+        first and last transition (which are kept alive by this object)
+        suffices."""
+
+        return len(episode_transitions) == len(self.transitions) and len(self.transitions) > 0 \
+                and episode_transitions[0] is self.transitions[0] \
+                and episode_transitions[-1] is self.transitions[-1]
+
+
+class ArrayGoalSamplingStrategy(GoalSamplingStrategy):
+    """Goal sampling strategy operating on an episode stacked into arrays.
+
+    Subclasses implement sample_indices which can select transitions with
+    vectorized predicates on the arrays of EpisodeArrays."""
+
+    _episode = None
+
+    def __call__(self, episode_transitions, n_hindsight_goals):
+        # the algorithm calls the strategy once per transition of the same episode
+        if self._episode is None or not self._episode.is_stack_of(episode_transitions):
+            self._episode = EpisodeArrays(episode_transitions)
+        indices = self.sample_indices(self._episode, n_hindsight_goals)
+        return indices.tolist() if isinstance(indices, np.ndarray) else list(indices)
+
+    def __getstate__(self):
+        # the stacked episode is only a cache
+        state = self.__dict__.copy()
+        state.pop("_episode", None)
+        return state
+
+    @abstractmethod
+    def sample_indices(self, episode, n_hindsight_goals):
+        """Return array of indices of transitions from which goals are generated."""
+        pass
+
+
+class ListGoalSamplingStrategyAdapter(ArrayGoalSamplingStrategy):
+    """Offer array interface for goal sampling strategy operating on list of transitions."""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+
+    def __call__(self, episode_transitions, n_hindsight_goals):
+        return self.strategy(episode_transitions, n_hindsight_goals)
+
+    def sample_indices(self, episode, n_hindsight_goals):
+        return np.array(self.strategy(episode.transitions, n_hindsight_goals), dtype=int)
@@ -1,20 +1,15 @@
-from graph_rl.algorithms import GoalSamplingStrategy
-from graph_rl.algorithms import HAC
+import numpy as np
 
-class Tennis2DGSS(GoalSamplingStrategy):
+from .episode_arrays import ArrayGoalSamplingStrategy
 
-    def __call__(self, episode_transitions, n_hindsight_goals):
-        """Hindsight goal is constructed from achieved goal at contact between ball and ground."""
-
-        indices = []
-        for i, trans in enumerate(episode_transitions):
-            if isinstance(trans, HAC._Transition):
-                achieved_goal = trans.subtask_tr.info["achieved_generalized_goal"]
-            else:
-                achieved_goal = trans.subtask_tr.info["achieved_generalized_goal"]["goal"]
-            if achieved_goal[2] == 1.:
-                indices.append(i)
+class Tennis2DGSS(ArrayGoalSamplingStrategy):
 
-        assert len(indices) <= 1
-        return indices
+    def sample_indices(self, episode, n_hindsight_goals):
+        """Hindsight goal is constructed from achieved goal at contact between ball and ground."""
 
+        # the same for all transitions of the episode
+        if "contacts" not in episode.cache:
+            indices = np.flatnonzero(episode.achieved_goals[:, 2] == 1.)
+            assert len(indices) <= 1
+            episode.cache["contacts"] = indices
+        return episode.cache["contacts"]
@@ -1,4 +1,3 @@
-import numpy as np
 import torch
 
 from graph_rl.graphs import HiTSGraph, HACGraph
@@ -6,6 +5,9 @@ from graph_rl.utils import listify
 
 from .models import get_mlp_model
 from .interruption_policies.string_to_ip import get_ip_callable
+from .replay_buffers import create_replay_buffer, pop_replay_storage_kwargs
+from .memory_plan import plan_memory, print_memory_plan
+from .lazy_relabeling import enable_lazy_relabeling, pop_hindsight_relabeling
 
 def create_graph(env, graph_params, run_params, subtask_specs, level_algo_kwargs_list):
     """Create and return graph based on parameters, subtask specs and mapping to environment goal."""
@@ -17,6 +19,17 @@ def create_graph(env, graph_params, run_params, subtask_specs, level_algo_kwargs
 
     assert graph_params["algorithm"] in graph_func_dict
 
+    # storage of replay buffers is not an argument of HiTS/HAC
+    replay_storage_kwargs_list = [pop_replay_storage_kwargs(algo_kwargs) for algo_kwargs in level_algo_kwargs_list]
+
+    # set buffer sizes (fitting into run_params["memory_budget"] if given)
+    memory_plan = plan_memory(graph_params["algorithm"], env, run_params["n_steps"], subtask_specs, 
+            level_algo_kwargs_list, run_params.get("memory_budget", None))
+    print_memory_plan(memory_plan, run_params.get("memory_budget", None))
+
+    # hindsight relabeling is not an argument of HiTS/HAC either
+    relabeling_list = [pop_hindsight_relabeling(algo_kwargs) for algo_kwargs in level_algo_kwargs_list]
+
     # construct graph
     graph = graph_func_dict[graph_params["algorithm"]](
             env = env, 
@@ -31,35 +44,26 @@ def create_graph(env, graph_params, run_params, subtask_specs, level_algo_kwargs
         if "interruption_policy" in l and l["interruption_policy"] != "None":
             node.interruption_policy = get_ip_callable(l["interruption_policy"])
 
+    # replace replay buffers if a different storage is indicated in algo_kwargs
+    for replay_storage_kwargs, node in zip(replay_storage_kwargs_list, nodes):
+        if replay_storage_kwargs:
+            node.algorithm._replay_buffer = create_replay_buffer(node.algorithm._buffer_size, **replay_storage_kwargs)
+
+    # store transitions once and relabel them with hindsight goals at sample time
+    for relabeling, replay_storage_kwargs, node in zip(relabeling_list, replay_storage_kwargs_list, nodes):
+        if relabeling == "lazy":
+            if replay_storage_kwargs.get("replay_storage", "memory") != "memory":
+                raise ValueError("Lazy hindsight relabeling requires replay_storage \"memory\".")
+            enable_lazy_relabeling(node)
+
     return graph
 
 def create_graph_hits(env, n_layers, n_steps, subtask_specs, level_algo_kwargs_list):
-    """Create and return HiTS graph."""
+    """Create and return HiTS graph (buffer sizes are set by create_graph)."""
 
     if "child_failure_penalty" not in level_algo_kwargs_list[-1]:
         level_algo_kwargs_list[-1]["child_failure_penalty"] = -subtask_specs[-1]._max_n_actions
 
-    # If buffer size not specified, set it such that all transitions will fit into buffer
-    # (assuming that the episodes always last for env.max_episode_length which is not the 
-    # case in general).
-    # This requires the env to have an attribute max_apisode_length.
-    # NOTE: The calculation max number of episodes = n_steps/max_episode_length is optimistic because it 
-    # disregards the possibility of having much shorter episodes which still make use of the maximum
-    # number of subgoals.
-    for i in range(n_layers):
-        if "buffer_size" not in level_algo_kwargs_list[i]:
-            n_goals = level_algo_kwargs_list[i]["n_hindsight_goals"] + 1
-            bs_factor = level_algo_kwargs_list[i]["buffer_size_factor"] if "buffer_size_factor" in level_algo_kwargs_list[i] else 1.0
-            if i == n_layers - 1:
-                level_algo_kwargs_list[i]["buffer_size"] = int(bs_factor*
-                        n_steps/env.max_episode_length*subtask_specs[i]._max_n_actions)*n_goals
-            else:
-                # TODO: Can this be optimized?
-                level_algo_kwargs_list[i]["buffer_size"] = int(bs_factor*n_steps)*n_goals
-            print(f"Buffer size level {i}: {level_algo_kwargs_list[i]['buffer_size']}")
-            if "buffer_size_factor" in level_algo_kwargs_list[i]:
-                del level_algo_kwargs_list[i]["buffer_size_factor"]
-
     graph = HiTSGraph(
         name = "hits_graph",
         n_layers = n_layers, 
@@ -73,22 +77,7 @@ def create_graph_hits(env, n_layers, n_steps, subtask_specs, level_algo_kwargs_l
     return graph
 
 def create_graph_hac(env, n_layers, n_steps, subtask_specs, level_algo_kwargs_list):
-    """Create and return HAC graph."""
-
-    # If buffer size not specified, set it such that all transitions will fit into buffer
-    # (assuming that the episodes always last for env.max_episode_length which is not the 
-    # case in general).
-    # This requires the env to have an attribute max_apisode_length.
-    max_n_actions_list = [ss._max_n_actions for ss in subtask_specs]
-    for i in range(n_layers):
-        if "buffer_size" not in level_algo_kwargs_list[i]:
-            n_goals = level_algo_kwargs_list[i]["n_hindsight_goals"] + 1
-            bs_factor = level_algo_kwargs_list[i]["buffer_size_factor"] if "buffer_size_factor" in level_algo_kwargs_list[i] else 1.0
-            level_algo_kwargs_list[i]["buffer_size"] = int(bs_factor
-                    *n_steps/env.max_episode_length*np.prod(max_n_actions_list[i:]))*n_goals
-            print(f"Buffer size level {i}: {level_algo_kwargs_list[i]['buffer_size']}")
-            if "buffer_size_factor" in level_algo_kwargs_list[i]:
-                del level_algo_kwargs_list[i]["buffer_size_factor"]
+    """Create and return HAC graph (buffer sizes are set by create_graph)."""
 
     graph = HACGraph(
         name = "hac_graph",
@@ -0,0 +1,115 @@
+from collections.abc import Mapping
+from functools import update_wrapper
+
+import numpy as np
+
+
+def stack_obs(obs_list):
+    """Stack observations (dicts or arrays) into a batch with leading batch dimension."""
+
+    if isinstance(obs_list[0], dict):
+        return {key: stack_obs([obs[key] for obs in obs_list]) for key in obs_list[0]}
+    return np.stack([np.asarray(obs) for obs in obs_list])
+
+
+def expand_obs(obs):
+    """Batch of size one containing obs (without copying arrays)."""
+
+    if isinstance(obs, dict):
+        return {key: expand_obs(value) for key, value in obs.items()}
+    return np.asarray(obs)[None]
+
+
+def get_batch_size(batched_obs):
+    if isinstance(batched_obs, dict):
+        return get_batch_size(next(iter(batched_obs.values())))
+    return len(batched_obs)
+
+
+class IndexedObs(Mapping):
+    """Observation with index i of a batched dict observation.
+
+    Items are only indexed when they are accessed."""
+
+    def __init__(self, batched_obs, i):
+        self._batched_obs = batched_obs
+        self._i = i
+
+    def __getitem__(self, key):
+        return index_obs(self._batched_obs[key], self._i)
+
+    def __iter__(self):
+        return iter(self._batched_obs)
+
+    def __len__(self):
+        return len(self._batched_obs)
+
+
+def index_obs(batched_obs, i):
+    """Return observation with index i from batch."""
+
+    if isinstance(batched_obs, dict):
+        return IndexedObs(batched_obs, i)
+    return batched_obs[i]
+
+
+class BatchedInterruptionPolicy():
+    """Interruption policy evaluated for a batch of environments at once.
+
+    Wraps a function mapping batched env observations and subtask
+    observations (arrays or dicts of arrays with leading batch dimension)
+    to a boolean mask. Can be used as decorator. Calling it with the
+    observations of a single environment (as the nodes of a graph do)
+    evaluates a batch of size one unless a version for single environments
+    is provided with the single decorator:
+
+        @BatchedInterruptionPolicy
+        def policy(env_obs, subtask_obs):
+            ...
+
+        @policy.single
+        def policy(env_obs, subtask_obs):
+            ...
+    """
+
+    def __init__(self, batched_policy):
+        update_wrapper(self, batched_policy)
+        self._batched_policy = batched_policy
+        self._single_policy = None
+
+    def single(self, single_policy):
+        """Decorator providing version of the policy for a single environment."""
+
+        self._single_policy = single_policy
+        return self
+
+    def batched(self, env_obs, subtask_obs):
+        """Return boolean mask indicating which environments to interrupt."""
+
+        return np.asarray(self._batched_policy(env_obs, subtask_obs), dtype=bool)
+
+    def __call__(self, env_obs, subtask_obs):
+        if self._single_policy is not None:
+            return bool(self._single_policy(env_obs, subtask_obs))
+        return bool(self.batched(expand_obs(env_obs), expand_obs(subtask_obs))[0])
+
+
+class ScalarInterruptionPolicyAdapter(BatchedInterruptionPolicy):
+    """Evaluate interruption policy for single environments on batches (in a loop)."""
+
+    def __init__(self, policy):
+        update_wrapper(self, policy)
+        self._policy = policy
+        self._single_policy = policy
+
+    def batched(self, env_obs, subtask_obs):
+        return np.array([self._policy(index_obs(env_obs, i), index_obs(subtask_obs, i))
+            for i in range(get_batch_size(env_obs))], dtype=bool)
+
+
+def as_batched(policy):
+    """Wrap scalar interruption policy such that it supports batched evaluation."""
+
+    if isinstance(policy, BatchedInterruptionPolicy):
+        return policy
+    return ScalarInterruptionPolicyAdapter(policy)
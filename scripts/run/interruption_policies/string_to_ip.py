@@ -1,28 +1,24 @@
-from importlib import import_module
 import inspect
-import os
+
+from ..plugins import registry
+from .batched import BatchedInterruptionPolicy, as_batched
+
+registry.add_kind("interruption_policy", __package__,
+        is_plugin = lambda obj: isinstance(obj, BatchedInterruptionPolicy) or inspect.isfunction(obj),
+        exclude = ["string_to_ip.py", "batched.py"])
 
 def get_interruption_policy_callables():
-    """Return dictionary with all callables defined in files in this directory.
-
-    This file is excluded from the search."""
-    this_file = os.path.split(__file__)[-1]
-    directory = os.path.dirname(__file__)
-    exclude = [this_file]
-    ip_files = [f for f in os.listdir(directory) 
-            if f.endswith(".py") and f not in exclude]
-    ip_callables = {}
-    for f in ip_files:
-        path = os.path.join(directory, f)
-        relative_import_string = "." + inspect.getmodulename(path)
-        module = import_module(relative_import_string, package=__package__)
-        for name in dir(module):
-            obj = getattr(module, name)
-            if callable(obj):
-                ip_callables[name] = obj
-
-    return ip_callables
+    """Return dictionary with all interruption policies defined in files in this directory or registered.
+
+    Names imported into the files are not included."""
+
+    return registry.get_all("interruption_policy")
 
 
 def get_ip_callable(name):
-    return get_interruption_policy_callables()[name]
+    """Get interruption policy by name.
+
+    Policies for single environments are wrapped such that they can also be
+    evaluated on batches (see BatchedInterruptionPolicy)."""
+
+    return as_batched(registry.get("interruption_policy", name))
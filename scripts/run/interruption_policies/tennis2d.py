@@ -1,4 +1,11 @@
+from .batched import BatchedInterruptionPolicy
+
+@BatchedInterruptionPolicy
 def tennis_2d_ip(env_obs, subtask_obs):
-    """Return True if the ball bounces off the floor for the 2nd time."""
+    """Return True if the ball bounces off the floor for the 2nd time (for a batch of envs)."""
+
+    return env_obs["achieved_goal"][:, 2] == 1.
 
+@tennis_2d_ip.single
+def tennis_2d_ip(env_obs, subtask_obs):
     return env_obs["achieved_goal"][2] == 1.
@@ -0,0 +1,374 @@
+"""Hindsight relabeling at sample time.
+
+By default, HAC and HiTS store every hindsight goal transition as a full
+copy of the transition in the replay buffer. With
+
+    "hindsight_relabeling": "lazy"
+
+in the algo_kwargs of a level, the transitions of an episode are stored
+only once, contiguously, together with the achieved goal, the time of the
+transition (HiTS) and the range of transitions of the same episode from
+which hindsight goals may be taken (future, final, episode or the indices
+returned by a GoalSamplingStrategy). The hindsight goals are chosen when
+a batch is drawn and rewards are recomputed for the whole batch at once.
+
+Rows are drawn with a probability proportional to the number of copies
+eager relabeling would have stored and relabeled with the corresponding
+probability, so that batches follow the same distribution in
+expectation.
+"""
+
+from functools import partial
+
+import numpy as np
+import tianshou as ts
+from tianshou.data import Batch
+
+# graph_rl.algorithms only imports after graph_rl.graphs (circular imports)
+import graph_rl.graphs
+from graph_rl.algorithms import GoalSamplingStrategy, HiTS
+from graph_rl.spaces import BoxSpace
+from graph_rl.subtasks import DictInfoHidingTolTGSubtaskSpec
+
+from .goal_sampling_strategies.episode_arrays import (ArrayGoalSamplingStrategy, EpisodeArrays,
+        ListGoalSamplingStrategyAdapter)
+
+
+def pop_hindsight_relabeling(algo_kwargs):
+    """Remove hindsight_relabeling ("eager" or "lazy") from algo_kwargs and return it."""
+
+    relabeling = algo_kwargs.pop("hindsight_relabeling", "eager")
+    if relabeling not in ("eager", "lazy"):
+        raise ValueError(f"Unknown hindsight relabeling {relabeling}.")
+    return relabeling
+
+
+def get_batched_achievement_criterion(task_spec):
+    """Return function mapping arrays of flat achieved and desired goals to boolean array.
+
+    Subtask specs can provide batched_goal_achievement_criterion, for Box
+    specs with a factorization the criterion is vectorized here. Otherwise
+    goal_achievement_criterion is called for every goal (without
+    parent_info)."""
+
+    if hasattr(task_spec, "batched_goal_achievement_criterion"):
+        return task_spec.batched_goal_achievement_criterion
+    if isinstance(task_spec.goal_space, BoxSpace) and hasattr(task_spec, "factorization"):
+        factors = [np.asarray(list(factor)) for factor in task_spec.factorization]
+        thresholds = list(task_spec._goal_achievement_threshold)
+
+        def criterion(achieved_goals, desired_goals):
+            achieved = np.ones(len(achieved_goals), dtype=bool)
+            for factor, threshold in zip(factors, thresholds):
+                achieved &= np.linalg.norm(achieved_goals[:, factor] - desired_goals[:, factor], axis=-1) < threshold
+            return achieved
+        return criterion
+
+    goal_space = task_spec.goal_space
+
+    def criterion(achieved_goals, desired_goals):
+        return np.array([task_spec.goal_achievement_criterion(goal_space.unflatten_value(a),
+            goal_space.unflatten_value(d), None) for a, d in zip(achieved_goals, desired_goals)], dtype=bool)
+    return criterion
+
+
+def _get_flat_slice(dict_space, key):
+    """Slice of key in flat values of dict_space (keys are flattened in sorted order)."""
+
+    keys = sorted(dict_space._space_dict)
+    start = sum(dict_space.get_flat_dim(keys=[k]) for k in keys[:keys.index(key)])
+    return slice(start, start + dict_space.get_flat_dim(keys=[key]))
+
+
+class HindsightReplayBuffer(ts.data.ReplayBuffer):
+    """Replay buffer which chooses hindsight goals when a batch is drawn.
+
+    Besides the usual fields, every row holds
+        ach_goal: flat goal achieved by the transition,
+        goal_low, goal_high: offsets (relative to the row) of the range of
+            rows hindsight goals are drawn from uniformly,
+        n_goals: number of hindsight goals eager relabeling would use,
+        t: time after the transition in env steps (timed goals only),
+        custom_goals: offsets returned by a GoalSamplingStrategy (padded
+            with CUSTOM_PAD, only with such a strategy).
+    After sample, indexing the buffer as well as its rew and done fields
+    refer to the relabeled batch (with indices 0, ..., batch_size - 1), as
+    tianshou's process_fn reads them from the buffer again. Adding a
+    transition restores the normal behavior.
+    """
+
+    CUSTOM_PAD = np.iinfo(np.int32).min
+
+    def __init__(self, size, goal_slice, criterion, max_n_goals, timed=None):
+        """
+        Args:
+            goal_slice: position of desired goal in flat observation.
+            criterion: batched goal achievement criterion.
+            max_n_goals: upper bound of n_goals.
+            timed: for timed goals a tuple (delta_t_index, convert_time,
+                unconvert_time) with the position of delta_t_ach in flat
+                observations and the time conversions of the subtask spec."""
+
+        super().__init__(size)
+        self._goal_slice = goal_slice
+        self._criterion = criterion
+        self._max_n_goals = max_n_goals
+        self._timed = timed
+        self._staged = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for key in ("_criterion", "_timed", "_staged"):
+            state.pop(key, None)
+        return state
+
+    @property
+    def rew(self):
+        return self._staged.rew if self._staged is not None else self._meta.rew
+
+    @property
+    def done(self):
+        return self._staged.done if self._staged is not None else self._meta.done
+
+    def __getitem__(self, index):
+        if self._staged is not None:
+            return self._staged[index]
+        return super().__getitem__(index)
+
+    def add(self, obs, act, rew, done, obs_next=None, info={}, policy={}, **kwargs):
+        """Add transition, kwargs contain the relabeling fields (see class docstring)."""
+
+        self._staged = None
+        for key, value in kwargs.items():
+            self._add_to_buffer(key, value)
+        super().add(obs, act, rew, done, obs_next, info, policy)
+
+    def _draw_rows(self, batch_size):
+        """Draw rows with probability proportional to 1 + n_goals (rejection sampling)."""
+
+        n_goals = self._meta.n_goals
+        rows = []
+        n_rows = 0
+        while n_rows < batch_size:
+            candidates = np.random.randint(self._size, size=batch_size)
+            accept = np.random.rand(batch_size)*(1. + self._max_n_goals) < 1. + n_goals[candidates]
+            rows.append(candidates[accept])
+            n_rows += len(rows[-1])
+        return np.concatenate(rows)[:batch_size]
+
+    def _draw_goal_offsets(self, rows):
+        """Return offsets of hindsight goal rows and mask of rows which have one."""
+
+        meta = self._meta.__dict__
+        rand = np.random.rand(len(rows))
+        if "custom_goals" in meta:
+            custom_goals = meta["custom_goals"][rows]
+            n_valid = (custom_goals != self.CUSTOM_PAD).sum(axis=-1)
+            column = np.minimum((rand*n_valid).astype(int), np.maximum(n_valid - 1, 0))
+            offsets = custom_goals[np.arange(len(rows)), column]
+            has_goal = n_valid > 0
+        else:
+            low = meta["goal_low"][rows]
+            high = meta["goal_high"][rows]
+            offsets = low + (rand*(high - low)).astype(int)
+            has_goal = high > low
+        # goal rows which have already been overwritten cannot be used
+        age = (self._index - 1 - rows) % self._maxsize - offsets
+        has_goal &= (age >= 0) & (age < self._size)
+        return np.where(has_goal, offsets, 0), has_goal
+
+    def sample(self, batch_size):
+        self._staged = None
+        meta = self._meta.__dict__
+        rows = self._draw_rows(batch_size)
+        obs = meta["obs"][rows]
+        obs_next = meta["obs_next"][rows]
+        rew = meta["rew"][rows]
+        done = meta["done"][rows]
+
+        # relabel with the probability eager relabeling would have
+        n_goals = meta["n_goals"][rows]
+        offsets, has_goal = self._draw_goal_offsets(rows)
+        relabel = has_goal & (np.random.rand(batch_size)*(1. + n_goals) < n_goals)
+        idx = np.nonzero(relabel)[0]
+        if len(idx) > 0:
+            goal_rows = (rows[idx] + offsets[idx]) % self._maxsize
+            goals = meta["ach_goal"][goal_rows]
+            obs[idx, self._goal_slice] = goals
+            obs_next[idx, self._goal_slice] = goals
+            achieved = self._criterion(meta["ach_goal"][rows[idx]], goals)
+            if self._timed is None:
+                rew[idx] = np.where(achieved, 0., -1.)
+                done[idx] = achieved
+            else:
+                delta_t_index, convert_time, unconvert_time = self._timed
+                t_current = meta["t"][rows[idx]]
+                t_goal = meta["t"][goal_rows]
+                # delta_t_ach uniformly from interval which would have run out in the
+                # step corresponding to the hindsight goal
+                rand_shift = np.random.rand(len(idx))
+                obs[idx, delta_t_index] = convert_time(t_goal - (t_current - 1) - rand_shift)
+                delta_t_new = convert_time(t_goal - t_current - rand_shift)
+                obs_next[idx, delta_t_index] = delta_t_new
+                ach_time_up = unconvert_time(delta_t_new) <= 0.
+                rew[idx] = np.where(ach_time_up & achieved, 1., 0.)
+                done[idx] = ach_time_up
+
+        self._staged = Batch(obs=obs, act=meta["act"][rows], rew=rew, done=done, obs_next=obs_next,
+                info=Batch(), policy=Batch())
+        return self._staged, np.arange(batch_size)
+
+
+def _goal_ranges(algorithm, episode_transitions):
+    """Return goal_low, goal_high (offsets) and n_goals for every transition of the episode."""
+
+    n = len(episode_transitions)
+    i = np.arange(n)
+    n_hindsight_goals = algorithm._n_hindsight_goals
+    strategy = algorithm._goal_sampling_strategy
+    ones = np.ones(n, dtype=int)
+    if isinstance(algorithm, HiTS):
+        if strategy == "future":
+            return 0*ones, n - i, 2.*(n - i)/n*n_hindsight_goals
+        elif strategy == "final":
+            return n - 1 - i, n - i, 1.*ones
+    elif n_hindsight_goals == 0:
+        return 0*ones, 0*ones, 0.*ones
+    elif strategy == "future":
+        return ones, n - i, np.minimum(n_hindsight_goals, n - 1 - i).astype(float)
+    elif strategy == "episode":
+        return -i, n - i, min(n_hindsight_goals, n)*ones.astype(float)
+    elif strategy == "final":
+        # only generate hindsight goal from final state if environment is done
+        has_goal = float(episode_transitions[-1].env_info.done)
+        return n - 1 - i, n - i, has_goal*ones
+    raise ValueError(f"Goal sampling strategy {strategy} not supported with lazy relabeling.")
+
+
+def _add_episode_lazily(algorithm, goal_space, parent_info, deterministic_episode, node_is_sink, sess_info):
+    """Replacement of HAC/HiTS._add_experience_to_flat_algo storing every transition once.
+
+    Testing transitions are stored after the other transitions of the
+    episode and are not relabeled (as with eager relabeling)."""
+
+    if algorithm._learn_from_deterministic_episodes or not deterministic_episode:
+        is_hits = isinstance(algorithm, HiTS)
+        transitions = algorithm._episode_transitions
+        n = len(transitions)
+        strategy = algorithm._goal_sampling_strategy
+        custom = isinstance(strategy, GoalSamplingStrategy)
+        if custom:
+            # array based strategies only need the episode stacked once, list based ones
+            # get the transitions
+            if isinstance(strategy, ListGoalSamplingStrategyAdapter):
+                strategy = strategy.strategy
+            if isinstance(strategy, ArrayGoalSamplingStrategy):
+                episode = EpisodeArrays(transitions, goal_space)
+            else:
+                episode = None
+            goal_low = goal_high = np.zeros(n, dtype=int)
+            n_goals = np.zeros(n)
+        else:
+            goal_low, goal_high, n_goals = _goal_ranges(algorithm, transitions)
+
+        ep_return = 0
+        testing_rows = []
+        for i, tr in enumerate(transitions):
+            ach_goal = tr.subtask_tr.info["achieved_generalized_goal"]
+            if is_hits:
+                ach_goal = ach_goal["goal"]
+                done = tr.subtask_tr.info["ach_time_up"]
+            elif algorithm._bootstrap_end_of_episode:
+                done = tr.subtask_tr.info.get("has_achieved", False)
+            else:
+                done = tr.subtask_tr.info.get("has_achieved", False) or tr.env_info.done
+            action = tr.subtask_tr.action
+            reward = tr.subtask_tr.reward
+            fields = {
+                    "ach_goal": np.asarray(goal_space.flatten_value(ach_goal), dtype=float),
+                    "goal_low": np.int32(goal_low[i]),
+                    "goal_high": np.int32(goal_high[i]),
+                    "n_goals": np.float32(n_goals[i])
+                    }
+            if is_hits:
+                fields["t"] = float(tr.subtask_tr.info["t"])
+            if custom:
+                # strategy is called for every transition as with eager relabeling
+                if episode is not None:
+                    indices = strategy.sample_indices(episode, algorithm._n_hindsight_goals)
+                else:
+                    indices = strategy(transitions, algorithm._n_hindsight_goals)
+                indices = np.array(indices, dtype=int)[:algorithm._n_hindsight_goals] % n
+                custom_goals = np.full(algorithm._n_hindsight_goals, HindsightReplayBuffer.CUSTOM_PAD, dtype=np.int32)
+                custom_goals[:len(indices)] = indices - i
+                fields["custom_goals"] = custom_goals
+                fields["n_goals"] = np.float32(len(indices))
+
+            if node_is_sink:
+                ep_return += reward
+            else:
+                testing_transition = tr.algo_info["child_be_deterministic"]
+                did_child_achieve_subgoal = tr.child_feedback["has_achieved"]
+                # testing transitions are added after the episode
+                if algorithm._use_testing_transitions \
+                   and (testing_transition or algorithm._use_normal_trans_for_testing) \
+                   and not did_child_achieve_subgoal:
+                    testing_done = done if algorithm._bootstrap_testing_transitions else True
+                    testing_rows.append((tr, action, algorithm._child_failure_penalty, testing_done, fields))
+                    ep_return += algorithm._child_failure_penalty
+                if not testing_transition or did_child_achieve_subgoal:
+                    ep_return += reward
+                # hindsight action transition
+                if not did_child_achieve_subgoal:
+                    if is_hits:
+                        action = dict(action, goal=tr.child_feedback["achieved_generalized_goal"]["goal"])
+                    else:
+                        action = tr.child_feedback["achieved_generalized_goal"]
+            _add_row(algorithm, tr, action, reward, done, fields)
+
+        for tr, action, reward, done, fields in testing_rows:
+            _add_row(algorithm, tr, action, reward, done, dict(fields, n_goals=np.float32(0.)))
+
+        if not is_hits and algorithm._tb_writer is not None:
+            algorithm._tb_writer.add_scalar(f"{algorithm.name}/ep_return", ep_return, sess_info.total_step)
+
+    algorithm._episode_transitions.clear()
+
+
+def _add_row(algorithm, tr, action, reward, done, fields):
+    flat_action = algorithm._action_space.flatten_value(action)
+    algorithm._replay_buffer.add(
+            obs = algorithm._observation_space.flatten_value(tr.subtask_tr.obs),
+            act = algorithm._map_action_to_default_space(flat_action),
+            rew = reward,
+            done = done,
+            obs_next = algorithm._observation_space.flatten_value(tr.subtask_tr.new_obs),
+            **fields)
+
+
+def enable_lazy_relabeling(node):
+    """Let algorithm of node store transitions once and relabel them at sample time."""
+
+    algorithm = node.algorithm
+    task_spec = node.subtask.task_spec
+    if node.subtask._aux_rewards:
+        raise ValueError(f"Lazy relabeling does not support auxiliary rewards (node {node.name}).")
+    # the criterion is evaluated without parent_info at sample time
+    if isinstance(task_spec, DictInfoHidingTolTGSubtaskSpec):
+        raise ValueError("Lazy relabeling does not support goal achievement thresholds chosen "
+                f"by the parent (learn_goal_ach_thresholds, node {node.name}).")
+    obs_space = node.subtask.observation_space
+    is_hits = isinstance(algorithm, HiTS)
+    if is_hits:
+        timed = (_get_flat_slice(obs_space, "delta_t_ach").start,
+                algorithm._convert_time, task_spec.unconvert_time)
+        max_n_goals = 2*algorithm._n_hindsight_goals
+    else:
+        timed = None
+        max_n_goals = max(algorithm._n_hindsight_goals, 1)
+    algorithm._replay_buffer = HindsightReplayBuffer(algorithm._buffer_size,
+            goal_slice = _get_flat_slice(obs_space, "desired_goal"),
+            criterion = get_batched_achievement_criterion(task_spec),
+            max_n_goals = max_n_goals,
+            timed = timed)
+    algorithm._add_experience_to_flat_algo = partial(_add_episode_lazily, algorithm, task_spec.goal_space)
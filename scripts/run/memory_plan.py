@@ -0,0 +1,191 @@
+import re
+from copy import deepcopy
+
+import numpy as np
+
+from graph_rl.spaces import space_from_gym_space
+from graph_rl.subtasks import ReturnMaximSubtaskSpec, TimedGoalSubtaskSpec
+
+
+# Bytes of a float in the replay buffer. The flat observations and actions
+# stored by graph_rl are float64 arrays.
+FLOAT_BYTES = 8
+
+_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+def parse_memory_size(value):
+    """Return number of bytes given as number or string like "16G" or "512MiB"."""
+
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)(i?B)?\s*", value, flags=re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Cannot parse memory size {value}.")
+    return int(float(match.group(1))*_UNITS[match.group(2).upper()])
+
+
+def format_bytes(n_bytes):
+    for unit in ("T", "G", "M", "K"):
+        if n_bytes >= _UNITS[unit]:
+            return f"{n_bytes/_UNITS[unit]:.2f} {unit}iB"
+    return f"{n_bytes} B"
+
+
+def get_level_dims(env, subtask_specs):
+    """Return flat observation and action dimension of every level (lowest level first)."""
+
+    dims = []
+    for i, spec in enumerate(subtask_specs):
+        if isinstance(spec, ReturnMaximSubtaskSpec):
+            obs_dim = spec.obs_space.get_flat_dim()
+        else:
+            obs_dim = spec.partial_obs_space.get_flat_dim() + spec.goal_space.get_flat_dim()
+            # timed goal subtasks also observe the time until achievement
+            if isinstance(spec, TimedGoalSubtaskSpec):
+                obs_dim += 1
+        if i == 0:
+            act_dim = space_from_gym_space(env.action_space).get_flat_dim()
+        else:
+            act_dim = subtask_specs[i - 1].parent_action_space.get_flat_dim()
+        dims.append((obs_dim, act_dim))
+    return dims
+
+
+def get_transition_bytes(obs_dim, act_dim):
+    """Bytes of one transition (obs, act, rew, done, obs_next) in the replay buffer."""
+
+    return FLOAT_BYTES*(2*obs_dim + act_dim + 1) + 1
+
+
+def get_lazy_relabeling_bytes(subtask_spec):
+    """Additional bytes per transition with lazy hindsight relabeling.
+
+    These are the achieved goal, the offsets of the goal range and the
+    number of hindsight goals (and the time for timed goals)."""
+
+    n_bytes = FLOAT_BYTES*subtask_spec.goal_space.get_flat_dim() + 3*4
+    if isinstance(subtask_spec, TimedGoalSubtaskSpec):
+        n_bytes += FLOAT_BYTES
+    return n_bytes
+
+
+def get_default_buffer_size(algorithm, level, env, n_steps, subtask_specs, algo_kwargs):
+    """Buffer size for which all transitions will fit into the buffer.
+
+    This assumes that the episodes always last for env.max_episode_length
+    which is not the case in general and requires the env to have an
+    attribute max_episode_length."""
+
+    # lazy relabeling stores every transition only once
+    if algo_kwargs.get("hindsight_relabeling", "eager") == "lazy":
+        n_goals = 1
+    else:
+        n_goals = algo_kwargs["n_hindsight_goals"] + 1
+    bs_factor = algo_kwargs.get("buffer_size_factor", 1.0)
+    n_layers = len(subtask_specs)
+    if algorithm == "HiTS":
+        # NOTE: The calculation max number of episodes = n_steps/max_episode_length is optimistic because it
+        # disregards the possibility of having much shorter episodes which still make use of the maximum
+        # number of subgoals.
+        if level == n_layers - 1:
+            return int(bs_factor*n_steps/env.max_episode_length*subtask_specs[level]._max_n_actions)*n_goals
+        else:
+            # every environment step results in at most n_goals transitions on
+            # the lower levels which is an upper bound independent of the episode
+            # length (hence a memory_budget is the way to shrink these buffers)
+            return int(bs_factor*n_steps)*n_goals
+    elif algorithm == "HAC":
+        max_n_actions_list = [ss._max_n_actions for ss in subtask_specs]
+        return int(bs_factor*n_steps/env.max_episode_length*np.prod(max_n_actions_list[level:]))*n_goals
+    else:
+        raise ValueError(f"Unknown algorithm {algorithm}.")
+
+
+def plan_memory(algorithm, env, n_steps, subtask_specs, level_algo_kwargs_list, memory_budget=None):
+    """Determine buffer size of every level and the memory the buffers need.
+
+    Buffer sizes given in algo_kwargs are kept. The others are set to the
+    default size. If a memory_budget is given, the remaining budget is
+    distributed among these levels such that every buffer can hold at
+    least one batch, small buffers keep their default size and the larger
+    ones get equal shares. Raises ValueError if the budget is too small
+    for that. The buffer sizes are written into level_algo_kwargs_list.
+    Returns the plan as a list of dicts (lowest level first)."""
+
+    plan = []
+    for i, (algo_kwargs, (obs_dim, act_dim)) in enumerate(zip(level_algo_kwargs_list,
+            get_level_dims(env, subtask_specs))):
+        fixed = "buffer_size" in algo_kwargs
+        if fixed:
+            default_size = algo_kwargs["buffer_size"]
+        else:
+            default_size = get_default_buffer_size(algorithm, i, env, n_steps, subtask_specs, algo_kwargs)
+        transition_bytes = get_transition_bytes(obs_dim, act_dim)
+        if algo_kwargs.get("hindsight_relabeling", "eager") == "lazy":
+            transition_bytes += get_lazy_relabeling_bytes(subtask_specs[i])
+        plan.append({
+            "level": i,
+            "obs_dim": obs_dim,
+            "act_dim": act_dim,
+            "transition_bytes": transition_bytes,
+            "default_size": default_size,
+            "buffer_size": default_size,
+            "min_size": min(default_size, algo_kwargs.get("batch_size", 1)),
+            "fixed": fixed
+            })
+
+    if memory_budget is not None:
+        budget = parse_memory_size(memory_budget) - sum(p["buffer_size"]*p["transition_bytes"]
+                for p in plan if p["fixed"])
+        flexible = [p for p in plan if not p["fixed"]]
+        # every flexible level needs room for at least one batch
+        min_bytes = sum(p["min_size"]*p["transition_bytes"] for p in flexible)
+        if budget < min_bytes:
+            raise ValueError(f"Memory budget of {format_bytes(parse_memory_size(memory_budget))} is too small, "
+                    f"buffer sizes given in algo_kwargs need {format_bytes(parse_memory_size(memory_budget) - budget)} "
+                    f"and the other levels at least {format_bytes(min_bytes)} to hold one batch.")
+        budget -= min_bytes
+        # fill levels in the order of their needed memory, each gets at most an
+        # equal share of what is left
+        flexible.sort(key=lambda p: (p["default_size"] - p["min_size"])*p["transition_bytes"])
+        for j, p in enumerate(flexible):
+            share = budget//(len(flexible) - j)
+            extra = min(p["default_size"] - p["min_size"], share//p["transition_bytes"])
+            p["buffer_size"] = p["min_size"] + extra
+            budget -= extra*p["transition_bytes"]
+
+    for p, algo_kwargs in zip(plan, level_algo_kwargs_list):
+        p["bytes"] = p["buffer_size"]*p["transition_bytes"]
+        algo_kwargs["buffer_size"] = p["buffer_size"]
+        if "buffer_size_factor" in algo_kwargs:
+            del algo_kwargs["buffer_size_factor"]
+    return plan
+
+
+def print_memory_plan(plan, memory_budget=None):
+    print("level  obs_dim  act_dim  bytes/transition  default size  buffer size        memory")
+    for p in plan:
+        print(f"{p['level']:5d}  {p['obs_dim']:7d}  {p['act_dim']:7d}  {p['transition_bytes']:16d}  "
+                f"{p['default_size']:12d}  {p['buffer_size']:11d}{'*' if p['fixed'] else ' '}  {format_bytes(p['bytes']):>12s}")
+    total = f"total: {format_bytes(sum(p['bytes'] for p in plan))}"
+    if memory_budget is not None:
+        total += f" of {format_bytes(parse_memory_size(memory_budget))} budget"
+    print(total + " (* buffer size given in algo_kwargs)")
+
+
+def dry_run(run_params, graph_params):
+    """Print memory plan of run without creating the graph or training."""
+
+    from .core import check_single_env, make_env
+    from .subtask_spec_factories.string_to_subtask_spec_class import get_subtask_spec_factory_class
+
+    check_single_env(run_params)
+    env = make_env(run_params)
+    subtask_spec_cl = get_subtask_spec_factory_class(graph_params["subtask_spec_factory"])
+    subtask_specs = subtask_spec_cl.produce(env, graph_params)
+    level_algo_kwargs_list = [deepcopy(l["algo_kwargs"]) for l in graph_params["level_params_list"]]
+    plan = plan_memory(graph_params["algorithm"], env, run_params["n_steps"], subtask_specs,
+            level_algo_kwargs_list, run_params.get("memory_budget", None))
+    print_memory_plan(plan, run_params.get("memory_budget", None))
+    return plan
@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from .core import load_params
+from .state_checkpoints import finished_step
+
+
+def derive_seed(base_seed, run_index):
+    """Derive seed of run from seed in run_params.json and index of run."""
+
+    seed_seq = np.random.SeedSequence(base_seed, spawn_key=(run_index,))
+    return int(seed_seq.generate_state(1)[0] % 2**31)
+
+
+def get_run_dir(dir_path, run_index):
+    return os.path.join(dir_path, "runs", f"run_{run_index}")
+
+
+def prepare_run_dirs(dir_path, n_runs):
+    """Create one directory per run containing its parameters.
+
+    Existing run directories are left unchanged so that interrupted runs
+    can be resumed with the parameters they were started with."""
+
+    run_params, graph_params, varied_hps = load_params(dir_path)
+    run_dirs = []
+    for i in range(n_runs):
+        run_dir = get_run_dir(dir_path, i)
+        if not os.path.isfile(os.path.join(run_dir, "run_params.json")):
+            os.makedirs(run_dir, exist_ok = True)
+            params = {
+                "run_params.json": dict(run_params, seed=derive_seed(run_params["seed"], i), n_runs=1),
+                "graph_params.json": graph_params,
+                "varied_hp.json": varied_hps
+            }
+            for file_name, p in params.items():
+                with open(os.path.join(run_dir, file_name), "w") as json_file:
+                    json.dump(p, json_file, indent = 4)
+        run_dirs.append(run_dir)
+    return run_dirs
+
+
+def get_run_status(run_dir):
+    """Return status of run ("pending", "interrupted" or "finished") and current step."""
+
+    step_path = os.path.join(run_dir, "state", "step.json")
+    if not os.path.isfile(step_path):
+        return "pending", 0
+    with open(step_path, "r") as json_file:
+        step = json.load(json_file)["step"]
+    with open(os.path.join(run_dir, "run_params.json"), "r") as json_file:
+        n_steps = json.load(json_file)["n_steps"]
+    # a finished run only keeps its final step in step.json
+    if step >= n_steps or finished_step(run_dir) is not None:
+        return "finished", step
+    return "interrupted", step
+
+
+def write_status_summary(dir_path, run_dirs, return_codes=None):
+    """Print status of all runs and save it in runs/status.json."""
+
+    return_codes = {} if return_codes is None else return_codes
+    summary = []
+    for i, run_dir in enumerate(run_dirs):
+        status, step = get_run_status(run_dir)
+        if return_codes.get(i, 0) != 0:
+            status = "failed"
+        with open(os.path.join(run_dir, "run_params.json"), "r") as json_file:
+            seed = json.load(json_file)["seed"]
+        summary.append({"run": i, "seed": seed, "status": status, "step": step, "dir": run_dir})
+        print(f"run {i:3d}  seed {seed:10d}  {status:12s} step {step}")
+    with open(os.path.join(dir_path, "runs", "status.json"), "w") as json_file:
+        json.dump(summary, json_file, indent = 4)
+    return summary
+
+
+def get_available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def launch_run(run_dir, cores):
+    """Start run in separate process pinned to the given cores."""
+
+    def pin_to_cores():
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+
+    log_file = open(os.path.join(run_dir, "stdout.txt"), "a")
+    process = subprocess.Popen([sys.executable, "-m", "scripts.run.run_from_files", run_dir],
+            stdout=log_file, stderr=subprocess.STDOUT, preexec_fn=pin_to_cores)
+    log_file.close()
+    return process
+
+
+def run_all(dir_path, n_runs=None, max_parallel=None, poll_interval=5.):
+    """Execute n_runs seeds of the run specified in dir_path in parallel.
+
+    Every run gets its own directory in dir_path/runs with a derived seed
+    as well as its own log and state directory. Runs are packed onto the
+    available cores according to torch_num_threads in run_params.json.
+    Interrupted runs are resumed, finished runs are skipped."""
+
+    run_params, _, _ = load_params(dir_path)
+    n_runs = run_params.get("n_runs", 1) if n_runs is None else n_runs
+    run_dirs = prepare_run_dirs(dir_path, n_runs)
+
+    # pack runs onto cores
+    cores = get_available_cores()
+    threads_per_run = min(run_params.get("torch_num_threads", None) or 1, len(cores))
+    n_slots = len(cores)//threads_per_run
+    if max_parallel is not None:
+        n_slots = min(n_slots, max_parallel)
+    free_slots = [cores[i*threads_per_run:(i + 1)*threads_per_run] for i in range(n_slots)]
+
+    queue = [i for i, run_dir in enumerate(run_dirs) if get_run_status(run_dir)[0] != "finished"]
+    print(f"Executing {len(queue)} of {n_runs} runs, {n_slots} in parallel.")
+    running = {}
+    return_codes = {}
+    while queue or running:
+        while queue and free_slots:
+            i = queue.pop(0)
+            slot = free_slots.pop(0)
+            running[i] = (launch_run(run_dirs[i], slot), slot)
+        time.sleep(poll_interval)
+        for i, (process, slot) in list(running.items()):
+            if process.poll() is not None:
+                return_codes[i] = process.returncode
+                free_slots.append(slot)
+                del running[i]
+
+    return write_status_summary(dir_path, run_dirs, return_codes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Perform n_runs runs with different seeds based on parameters "
+        "read from json files in provided directory."
+    )
+    parser.add_argument(
+        "dir",
+        default=None,
+        help="Directory with json files containing parameters for run."
+    )
+    parser.add_argument(
+        "--n_runs",
+        default=None,
+        type=int,
+        help="Overwrites number of runs specified in run_params.json."
+    )
+    parser.add_argument(
+        "--max_parallel",
+        default=None,
+        type=int,
+        help="Maximum number of runs executed in parallel."
+    )
+    parser.add_argument(
+        "--status",
+        default=False,
+        action="store_true",
+        help="Only print status of runs."
+    )
+    args = parser.parse_args()
+
+    if args.status:
+        run_params, _, _ = load_params(args.dir)
+        n_runs = run_params.get("n_runs", 1) if args.n_runs is None else args.n_runs
+        write_status_summary(args.dir, prepare_run_dirs(args.dir, n_runs))
+    else:
+        run_all(args.dir, args.n_runs, args.max_parallel)
@@ -0,0 +1,157 @@
+"""Registry of plugins named in graph_params.json.
+
+There are three kinds of plugins: subtask spec factories, goal sampling
+strategies and interruption policies. Plugins are found in the files of
+the package of their kind, registered explicitly with the register
+decorator or provided by installed distributions via the entry point
+group "hits.<kind>" (e.g. "hits.interruption_policy").
+
+The modules defining the plugins of a package are recorded in an index
+file, so that looking up a plugin only imports its module. The index of
+a package is checked against the files of the package the first time a
+plugin of its kind is looked up in a process and rebuilt (by importing
+all its files once) when files have been added, removed or modified.
+"""
+
+from importlib import import_module
+import inspect
+import json
+import os
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    try:
+        import importlib_metadata
+    except ImportError:
+        importlib_metadata = None
+
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "plugin_index.json")
+
+
+class PluginRegistry():
+
+    def __init__(self, index_path=INDEX_PATH):
+        self._index_path = index_path
+        self._kinds = {}
+        self._registered = {}
+        self._index = None
+        # kinds whose index has been checked against their files
+        self._validated = set()
+
+    def add_kind(self, kind, package, is_plugin, exclude=()):
+        """Add kind of plugins found in the files of package.
+
+        Args:
+            is_plugin: Maps an object defined in one of the files to True if
+                it is a plugin.
+            exclude: Files of the package which do not contain plugins."""
+
+        self._kinds[kind] = (package, is_plugin, set(exclude))
+        self._registered.setdefault(kind, {})
+
+    def register(self, kind, name=None):
+        """Decorator registering a plugin under name (its __name__ by default)."""
+
+        def decorator(obj):
+            self._registered.setdefault(kind, {})[name if name is not None else obj.__name__] = obj
+            return obj
+        return decorator
+
+    def get(self, kind, name):
+        """Return plugin of kind by name."""
+
+        registered = self._registered[kind]
+        if name in registered:
+            return registered[name]
+        module_name = self._get_kind_index(kind)["plugins"].get(name)
+        if module_name is not None:
+            module = import_module(module_name)
+            if name in registered:
+                return registered[name]
+            if hasattr(module, name):
+                return getattr(module, name)
+        for entry_point in self._get_entry_points(kind):
+            if entry_point.name == name:
+                registered[name] = entry_point.load()
+                return registered[name]
+        raise KeyError(f"Unknown {kind} {name}.")
+
+    def get_all(self, kind):
+        """Return dictionary with all plugins of kind (imports all of them)."""
+
+        for entry_point in self._get_entry_points(kind):
+            if entry_point.name not in self._registered[kind]:
+                self._registered[kind][entry_point.name] = entry_point.load()
+        return {name: self.get(kind, name) for name in
+                set(self._get_kind_index(kind)["plugins"]) | set(self._registered[kind])}
+
+    def _get_entry_points(self, kind):
+        if importlib_metadata is None:
+            return []
+        entry_points = importlib_metadata.entry_points()
+        group = f"hits.{kind}"
+        if hasattr(entry_points, "select"):
+            return entry_points.select(group=group)
+        return entry_points.get(group, [])
+
+    def _get_files(self, kind):
+        package, _, exclude = self._kinds[kind]
+        directory = list(import_module(package).__path__)[0]
+        return {f: os.stat(os.path.join(directory, f)).st_mtime_ns for f in sorted(os.listdir(directory))
+                if f.endswith(".py") and f != "__init__.py" and f not in exclude}
+
+    def _get_kind_index(self, kind):
+        """Return index of kind, rebuild it if the files of the package changed.
+
+        The files are only listed for the first lookup of kind."""
+
+        if kind in self._validated:
+            return self._index[kind]
+        if self._index is None:
+            try:
+                with open(self._index_path, "r") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        files = self._get_files(kind)
+        kind_index = self._index.get(kind)
+        if kind_index is None or kind_index["files"] != files:
+            kind_index = {"files": files, "plugins": self._find_plugins(kind, files)}
+            self._index[kind] = kind_index
+            self._write_index()
+        self._validated.add(kind)
+        return kind_index
+
+    def _find_plugins(self, kind, files):
+        """Import all files of the package of kind and return dict mapping plugin names to modules."""
+
+        package, is_plugin, _ = self._kinds[kind]
+        plugins = {}
+        for f in files:
+            module = import_module("." + inspect.getmodulename(f), package=package)
+            for name, obj in vars(module).items():
+                # imported names belong to other modules
+                if getattr(obj, "__module__", None) == module.__name__ and not name.startswith("_") \
+                        and is_plugin(obj):
+                    plugins[name] = module.__name__
+        for name, obj in self._registered[kind].items():
+            module_name = getattr(obj, "__module__", None)
+            if module_name is not None and module_name.startswith(package + "."):
+                plugins[name] = module_name
+        return plugins
+
+    def _write_index(self):
+        # the index is only a cache, so failing to write it is not an error
+        tmp_path = self._index_path + f".{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._index, f, indent = 4)
+            os.replace(tmp_path, self._index_path)
+        except OSError:
+            pass
+
+
+registry = PluginRegistry()
+register = registry.register
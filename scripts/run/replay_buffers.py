@@ -0,0 +1,91 @@
+import os
+import tempfile
+
+import numpy as np
+import tianshou as ts
+
+
+# Keys in algo_kwargs of a level which select the storage of its replay
+# buffer. They are removed before the algo_kwargs are passed to HiTS/HAC.
+REPLAY_STORAGE_KEYS = ("replay_storage", "replay_dir", "replay_flush_interval")
+
+
+def pop_replay_storage_kwargs(algo_kwargs):
+    """Remove replay storage keys from algo_kwargs and return them."""
+
+    return {key: algo_kwargs.pop(key) for key in REPLAY_STORAGE_KEYS if key in algo_kwargs}
+
+
+class MemmapReplayBuffer(ts.data.ReplayBuffer):
+    """Replay buffer keeping every field in a memory-mapped file.
+
+    Each field (obs, act, rew, ...) is stored column-wise in its own file
+    in replay_dir (the temporary directory by default). The files are
+    unlinked right after they have been mapped, so they disappear with
+    the process. Every flush_interval transitions the modified pages are
+    written back to disk, which bounds the amount of dirty memory. The
+    kernel keeps recently used pages cached and evicts the others when
+    memory gets scarce. Since the fields are exposed as plain arrays,
+    sampling runs the same code as with the in-memory buffer.
+
+    Fields which are not numeric arrays or scalars (e.g. info) are stored
+    in memory as in the base class.
+    """
+
+    def __init__(self, size, replay_dir=None, flush_interval=65536, **kwargs):
+        self._replay_dir = replay_dir if replay_dir is not None else tempfile.gettempdir()
+        self._flush_interval = flush_interval
+        self._memmaps = []
+        self._n_since_flush = 0
+        super().__init__(size, **kwargs)
+        os.makedirs(self._replay_dir, exist_ok = True)
+
+    def __getstate__(self):
+        # a pickled buffer holds the fields in memory
+        state = super().__getstate__()
+        state["_memmaps"] = []
+        return state
+
+    def _create_memmap(self, name, inst):
+        example = np.asanyarray(inst)
+        fd, path = tempfile.mkstemp(prefix=f"{name}_", suffix=".dat", dir=self._replay_dir)
+        try:
+            memmap = np.memmap(path, dtype=example.dtype, mode="w+", shape=(self._maxsize,) + example.shape)
+        finally:
+            os.close(fd)
+            os.remove(path)
+        self._memmaps.append(memmap)
+        return memmap.view(np.ndarray)
+
+    def _add_to_buffer(self, name, inst):
+        if name not in self._meta.__dict__ and not isinstance(inst, (dict, ts.data.Batch)) \
+                and issubclass(np.asanyarray(inst).dtype.type, (np.bool_, np.number)):
+            self._meta.__dict__[name] = self._create_memmap(name, inst)
+        super()._add_to_buffer(name, inst)
+
+    def add(self, *args, **kwargs):
+        super().add(*args, **kwargs)
+        self._n_since_flush += 1
+        if self._n_since_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write modified pages of all fields back to disk."""
+
+        for memmap in self._memmaps:
+            memmap.flush()
+        self._n_since_flush = 0
+
+
+def create_replay_buffer(size, replay_storage="memory", replay_dir=None, replay_flush_interval=65536):
+    """Create replay buffer with storage specified in algo_kwargs of a level.
+
+    replay_storage is either "memory" (tianshou's ReplayBuffer) or
+    "memmap" (MemmapReplayBuffer)."""
+
+    if replay_storage == "memory":
+        return ts.data.ReplayBuffer(size = size)
+    elif replay_storage == "memmap":
+        return MemmapReplayBuffer(size, replay_dir=replay_dir, flush_interval=replay_flush_interval)
+    else:
+        raise ValueError(f"Unknown replay storage {replay_storage}.")
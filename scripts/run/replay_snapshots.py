@@ -0,0 +1,165 @@
+"""Incremental snapshots of the replay buffers of a graph.
+
+The replay buffers are not dumped as a whole when the state of a graph is
+saved. Instead, the transitions of every buffer are written to append-only
+segments (one .npy file per buffer key) which only contain the transitions
+added since the last snapshot. A small manifest (stored by the caller
+together with the rest of the checkpoint) records the segments of each
+buffer. Segments whose transitions have been overwritten in the ring
+buffer are dropped. On resume, the segments are memory-mapped and copied
+into fresh buffers.
+"""
+
+import copy
+import os
+
+import numpy as np
+import tianshou as ts
+from tianshou.data import Batch
+
+
+SEGMENT_DIR_NAME = "replay_segments"
+
+
+def get_replay_buffers(graph):
+    """Return dict mapping node ids to the replay buffers of the nodes."""
+
+    return {node_id: node.algorithm._replay_buffer for node, node_id in graph.get_node_ids().items()}
+
+
+def _set_replay_buffers(graph, buffers):
+    for node, node_id in graph.get_node_ids().items():
+        node.algorithm._replay_buffer = buffers[node_id]
+
+
+def track_additions(buffer, n_added=None):
+    """Count transitions added to buffer in buffer._n_added.
+
+    If n_added is None, the buffer is assumed to contain all transitions
+    added so far in chronological order ending at buffer._index."""
+
+    if n_added is None:
+        n_added = len(buffer) if len(buffer) < buffer._maxsize else buffer._maxsize + buffer._index
+    buffer._n_added = n_added
+    add = buffer.add
+
+    def counting_add(*args, **kwargs):
+        add(*args, **kwargs)
+        buffer._n_added += 1
+
+    buffer.add = counting_add
+
+
+def _segment_path(state_dir, node_id, start, key):
+    return os.path.join(state_dir, SEGMENT_DIR_NAME, f"{node_id}_{start}_{key}.npy")
+
+
+def save_replay_snapshots(graph, state_dir, manifest=None):
+    """Append transitions added since the snapshot described by manifest to the segments.
+
+    Returns the manifest of the new snapshot. Segments are only written,
+    the caller commits the manifest and afterwards removes segments which
+    are no longer needed with remove_unreferenced_segments."""
+
+    manifest = copy.deepcopy(manifest) if manifest is not None else {}
+    os.makedirs(os.path.join(state_dir, SEGMENT_DIR_NAME), exist_ok = True)
+
+    for node_id, buffer in get_replay_buffers(graph).items():
+        node_id = str(node_id)
+        if not hasattr(buffer, "_n_added"):
+            track_additions(buffer)
+        entry = manifest.get(node_id, {"n_added": 0, "maxsize": buffer._maxsize, "segments": []})
+        n_added = buffer._n_added
+        meta = buffer._meta.__dict__
+        keys = [key for key, value in meta.items() if isinstance(value, np.ndarray)]
+        entry["empty_batch_keys"] = [key for key, value in meta.items()
+                if isinstance(value, Batch) and len(value.__dict__) == 0]
+        assert len(keys) + len(entry["empty_batch_keys"]) == len(meta), \
+                "Only replay buffers with array valued keys are supported."
+
+        # transitions which are still in the buffer but not yet in a segment
+        start = max(entry["n_added"], n_added - len(buffer))
+        if n_added > start:
+            positions = np.arange(start, n_added) % buffer._maxsize
+            for key in keys:
+                np.save(_segment_path(state_dir, node_id, start, key), meta[key][positions])
+            entry["segments"].append({"start": int(start), "count": int(n_added - start), "keys": keys})
+        entry["n_added"] = int(n_added)
+
+        # drop segments which only contain overwritten transitions
+        first_valid = n_added - buffer._maxsize
+        entry["segments"] = [segment for segment in entry["segments"]
+                if segment["start"] + segment["count"] > first_valid]
+        manifest[node_id] = entry
+
+    return manifest
+
+
+def remove_unreferenced_segments(state_dir, manifest):
+    """Delete segment files which are not part of the snapshot described by manifest."""
+
+    segment_dir = os.path.join(state_dir, SEGMENT_DIR_NAME)
+    if not os.path.isdir(segment_dir):
+        return
+    referenced = {os.path.basename(_segment_path(state_dir, node_id, segment["start"], key))
+            for node_id, entry in manifest.items()
+            for segment in entry["segments"] for key in segment["keys"]}
+    for file_name in os.listdir(segment_dir):
+        if file_name not in referenced:
+            os.remove(os.path.join(segment_dir, file_name))
+
+
+def load_replay_buffer(state_dir, node_id, entry, buffer=None):
+    """Rebuild replay buffer of node from its memory-mapped segments.
+
+    If an empty buffer is given, it is filled so that its storage (e.g.
+    memory-mapped files) is kept."""
+
+    maxsize = entry["maxsize"]
+    n_added = entry["n_added"]
+    first_valid = max(n_added - maxsize, 0)
+    if buffer is None:
+        buffer = ts.data.ReplayBuffer(size = maxsize)
+    assert buffer._maxsize == maxsize and len(buffer) == 0, \
+            f"Replay buffer of node {node_id} does not match the saved one (size {maxsize})."
+    meta = buffer._meta.__dict__
+    for segment in entry["segments"]:
+        begin = max(segment["start"], first_valid)
+        end = segment["start"] + segment["count"]
+        positions = np.arange(begin, end) % maxsize
+        for key in segment["keys"]:
+            data = np.load(_segment_path(state_dir, node_id, segment["start"], key), mmap_mode="r")
+            if key not in meta:
+                # let the buffer allocate the storage
+                buffer._add_to_buffer(key, np.array(data[0]))
+            meta[key][positions] = data[begin - segment["start"]:]
+    for key in entry["empty_batch_keys"]:
+        meta[key] = Batch()
+    buffer._size = min(n_added, maxsize)
+    buffer._index = n_added % maxsize
+    track_additions(buffer, n_added)
+    return buffer
+
+
+def load_replay_buffers(graph, state_dir, manifest, buffers=None):
+    """Replace replay buffers of graph by the ones in the snapshot described by manifest.
+
+    buffers optionally maps node ids to empty buffers which are filled."""
+
+    buffers = buffers or {}
+    buffers = {node_id: load_replay_buffer(state_dir, str(node_id), manifest[str(node_id)], buffers.get(node_id))
+            for node_id in get_replay_buffers(graph)}
+    _set_replay_buffers(graph, buffers)
+
+
+def save_graph_state_without_buffers(graph, dir_path):
+    """Save state of graph with empty stand-ins for the replay buffers."""
+
+    buffers = get_replay_buffers(graph)
+    _set_replay_buffers(graph, {node_id: ts.data.ReplayBuffer(size = buffer._maxsize)
+        for node_id, buffer in buffers.items()})
+    try:
+        graph.save_state(dir_path)
+    finally:
+        _set_replay_buffers(graph, buffers)
+
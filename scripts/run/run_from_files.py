@@ -3,8 +3,12 @@ import json
 import numpy as np
 import torch
 import os
+import shutil
 
 from .core import load_params, run_session, get_env_and_graph
+from .memory_plan import dry_run
+from .state_checkpoints import (CheckpointScheduler, Preempted, finished_step, load_checkpoint, save_checkpoint,
+        write_manifest)
 
 
 def run(dir_path, torch_num_threads=None):
@@ -15,16 +19,13 @@ def run(dir_path, torch_num_threads=None):
         "graph_params": graph_params
     }
 
-    if os.path.isdir(os.path.join(dir_path, "state")):
-        with open(os.path.join(dir_path, "state", "step.json"), "r") as json_file:
-            step = json.load(json_file)["step"]
-    else:
-        step = 0
+    # a finished run has no state to continue from, launching it again 
+    # must not overwrite its trained model with an untrained one
+    final_step = finished_step(dir_path)
+    if final_step is not None:
+        print(f"Run has already finished at step {final_step}.")
+        return
 
-    print("Current step: ", step)
-    
-    log_dir = os.path.join(dir_path, "log")
-   
     params = base_params
     varied_params = varied_hps
 
@@ -34,17 +35,10 @@ def run(dir_path, torch_num_threads=None):
 
     env, graph = get_env_and_graph(run_params, graph_params)
 
-    # load graph state in case the run has been executed before
-    state_dir = os.path.join(dir_path, "state")
-    if os.path.isdir(state_dir):
-        print("Loading state of graph.")
-        graph.load_state(dir_path=state_dir) 
-        # also override logs with saved version in case the process was killed
-        # before the state could be saved
-        log_state_dir = os.path.join(dir_path, "state", "log")
-        if os.path.isdir(log_dir):
-            shutil.rmtree(log_dir)
-        shutil.copytree(log_state_dir, log_dir)
+    # load state of graph and logs from latest complete checkpoint in case 
+    # the run has been executed before
+    step = load_checkpoint(dir_path, graph)
+    print("Current step: ", step)
 
     # save parameters in json file
     os.makedirs(dir_path, exist_ok = True)
@@ -59,32 +53,38 @@ def run(dir_path, torch_num_threads=None):
     with open(varied_params_path, "w") as varied_params_file:
         json.dump(varied_hps, varied_params_file, indent = 4)
 
-    # run session
-    sess_props = run_session(dir_path, graph, env, run_params, step)
-
-    # delete old log directory in state directory
-    log_state_dir = os.path.join(dir_path, "state", "log")
-    if os.path.isdir(log_state_dir):
-        shutil.rmtree(log_state_dir)
+    # the state of the run is saved periodically (every 
+    # state_save_frequency steps and every state_save_interval minutes) 
+    # and when SIGTERM or SIGUSR1 is received
+    interval = run_params.get("state_save_interval", None)
+    checkpoint_scheduler = CheckpointScheduler(dir_path, step, 
+            frequency=run_params.get("state_save_frequency", None), 
+            interval=interval*60. if interval is not None else None)
+    checkpoint_scheduler.install_signal_handlers()
 
-    if sess_props["timed_out"]:
-        # save the state of the graph (replay buffer, parameters...) in 
-        # order to be able to continue training
+    # run session
+    try:
+        sess_props = run_session(dir_path, graph, env, run_params, step, 
+                checkpoint_scheduler=checkpoint_scheduler)
+    except Preempted:
+        print("Stopping run after saving state.")
+        return
+    finally:
+        checkpoint_scheduler.restore_signal_handlers()
+
+    # keep_state is set by sweeps which continue promising runs later on
+    if sess_props["timed_out"] or run_params.get("keep_state", False):
+        # save the state of the graph (replay buffer, parameters...) and 
+        # the logs in order to be able to continue training
         print("Saving state of graph.")
-        state_dir = os.path.join(dir_path, "state")
-        os.makedirs(state_dir, exist_ok = True)
-        graph.save_state(os.path.join(state_dir))
-        # save a copy of the log directory in the state directory
-        shutil.copytree(os.path.join(dir_path, "log"), log_state_dir)
+        save_checkpoint(dir_path, graph, sess_props["total_step"])
     else:
-        # delete state if present
+        # delete state if present and only keep the final step
         state_path = os.path.join(dir_path, "state")
         if os.path.isdir(state_path):
             shutil.rmtree(state_path)
-
-    os.makedirs(os.path.join(dir_path, "state"), exist_ok = True)
-    with open(os.path.join(dir_path, "state", "step.json"), "w") as json_file:
-        json.dump({"step": sess_props["total_step"]}, json_file, indent = 4)
+        os.makedirs(state_path, exist_ok = True)
+        write_manifest(state_path, {"step": sess_props["total_step"], "finished": True})
 
 
 if __name__ == "__main__":
@@ -103,6 +103,16 @@ if __name__ == "__main__":
         type=int,
         help="Overwrites number of threads to use in pytorch."
     )
+    parser.add_argument(
+        "--dry-run",
+        default=False,
+        action="store_true",
+        help="Only print the memory plan of the replay buffers without training."
+    )
     args = parser.parse_args()
 
-    run(args.dir, args.torch_num_threads)
+    if args.dry_run:
+        run_params, graph_params, _ = load_params(args.dir)
+        dry_run(run_params, graph_params)
+    else:
+        run(args.dir, args.torch_num_threads)
@@ -0,0 +1,280 @@
+"""Resumable checkpoints of the state of a run.
+
+The state directory of a run contains
+    step.json: manifest of the latest complete checkpoint,
+    checkpoint_<step>/: state of the graph without replay buffers and
+        copies of the log files which are not CSV files,
+    replay_segments/: incremental replay buffer snapshots shared by all
+        checkpoints (see replay_snapshots).
+The CSV logs are only appended to, so the manifest merely records their
+size and number of lines. A checkpoint is committed by atomically
+replacing step.json, files which are not referenced by the new manifest
+are removed afterwards. A run which is killed while saving a checkpoint
+therefore resumes from the previous complete checkpoint.
+"""
+
+import json
+import os
+import shutil
+import signal
+import time
+
+from .replay_snapshots import (get_replay_buffers, load_replay_buffers, remove_unreferenced_segments,
+        save_graph_state_without_buffers, save_replay_snapshots, track_additions)
+
+
+def _fsync_dir(dir_path):
+    dir_fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def read_manifest(state_dir):
+    """Return manifest of latest complete checkpoint (None if there is none)."""
+
+    path = os.path.join(state_dir, "step.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as json_file:
+        return json.load(json_file)
+
+
+def write_manifest(state_dir, manifest):
+    """Atomically replace manifest in state_dir."""
+
+    tmp_path = os.path.join(state_dir, "step.json.tmp")
+    with open(tmp_path, "w") as json_file:
+        json.dump(manifest, json_file, indent = 4)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+    os.replace(tmp_path, os.path.join(state_dir, "step.json"))
+    _fsync_dir(state_dir)
+
+
+def finished_step(dir_path):
+    """Return final step if the run in dir_path has finished, None otherwise.
+
+    A finished run only keeps its final step in the manifest, the state
+    of the graph has been deleted. Manifests written before runs were
+    marked as finished are recognized by the missing checkpoint."""
+
+    state_dir = os.path.join(dir_path, "state")
+    manifest = read_manifest(state_dir)
+    if manifest is None:
+        return None
+    if manifest.get("finished", False) or ("checkpoint" not in manifest
+            and not os.path.isfile(os.path.join(state_dir, "graph_state.pt"))):
+        return manifest["step"]
+    return None
+
+
+def _count_lines(f, n_bytes, chunk_size=2**20):
+    n_lines = 0
+    while n_bytes > 0:
+        chunk = f.read(min(chunk_size, n_bytes))
+        if not chunk:
+            break
+        n_lines += chunk.count(b"\n")
+        n_bytes -= len(chunk)
+    return n_lines
+
+
+def snapshot_logs(log_dir, checkpoint_dir, previous=None):
+    """Record byte offset and number of lines (rows) of the CSV logs.
+
+    Only the part appended since the previous snapshot is read to count
+    the lines. Other files in log_dir are copied to checkpoint_dir/log.
+    Returns the offsets of the CSV logs."""
+
+    previous = previous or {}
+    offsets = {}
+    for name in sorted(os.listdir(log_dir)):
+        path = os.path.join(log_dir, name)
+        if name.endswith(".csv"):
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                rows = 0
+                if name in previous and previous[name]["offset"] <= size:
+                    f.seek(previous[name]["offset"])
+                    rows = previous[name]["rows"]
+                rows += _count_lines(f, size - f.tell())
+                os.fsync(f.fileno())
+            offsets[name] = {"offset": size, "rows": rows}
+        else:
+            os.makedirs(os.path.join(checkpoint_dir, "log"), exist_ok = True)
+            if os.path.isdir(path):
+                shutil.copytree(path, os.path.join(checkpoint_dir, "log", name))
+            else:
+                shutil.copy2(path, os.path.join(checkpoint_dir, "log", name))
+    return offsets
+
+
+def restore_logs(log_dir, checkpoint_dir, offsets):
+    """Truncate CSV logs to the recorded offsets and restore the other files.
+
+    Files which were created after the snapshot are deleted, so that
+    log_dir is in the same state as when the snapshot was taken."""
+
+    os.makedirs(log_dir, exist_ok = True)
+    for name in os.listdir(log_dir):
+        if name not in offsets:
+            path = os.path.join(log_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    for name, offset in offsets.items():
+        path = os.path.join(log_dir, name)
+        if not os.path.isfile(path) or os.path.getsize(path) < offset["offset"]:
+            raise RuntimeError(f"Log file {path} is shorter than when the state was saved.")
+        with open(path, "r+b") as f:
+            f.truncate(offset["offset"])
+    saved_log_dir = os.path.join(checkpoint_dir, "log")
+    if os.path.isdir(saved_log_dir):
+        for name in os.listdir(saved_log_dir):
+            path = os.path.join(saved_log_dir, name)
+            if os.path.isdir(path):
+                shutil.copytree(path, os.path.join(log_dir, name))
+            else:
+                shutil.copy2(path, os.path.join(log_dir, name))
+
+
+def save_checkpoint(dir_path, graph, step):
+    """Save state of graph and logs of run as checkpoint at step."""
+
+    state_dir = os.path.join(dir_path, "state")
+    os.makedirs(state_dir, exist_ok = True)
+    old_manifest = read_manifest(state_dir) or {}
+
+    replay_manifest = save_replay_snapshots(graph, state_dir, old_manifest.get("replay_buffers"))
+    checkpoint_name = f"checkpoint_{step}"
+    checkpoint_dir = os.path.join(state_dir, checkpoint_name)
+    if os.path.isdir(checkpoint_dir):
+        # left over from an incomplete attempt
+        shutil.rmtree(checkpoint_dir)
+    os.makedirs(checkpoint_dir)
+    save_graph_state_without_buffers(graph, checkpoint_dir)
+    log_offsets = snapshot_logs(os.path.join(dir_path, "log"), checkpoint_dir, old_manifest.get("logs"))
+    _fsync_dir(checkpoint_dir)
+
+    write_manifest(state_dir, {"step": step, "checkpoint": checkpoint_name,
+        "replay_buffers": replay_manifest, "logs": log_offsets})
+
+    # remove what is no longer referenced
+    remove_unreferenced_segments(state_dir, replay_manifest)
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        if name.startswith("checkpoint_") and name != checkpoint_name and os.path.isdir(path):
+            shutil.rmtree(path)
+
+
+def load_checkpoint(dir_path, graph):
+    """Restore state of graph and logs of run from latest complete checkpoint.
+
+    Returns step of the checkpoint (0 if there is none). States saved with
+    graph.save_state directly in the state directory (old format) are
+    supported as well. Raises RuntimeError if the run has finished, as
+    there is no state to continue from (see finished_step)."""
+
+    state_dir = os.path.join(dir_path, "state")
+    manifest = read_manifest(state_dir)
+    if manifest is None:
+        # nothing to restore, count transitions from the start
+        for buffer in get_replay_buffers(graph).values():
+            track_additions(buffer)
+        return 0
+    if finished_step(dir_path) is not None:
+        raise RuntimeError(f"Run in {dir_path} has finished at step {manifest['step']}, "
+                "its state has not been kept.")
+    log_dir = os.path.join(dir_path, "log")
+    if "checkpoint" in manifest:
+        checkpoint_dir = os.path.join(state_dir, manifest["checkpoint"])
+        # keep the buffers created with the graph, their storage is configurable
+        buffers = get_replay_buffers(graph)
+        graph.load_state(dir_path=checkpoint_dir)
+        load_replay_buffers(graph, state_dir, manifest["replay_buffers"], buffers)
+        if "logs" in manifest:
+            # the process might have been killed after the checkpoint had 
+            # been saved, remove log entries written afterwards
+            restore_logs(log_dir, checkpoint_dir, manifest["logs"])
+            return manifest["step"]
+        log_state_dir = os.path.join(checkpoint_dir, "log")
+    else:
+        graph.load_state(dir_path=state_dir)
+        for buffer in get_replay_buffers(graph).values():
+            track_additions(buffer)
+        log_state_dir = os.path.join(state_dir, "log")
+
+    # checkpoints without log offsets contain a copy of the log directory
+    if os.path.isdir(log_dir):
+        shutil.rmtree(log_dir)
+    shutil.copytree(log_state_dir, log_dir)
+    return manifest["step"]
+
+
+class Preempted(Exception):
+    """Raised after the checkpoint requested by SIGTERM has been saved."""
+
+
+class CheckpointScheduler():
+    """Decides when to save checkpoints during a session.
+
+    Checkpoints are due every frequency steps and every interval seconds
+    of wall-clock time (if not None). SIGUSR1 requests a checkpoint,
+    SIGTERM requests a checkpoint after which the run stops by raising
+    Preempted. Call after_train_episode after every training episode and
+    during_testing before every step of a test episode, so that signals
+    are not left pending during long test phases.
+    """
+
+    def __init__(self, dir_path, step, frequency=None, interval=None):
+        self.dir_path = dir_path
+        self.frequency = frequency
+        self.interval = interval
+        self.step = step
+        self.last_step = step
+        self.last_time = time.monotonic()
+        self.requested = False
+        self.stop = False
+        self._previous_handlers = {}
+
+    def _handle_signal(self, signum, frame):
+        self.requested = True
+        self.stop = self.stop or signum == signal.SIGTERM
+
+    def install_signal_handlers(self):
+        for signum in (signal.SIGTERM, signal.SIGUSR1):
+            self._previous_handlers[signum] = signal.signal(signum, self._handle_signal)
+
+    def restore_signal_handlers(self):
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler)
+        self._previous_handlers = {}
+
+    def _save(self, graph):
+        print(f"Saving checkpoint at step {self.step}.")
+        save_checkpoint(self.dir_path, graph, self.step)
+        self.last_step = self.step
+        self.last_time = time.monotonic()
+        self.requested = False
+        if self.stop:
+            raise Preempted()
+
+    def after_train_episode(self, graph, step):
+        self.step = step
+        due = self.requested \
+                or (self.frequency is not None and step - self.last_step >= self.frequency) \
+                or (self.interval is not None and time.monotonic() - self.last_time >= self.interval)
+        if due:
+            self._save(graph)
+
+    def during_testing(self, graph):
+        """Save checkpoint if one has been requested by a signal.
+
+        Testing does not change the state of the graph, so the checkpoint
+        is saved at the step of the last training episode."""
+
+        if self.requested:
+            self._save(graph)
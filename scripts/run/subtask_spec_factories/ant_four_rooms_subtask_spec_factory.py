@@ -33,7 +33,7 @@ class AntFourRoomsSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
         # env goal is equal to x, y, z coordinates of torso
         def mapping(partial_obs):
-            return partial_obs[:3]
+            return partial_obs[..., :3]
         return mapping
 
     @classmethod
@@ -42,9 +42,9 @@ class AntFourRoomsSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
         n_coords = env.observation_space["observation"].shape[0]//2
         def mapping(partial_obs):
-            pos = np.concatenate((partial_obs[:2], np.clip(partial_obs[2:3], -np.inf, 1.)))
-            vels = np.clip(partial_obs[n_coords:n_coords + 2], -3.0, 3.0)
-            return np.concatenate((pos, vels))
+            # z coordinate is only clipped from above
+            return np.concatenate((partial_obs[..., :2], np.minimum(partial_obs[..., 2:3], 1.),
+                np.clip(partial_obs[..., n_coords:n_coords + 2], -3.0, 3.0)), axis=-1)
 
         high = np.array([9.5]*2 + [1.] + [3.]*2)
         low = -high
@@ -43,7 +43,7 @@ class BallInCupSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
         def mapping(partial_obs):
             indices = [0, 1, 2, 3]
-            sg = partial_obs[indices]
+            sg = partial_obs[..., indices]
             sg = np.clip(sg, low, high)
             return sg
 
@@ -7,7 +7,54 @@ from graph_rl.subtasks import (
 
 from .subtask_spec_factory import SubtaskSpecFactory
 
+
+class BatchedGoalsMixin():
+    """Batched map_to_goal and goal achievement criterion for Box subtask specs.
+
+    The criterion checks the thresholds of all subspaces of the
+    factorization in one pass."""
+
+    def batched_map_to_goal(self, partial_obs):
+        """Map array of partial observations with shape (N, obs_dim) to goals."""
+        return np.asarray(partial_obs)[:, self._goal_indices]
+
+    def _get_factor_matrix(self, goal_dim):
+        # (goal_dim, n_factors) matrix summing squared differences per factor
+        if not hasattr(self, "_factor_matrix"):
+            self._factor_matrix = np.zeros((goal_dim, len(self.factorization)))
+            for j, factor in enumerate(self.factorization):
+                self._factor_matrix[list(factor), j] = 1.
+            self._squared_thresholds = np.array(self._goal_achievement_threshold, dtype=float)**2
+        return self._factor_matrix
+
+    def batched_goal_achievement_criterion(self, achieved_goals, desired_goals):
+        """Map arrays of achieved and desired goals (N, goal_dim) to boolean array."""
+
+        diff = np.asarray(achieved_goals) - desired_goals
+        squared_dists = diff**2 @ self._get_factor_matrix(diff.shape[-1])
+        return np.all(squared_dists < self._squared_thresholds, axis=-1)
+
+    def goal_achievement_criterion(self, achieved_goal, desired_goal, parent_info):
+        return bool(self.batched_goal_achievement_criterion(np.asarray(achieved_goal)[None],
+            np.asarray(desired_goal)[None])[0])
+
+
+class BatchedBoxInfoHidingTGSubtaskSpec(BatchedGoalsMixin, BoxInfoHidingTGSubtaskSpec):
+    pass
+
+
+class BatchedBoxInfoHidingSPSubtaskSpec(BatchedGoalsMixin, BoxInfoHidingSPSubtaskSpec):
+    pass
+
+
 class BoxSubtaskSpecFactory(SubtaskSpecFactory):
+    """Factory for subtask specs with Box observation and goal spaces.
+
+    The maps returned by get_map_to_env_goal and
+    get_map_to_subgoal_and_subgoal_space have to accept a single partial
+    observation as well as an array of partial observations with shape
+    (N, obs_dim) (i.e. index the last axis). The generated subtask specs
+    use them for batches of goals in batched_map_to_goal."""
     
     @classmethod
     def get_indices_and_factorization(cls, subtask_spec_params, level):
@@ -26,12 +73,12 @@ class BoxSubtaskSpecFactory(SubtaskSpecFactory):
 
     @classmethod
     def get_map_to_env_goal(cls, env):
-        """Return map from partial observation to environment goal."""
+        """Return map from partial observation(s) to environment goal(s)."""
         pass
 
     @classmethod
     def get_map_to_subgoal_and_subgoal_space(cls, env):
-        """Return map from partial observation to environment goal and subgoal space.
+        """Return map from partial observation(s) to subgoal(s) and subgoal space.
         
         Returns None by default which means the components specified in 
         goal_indices are simply copied from the partial observation into 
@@ -50,18 +97,21 @@ class BoxSubtaskSpecFactory(SubtaskSpecFactory):
         return_value = cls.get_map_to_subgoal_and_subgoal_space(env)
         if return_value is not None:
             map_to_subgoal, subgoal_space = return_value
-            class CustomTGSubtaskSpec(BoxInfoHidingTGSubtaskSpec):
+            class CustomTGSubtaskSpec(BatchedBoxInfoHidingTGSubtaskSpec):
 
                 def map_to_goal(self, partial_obs):
                     return map_to_subgoal(partial_obs)
 
+                def batched_map_to_goal(self, partial_obs):
+                    return map_to_subgoal(np.asarray(partial_obs))
+
                 @property
                 def goal_space(self):
                     return subgoal_space
 
             subtask_spec_class = CustomTGSubtaskSpec
         else:
-            subtask_spec_class = BoxInfoHidingTGSubtaskSpec
+            subtask_spec_class = BatchedBoxInfoHidingTGSubtaskSpec
 
         # create subtask specs for this level
         subtask_specs = subtask_spec_class(
@@ -124,11 +174,14 @@ class BoxSubtaskSpecFactory(SubtaskSpecFactory):
         return_value = cls.get_map_to_subgoal_and_subgoal_space(env)
         if return_value is not None:
             map_to_subgoal, subgoal_space = return_value
-            class CustomSPSubtaskSpec(BoxInfoHidingSPSubtaskSpec):
+            class CustomSPSubtaskSpec(BatchedBoxInfoHidingSPSubtaskSpec):
 
                 def map_to_goal(self, partial_obs):
                     return map_to_subgoal(partial_obs)
 
+                def batched_map_to_goal(self, partial_obs):
+                    return map_to_subgoal(np.asarray(partial_obs))
+
                 @property
                 def goal_space(self):
                     return subgoal_space
@@ -139,7 +192,7 @@ class BoxSubtaskSpecFactory(SubtaskSpecFactory):
 
             subtask_spec_class = CustomSPSubtaskSpec
         else:
-            subtask_spec_class = BoxInfoHidingSPSubtaskSpec
+            subtask_spec_class = BatchedBoxInfoHidingSPSubtaskSpec
 
         # create subtask specs for this level
         subtask_specs = subtask_spec_class(
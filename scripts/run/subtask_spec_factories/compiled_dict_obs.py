@@ -0,0 +1,205 @@
+"""Dict observations backed by a contiguous float32 vector.
+
+The subtask specs generated by DictSubtaskSpecFactory compute once per
+spec a flat layout of the items of their partial observation and goal
+spaces (keys sorted like in DictSpace.flatten_value). Partial
+observations, goals and parent actions are then FlatDictObs, dicts
+whose items are views into one vector, so that
+
+* the partial observation is built with one concatenation,
+* the achieved goal is one take from the partial observation,
+* the goal achievement criterion is one reduction over flat goals,
+* flattening (e.g. for the policy and the replay buffer) returns the
+  vector without concatenating the items again.
+
+As FlatDictObs are dicts, they can still be inspected item by item.
+Specs with items which are not Box spaces or with norms other than L2
+keep the dict based implementation of graph_rl.
+"""
+
+import numpy as np
+
+from graph_rl.spaces import BoxSpace, DictSpace
+from graph_rl.subtasks import (DictInfoHidingSPSubtaskSpec,
+        DictInfoHidingTGSubtaskSpec, DictInfoHidingTolTGSubtaskSpec)
+from graph_rl.utils import get_obs_from_gym
+
+
+class FlatDictObs(dict):
+    """Dict whose items are views into the flat vector of a CompiledDictSpace."""
+
+    def __init__(self, space, flat):
+        super().__init__(zip(space.sorted_keys, [flat[s] for s in space.slices]))
+        self.space = space
+        self.flat = flat
+
+    def __reduce__(self):
+        return (FlatDictObs, (self.space, self.flat))
+
+    def __copy__(self):
+        return FlatDictObs(self.space, self.flat)
+
+    def __deepcopy__(self, memo):
+        return FlatDictObs(self.space, self.flat.copy())
+
+
+class CompiledDictSpace(DictSpace):
+    """Dict space of Box spaces with a fixed layout of its items in a flat vector."""
+
+    def __init__(self, space_dict):
+        super().__init__(space_dict)
+        self.sorted_keys = sorted(space_dict)
+        sizes = [space_dict[key].get_flat_dim() for key in self.sorted_keys]
+        self.starts = np.cumsum([0] + sizes[:-1])
+        self.slices = [slice(start, start + size) for start, size in zip(self.starts, sizes)]
+
+    @staticmethod
+    def supports(dict_space):
+        return all(isinstance(space, BoxSpace) for space in dict_space._space_dict.values())
+
+    def flatten_value(self, value, keys = None):
+        if keys is None and isinstance(value, FlatDictObs) and value.space is self:
+            return value.flat
+        return super().flatten_value(value, keys)
+
+    def unflatten_value(self, flat_value, keys = None):
+        if keys is None:
+            return FlatDictObs(self, np.asarray(flat_value, dtype=np.float32))
+        return super().unflatten_value(flat_value, keys)
+
+    def flatten(self, value):
+        """Return flat float32 vector of dict value."""
+
+        if isinstance(value, FlatDictObs) and value.space is self:
+            return value.flat
+        return np.concatenate([value[key] for key in self.sorted_keys]).astype(np.float32, copy=False)
+
+    def get_indices(self, keys):
+        """Indices of the items with keys in the flat vector."""
+
+        return np.concatenate([np.arange(self.get_flat_dim())[s] for key, s in
+            zip(self.sorted_keys, self.slices) if key in keys])
+
+
+class CompiledDictObsMixin():
+    """Partial observations, goals and goal achievement on a flat layout.
+
+    _compile replaces the partial observation, goal and parent action
+    spaces of the spec by compiled spaces (if supported)."""
+
+    def _compile(self, norms=None):
+        self._compiled = CompiledDictSpace.supports(self.partial_obs_space) \
+                and all(norm in (None, 2) for norm in (norms or {}).values())
+        if not self._compiled:
+            return
+        self._compiled_partial_obs_space = CompiledDictSpace(self.partial_obs_space._space_dict)
+        self._compiled_goal_space = CompiledDictSpace(self.goal_space._space_dict)
+        self._goal_take = self._compiled_partial_obs_space.get_indices(self._goal_keys)
+
+    def _get_squared_thresholds(self, thresholds):
+        return np.array([thresholds.get(key, np.inf) for key in self._compiled_goal_space.sorted_keys],
+                dtype=np.float32)**2
+
+    def _map_to_flat_partial_obs(self, env_obs, ep_time=None):
+        obs = get_obs_from_gym(env_obs)
+        return np.concatenate([obs[key] if key != "__ep_time__" else ep_time
+            for key in self._compiled_partial_obs_space.sorted_keys]).astype(np.float32, copy=False)
+
+    def map_to_goal(self, partial_obs):
+        if not self._compiled:
+            return super().map_to_goal(partial_obs)
+        flat = self._compiled_partial_obs_space.flatten(partial_obs)
+        return FlatDictObs(self._compiled_goal_space, flat[self._goal_take])
+
+    def batched_map_to_goal(self, flat_partial_obs):
+        """Map array of flat partial observations (N, obs_dim) to flat goals."""
+        return np.asarray(flat_partial_obs)[:, self._goal_take]
+
+    def _check_thresholds(self, achieved_goals, desired_goals, squared_thresholds):
+        squared_diff = (achieved_goals - desired_goals)**2
+        squared_dists = np.add.reduceat(squared_diff, self._compiled_goal_space.starts, axis=-1)
+        return (squared_dists < squared_thresholds).all(axis=-1)
+
+    def _goal_achievement_criterion(self, achieved_goal, desired_goal, squared_thresholds):
+        goal_space = self._compiled_goal_space
+        return bool(self._check_thresholds(goal_space.flatten(achieved_goal), goal_space.flatten(desired_goal),
+            squared_thresholds))
+
+
+class _FixedThresholdsMixin(CompiledDictObsMixin):
+
+    def _compile(self, norms=None):
+        super()._compile(norms)
+        if self._compiled:
+            self._squared_thresholds = self._get_squared_thresholds(self._goal_achievement_threshold)
+
+    def goal_achievement_criterion(self, achieved_goal, desired_goal, parent_info):
+        if not self._compiled:
+            return super().goal_achievement_criterion(achieved_goal, desired_goal, parent_info)
+        return self._goal_achievement_criterion(achieved_goal, desired_goal, self._squared_thresholds)
+
+    def batched_goal_achievement_criterion(self, achieved_goals, desired_goals):
+        """Map arrays of flat achieved and desired goals (N, goal_dim) to boolean array."""
+
+        if not self._compiled:
+            goal_space = self.goal_space
+            return np.array([super(_FixedThresholdsMixin, self).goal_achievement_criterion(
+                goal_space.unflatten_value(a), goal_space.unflatten_value(d), None)
+                for a, d in zip(achieved_goals, desired_goals)], dtype=bool)
+        return self._check_thresholds(np.asarray(achieved_goals), np.asarray(desired_goals),
+                self._squared_thresholds)
+
+
+class _CompiledTGMixin():
+
+    def _use_compiled_spaces(self):
+        if self._compiled:
+            self._partial_obs_space = self._compiled_partial_obs_space
+            self._goal_space = self._compiled_goal_space
+            self._parent_action_space = DictSpace({**self._parent_action_space._space_dict,
+                "goal": self._compiled_goal_space})
+
+    def map_to_partial_obs(self, env_obs, parent_info):
+        if not self._compiled:
+            return super().map_to_partial_obs(env_obs, parent_info)
+        return FlatDictObs(self._compiled_partial_obs_space, self._map_to_flat_partial_obs(env_obs))
+
+
+class CompiledDictInfoHidingTGSubtaskSpec(_CompiledTGMixin, _FixedThresholdsMixin, DictInfoHidingTGSubtaskSpec):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compile(self._norms)
+        self._use_compiled_spaces()
+
+
+class CompiledDictInfoHidingTolTGSubtaskSpec(_CompiledTGMixin, CompiledDictObsMixin, DictInfoHidingTolTGSubtaskSpec):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compile()
+        self._use_compiled_spaces()
+
+    def goal_achievement_criterion(self, achieved_goal, desired_goal, parent_info):
+        if not self._compiled:
+            return super().goal_achievement_criterion(achieved_goal, desired_goal, parent_info)
+        # tolerances chosen by the parent
+        tols = {key: np.asarray(tol).reshape(-1)[0] for key, tol in parent_info.action["goal_tol"].items()}
+        return self._goal_achievement_criterion(achieved_goal, desired_goal, self._get_squared_thresholds(tols))
+
+
+class CompiledDictInfoHidingSPSubtaskSpec(_FixedThresholdsMixin, DictInfoHidingSPSubtaskSpec):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._compile()
+        if self._compiled:
+            # the goal space is also the parent action space
+            self._space = self._compiled_partial_obs_space
+            self._goal_space = self._compiled_goal_space
+
+    def map_to_partial_obs(self, env_obs, parent_info, ep_step):
+        if not self._compiled:
+            return super().map_to_partial_obs(env_obs, parent_info, ep_step)
+        ep_time = np.clip([ep_step/self._max_ep_steps], 0., 1.)
+        return FlatDictObs(self._compiled_partial_obs_space, self._map_to_flat_partial_obs(env_obs, ep_time))
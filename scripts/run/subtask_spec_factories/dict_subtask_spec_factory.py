@@ -1,13 +1,17 @@
 import numpy as np
 
-from graph_rl.subtasks import (DictInfoHidingSPSubtaskSpec, 
-        DictInfoHidingTGSubtaskSpec, DictInfoHidingTolTGSubtaskSpec, EnvSPSubtaskSpec)
+from graph_rl.subtasks import EnvSPSubtaskSpec
 
+from .compiled_dict_obs import (CompiledDictInfoHidingSPSubtaskSpec,
+        CompiledDictInfoHidingTGSubtaskSpec, CompiledDictInfoHidingTolTGSubtaskSpec)
 from .subtask_spec_factory import SubtaskSpecFactory
 
 
 class DictSubtaskSpecFactory(SubtaskSpecFactory):
-    """Generates subtask specs from params when partial observation and goal spaces are dict spaces."""
+    """Generates subtask specs from params when partial observation and goal spaces are dict spaces.
+
+    The subtask specs compute partial observations, goals and goal
+    achievement on a flat layout of the dict items (see compiled_dict_obs)."""
 
     @classmethod
     def get_hits_subtask_specs(cls, env, n_layers, subtask_spec_params_list):
@@ -27,11 +31,11 @@ class DictSubtaskSpecFactory(SubtaskSpecFactory):
             delta_t_min = spec_params["delta_t_min"] if "delta_t_min" in spec_params else 0.
             if not subtask_spec_params_list[i + 1]["learn_goal_ach_thresholds"]:
                 subtask_specs.append(
-                        DictInfoHidingTGSubtaskSpec(thresholds, partial_obs_keys, goal_keys, 
+                        CompiledDictInfoHidingTGSubtaskSpec(thresholds, partial_obs_keys, goal_keys, 
                             env, delta_t_max=delta_t_max, delta_t_min=delta_t_min, norms=norms))
             else:
                 subtask_specs.append(
-                        DictInfoHidingTolTGSubtaskSpec(partial_obs_keys, goal_keys, 
+                        CompiledDictInfoHidingTolTGSubtaskSpec(partial_obs_keys, goal_keys, 
                             env, delta_t_max=delta_t_max, delta_t_min=delta_t_min))
 
         # highest level gets shortest path subtask spec based on env goal 
@@ -54,7 +58,7 @@ class DictSubtaskSpecFactory(SubtaskSpecFactory):
 
     @classmethod
     def get_hac_subtask_spec_class(cls):
-        return DictInfoHidingSPSubtaskSpec
+        return CompiledDictInfoHidingSPSubtaskSpec
 
     @classmethod
     def get_hac_subtask_specs(cls, env, n_layers, subtask_spec_params_list):
@@ -9,13 +9,19 @@ class PendulumHACSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
     @classmethod
     def bound_angle(cls, angle):
-        """Map to [-pi, pi]."""
+        """Map to [-pi, pi] (works elementwise on arrays)."""
         bounded_angle = angle % (2*np.pi)
 
-        if np.absolute(bounded_angle) > np.pi:
-            bounded_angle = -(np.pi - bounded_angle % np.pi)
+        return np.where(bounded_angle > np.pi, bounded_angle - 2*np.pi, bounded_angle)
 
-        return bounded_angle
+    @classmethod
+    def _map_to_angle_and_velocity(cls, partial_obs):
+        # invert mapping to cosine and sine of angle
+        c = partial_obs[..., 0]
+        s = partial_obs[..., 1]
+        angle = np.sign(s)*np.arccos(c)
+
+        return np.stack((cls.bound_angle(angle), np.clip(partial_obs[..., 2], -15, 15)), axis=-1)
 
     @classmethod
     def get_indices_and_factorization(cls, env, subtask_spec_params, level):
@@ -43,26 +49,13 @@ class PendulumHACSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
         # env goal is equal to joint angles
         n_angles = env.observation_space["observation"].shape[0]//2
-        def mapping(partial_obs):
-            # invert mapping to cosine and sine of angle
-            c = partial_obs[0]
-            s = partial_obs[1]
-            angle = np.sign(s)*np.arccos(c)
-
-            return np.array([cls.bound_angle(angle), np.clip(partial_obs[2], -15, 15)])
-        return mapping
+        return cls._map_to_angle_and_velocity
 
     @classmethod
     def get_map_to_subgoal_and_subgoal_space(cls, env):
         """Return map from partial observation to environment goal and subgoal space."""
 
-        def mapping(partial_obs):
-            # invert mapping to cosine and sine of angle
-            c = partial_obs[0]
-            s = partial_obs[1]
-            angle = np.sign(s)*np.arccos(c)
-
-            return np.array([cls.bound_angle(angle), np.clip(partial_obs[2], -15, 15)])
+        mapping = cls._map_to_angle_and_velocity
 
         high = np.array([np.pi] + [15.])
         low = -high
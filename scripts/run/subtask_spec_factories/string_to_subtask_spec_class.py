@@ -1,32 +1,18 @@
-from importlib import import_module
 import inspect
-import os
 
+from ..plugins import registry
 from .subtask_spec_factory import SubtaskSpecFactory
 
-def get_subtask_spec_factory_classes():
-    """Return dictionary with all factory classes defined in files in this directory.
+registry.add_kind("subtask_spec_factory", __package__,
+        is_plugin = lambda obj: inspect.isclass(obj) and issubclass(obj, SubtaskSpecFactory),
+        exclude = ["string_to_subtask_spec_class.py", "subtask_spec_factory.py"])
 
-    This file is excluded from the search."""
-    this_file = os.path.split(__file__)[-1]
-    directory = os.path.dirname(__file__)
-    exclude = [this_file, "subtask_spec_factory.py"]
-    factory_files = [f for f in os.listdir(directory) 
-            if f.endswith(".py") and f not in exclude]
-    factory_classes = {}
-    for f in factory_files:
-        path = os.path.join(directory, f)
-        relative_import_string = "." + inspect.getmodulename(path)
-        module = import_module(relative_import_string, package=__package__)
-        for name in dir(module):
-            obj = getattr(module, name)
-            if inspect.isclass(obj):
-                if issubclass(obj, SubtaskSpecFactory):
-                    factory_classes[name] = obj
+def get_subtask_spec_factory_classes():
+    """Return dictionary with all factory classes defined in files in this directory or registered."""
 
-    return factory_classes
+    return registry.get_all("subtask_spec_factory")
 
 
 def get_subtask_spec_factory_class(name):
     """Get subtask spec factory class by name."""
-    return get_subtask_spec_factory_classes()[name]
+    return registry.get("subtask_spec_factory", name)
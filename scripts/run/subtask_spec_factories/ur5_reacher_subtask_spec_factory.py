@@ -9,11 +9,9 @@ class UR5ReacherSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
     @classmethod
     def bound_angle(cls, angle):
-        bounded_angle = np.absolute(angle) % (2*np.pi)
-        if angle < 0:
-            bounded_angle = -bounded_angle
+        """Map to (-2 pi, 2 pi) keeping the sign (works elementwise on arrays)."""
 
-        return bounded_angle
+        return np.fmod(angle, 2*np.pi)
 
     @classmethod
     def get_indices_and_factorization(cls, env, subtask_spec_params, level):
@@ -42,7 +40,7 @@ class UR5ReacherSubtaskSpecFactory(BoxSubtaskSpecFactory):
         # env goal is equal to joint angles
         n_angles = env.observation_space["observation"].shape[0]//2
         def mapping(partial_obs):
-            return np.array([cls.bound_angle(a) for a in partial_obs[:n_angles]])
+            return cls.bound_angle(partial_obs[..., :n_angles])
         return mapping
 
     @classmethod
@@ -51,9 +49,9 @@ class UR5ReacherSubtaskSpecFactory(BoxSubtaskSpecFactory):
 
         n_angles = env.observation_space["observation"].shape[0]//2
         def mapping(partial_obs):
-            angles = np.array([cls.bound_angle(a) for a in partial_obs[:n_angles]])
-            ang_vels = np.clip(partial_obs[n_angles:], -4.0, 4.0)
-            return np.concatenate((angles, ang_vels))
+            angles = cls.bound_angle(partial_obs[..., :n_angles])
+            ang_vels = np.clip(partial_obs[..., n_angles:], -4.0, 4.0)
+            return np.concatenate((angles, ang_vels), axis=-1)
 
         high = np.array([2.*np.pi]*3 + [4.]*3)
         low = -high
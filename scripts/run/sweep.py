@@ -0,0 +1,279 @@
+import argparse
+import copy
+import csv
+import json
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+from .core import load_params
+from .multi_run import get_available_cores, launch_run
+
+
+# Locations of hyperparameters in the parameters of a level. Names in
+# varied_hp.json may end in the index of a level (e.g. "alpha1"), otherwise
+# they are applied to all levels which already contain the parameter.
+HP_PATHS = {
+    "tau": "algo_kwargs.flat_algo_kwargs.tau",
+    "alpha": "algo_kwargs.flat_algo_kwargs.alpha",
+    "learning_rate": "model_kwargs.learning_rate",
+    "goal_sampling_strategy": "algo_kwargs.goal_sampling_strategy",
+    "max_n_actions": "subtask_spec_params.max_n_actions",
+    "w_delta_t_ach": "subtask_spec_params.weight_delta_t_ach_aux",
+}
+
+
+def sample_hp(spec, rng):
+    """Draw value of hyperparameter from its specification in the search space."""
+
+    if spec["type"] == "uniform":
+        return float(rng.uniform(spec["low"], spec["high"]))
+    elif spec["type"] == "log_uniform":
+        return float(np.exp(rng.uniform(np.log(spec["low"]), np.log(spec["high"]))))
+    elif spec["type"] == "int_uniform":
+        return int(rng.integers(spec["low"], spec["high"] + 1))
+    elif spec["type"] == "choice":
+        return spec["values"][rng.integers(len(spec["values"]))]
+    else:
+        raise ValueError(f"Unknown hyperparameter type {spec['type']}.")
+
+
+def _set_path(params, path, value, only_existing=False):
+    *keys, last = path.split(".")
+    for key in keys:
+        if isinstance(params, list):
+            params = params[int(key)]
+        elif key in params:
+            params = params[key]
+        elif only_existing:
+            return
+        else:
+            params = params.setdefault(key, {})
+    if not only_existing or last in params:
+        params[last] = value
+
+
+def apply_hp(graph_params, name, value, spec):
+    """Write value of hyperparameter into graph_params."""
+
+    if "path" in spec:
+        _set_path(graph_params, spec["path"], value)
+        return
+    match = re.fullmatch(r"(.*?)(\d*)", name)
+    base_name, level = match.group(1), match.group(2)
+    assert base_name in HP_PATHS, f"Location of hyperparameter {name} unknown, specify its path in the search space."
+    level_params_list = graph_params["level_params_list"]
+    if level:
+        _set_path(level_params_list[int(level)], HP_PATHS[base_name], value)
+    else:
+        for level_params in level_params_list:
+            _set_path(level_params, HP_PATHS[base_name], value, only_existing=True)
+
+
+def run_metric(run_dir, run_metric_params):
+    """Return run metric computed from CSV logs of run (nan if not available yet)."""
+
+    assert run_metric_params["name"] == "average_success_run_metric", \
+            f"Run metric {run_metric_params['name']} is not supported."
+    log_path = os.path.join(run_dir, "log", "session_test.csv")
+    if not os.path.isfile(log_path):
+        return math.nan
+    with open(log_path, "r") as csv_file:
+        success = [float(row["success"]) for row in csv.DictReader(csv_file)
+                if float(row["step"]) >= run_metric_params["after_step"]]
+    return float(np.mean(success)) if success else math.nan
+
+
+class Sweep():
+    """Asynchronous successive halving (ASHA) over a search space.
+
+    The sweep directory has to contain search_space.json with the keys
+        base_dir: experiment directory whose parameters are varied,
+        hyperparameters: dict mapping names of varied hyperparameters to
+            their distribution ({"type": "log_uniform", "low": ...,
+            "high": ...}, types uniform, int_uniform and choice are also
+            supported). An optional "path" specifies the location in
+            graph_params (e.g. "level_params_list.0.algo_kwargs.batch_size"),
+        n_configs: number of configurations to sample,
+        min_steps: minimum number of training steps of the lowest rung,
+        eta: reduction factor, only the best 1/eta of the configurations in
+            a rung are promoted to the next rung with eta times the steps,
+        seed: seed for sampling configurations.
+    The highest rung uses n_steps from the run_params.json of base_dir.
+    The summary of all trials is written to summary.json and summary.csv.
+    Every configuration is an experiment directory in trials/ that can be
+    consumed by run_from_files. Promoted trials resume from their state.
+    """
+
+    def __init__(self, sweep_dir):
+        self.sweep_dir = sweep_dir
+        with open(os.path.join(sweep_dir, "search_space.json"), "r") as json_file:
+            self.search_space = json.load(json_file)
+        self.run_params, self.graph_params, _ = load_params(self.search_space["base_dir"])
+
+        # budgets of rungs are n_steps/eta^k for all k with at least min_steps
+        self.eta = self.search_space.get("eta", 3)
+        steps = self.run_params["n_steps"]
+        self.rung_steps = []
+        while steps >= self.search_space["min_steps"] or not self.rung_steps:
+            self.rung_steps.insert(0, int(steps))
+            steps /= self.eta
+
+        self.summary_path = os.path.join(sweep_dir, "summary.json")
+        if os.path.isfile(self.summary_path):
+            with open(self.summary_path, "r") as json_file:
+                self.trials = json.load(json_file)
+        else:
+            self.trials = []
+        self._rng = np.random.default_rng(self.search_space.get("seed", 0) + len(self.trials))
+
+    def _create_trial(self):
+        """Sample configuration and create its experiment directory."""
+
+        trial_id = len(self.trials)
+        hps = {name: sample_hp(spec, self._rng)
+                for name, spec in self.search_space["hyperparameters"].items()}
+        graph_params = copy.deepcopy(self.graph_params)
+        for name, value in hps.items():
+            apply_hp(graph_params, name, value, self.search_space["hyperparameters"][name])
+
+        trial_dir = os.path.join(self.sweep_dir, "trials", f"trial_{trial_id}")
+        os.makedirs(trial_dir, exist_ok = True)
+        run_params = dict(self.run_params, keep_state=True)
+        for file_name, p in [("run_params.json", run_params), ("graph_params.json", graph_params),
+                ("varied_hp.json", hps)]:
+            with open(os.path.join(trial_dir, file_name), "w") as json_file:
+                json.dump(p, json_file, indent = 4)
+
+        trial = {"id": trial_id, "dir": trial_dir, "hps": hps, "rung": 0,
+                "status": "pending", "metrics": []}
+        self.trials.append(trial)
+        return trial
+
+    def _set_budget(self, trial):
+        """Set number of steps of trial to the budget of its rung."""
+
+        run_params_path = os.path.join(trial["dir"], "run_params.json")
+        with open(run_params_path, "r") as json_file:
+            run_params = json.load(json_file)
+        run_params["n_steps"] = self.rung_steps[trial["rung"]]
+        # the state is only needed if the trial can still be promoted
+        run_params["keep_state"] = trial["rung"] < len(self.rung_steps) - 1
+        with open(run_params_path, "w") as json_file:
+            json.dump(run_params, json_file, indent = 4)
+
+    def _next_trial(self):
+        """Return trial to run next following ASHA, None if there is none."""
+
+        # promote trials, starting with the highest rung
+        for rung in reversed(range(len(self.rung_steps) - 1)):
+            completed = [t for t in self.trials if len(t["metrics"]) > rung]
+            n_promote = len(completed)//self.eta
+            ranked = sorted(completed, key=lambda t: -np.nan_to_num(t["metrics"][rung], nan=-np.inf))
+            for trial in ranked[:n_promote]:
+                if trial["status"] == "paused" and trial["rung"] == rung:
+                    trial["rung"] += 1
+                    return trial
+        # otherwise sample a new configuration
+        if len(self.trials) < self.search_space["n_configs"]:
+            return self._create_trial()
+        return None
+
+    def save_summary(self):
+        with open(self.summary_path, "w") as json_file:
+            json.dump(self.trials, json_file, indent = 4)
+        # flat table with one row per trial for analysis with e.g. pandas
+        hp_names = list(self.search_space["hyperparameters"])
+        with open(os.path.join(self.sweep_dir, "summary.csv"), "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["id", "status", "rung", "steps", "metric"] + hp_names)
+            for t in self.trials:
+                metric = t["metrics"][-1] if t["metrics"] else math.nan
+                steps = self.rung_steps[len(t["metrics"]) - 1] if t["metrics"] else 0
+                writer.writerow([t["id"], t["status"], t["rung"], steps, metric]
+                        + [t["hps"][n] for n in hp_names])
+
+    def run(self, n_workers=None, poll_interval=5.):
+        """Run the sweep on a pool of worker processes."""
+
+        cores = get_available_cores()
+        n_workers = len(cores) if n_workers is None else n_workers
+        threads_per_run = max(len(cores)//n_workers, 1)
+        free_slots = [cores[i*threads_per_run:(i + 1)*threads_per_run] for i in range(n_workers)]
+
+        # trials which were running when the sweep was interrupted are resumed
+        queue = [t for t in self.trials if t["status"] in ("running", "pending")]
+        running = {}
+        while True:
+            while free_slots:
+                trial = queue.pop(0) if queue else self._next_trial()
+                if trial is None:
+                    break
+                self._set_budget(trial)
+                trial["status"] = "running"
+                slot = free_slots.pop(0)
+                running[trial["id"]] = (launch_run(trial["dir"], slot), slot, trial)
+                self.save_summary()
+            if not running:
+                break
+            time.sleep(poll_interval)
+            for trial_id, (process, slot, trial) in list(running.items()):
+                if process.poll() is None:
+                    continue
+                free_slots.append(slot)
+                del running[trial_id]
+                if process.returncode != 0:
+                    trial["status"] = "failed"
+                else:
+                    trial["metrics"].append(run_metric(trial["dir"], self.run_params["run_metric_params"]))
+                    last_rung = trial["rung"] == len(self.rung_steps) - 1
+                    trial["status"] = "finished" if last_rung else "paused"
+            self.save_summary()
+
+        # trials which were not promoted are stopped for good
+        for trial in self.trials:
+            if trial["status"] == "paused":
+                trial["status"] = "stopped"
+        self.save_summary()
+
+    def best_trials(self, n=5):
+        """Return the n trials with the highest metric in the highest rung they reached."""
+
+        return sorted((t for t in self.trials if t["metrics"]),
+                key=lambda t: (len(t["metrics"]), np.nan_to_num(t["metrics"][-1], nan=-np.inf)),
+                reverse=True)[:n]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run hyperparameter sweep with asynchronous successive halving "
+        "as specified in search_space.json in the provided directory."
+    )
+    parser.add_argument(
+        "dir",
+        default=None,
+        help="Sweep directory containing search_space.json."
+    )
+    parser.add_argument(
+        "--n_workers",
+        default=None,
+        type=int,
+        help="Number of trials executed in parallel."
+    )
+    parser.add_argument(
+        "--top",
+        default=None,
+        type=int,
+        help="Only print the best trials of the sweep."
+    )
+    args = parser.parse_args()
+
+    sweep = Sweep(args.dir)
+    if args.top is None:
+        sweep.run(args.n_workers)
+    for trial in sweep.best_trials(args.top or 5):
+        steps = sweep.rung_steps[len(trial["metrics"]) - 1]
+        print(f"trial {trial['id']:4d}  steps {steps:9d}  metric {trial['metrics'][-1]:.3f}  {trial['hps']}")
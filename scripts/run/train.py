@@ -1,6 +1,8 @@
 import argparse
 import os
 
+from .core import load_params
+from .memory_plan import dry_run
 from .run_from_files import run
 
 if __name__ == "__main__":
@@ -8,6 +10,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Train policy on given environment using specified algorithm.")
     parser.add_argument("--algo", default="hits", help="Which algorithm to use (hac or hits).")
     parser.add_argument("--env", default="Platforms", help="Which environment to run (Platforms, Drawbridge or Tennis2D).")
+    parser.add_argument("--dry-run", default=False, action="store_true", help="Only print the memory plan of the replay buffers.")
 
     args = parser.parse_args()
 
@@ -15,8 +18,11 @@ if __name__ == "__main__":
     assert args.env in {"AntFourRooms", "Drawbridge", "Pendulum", "Platforms", 
             "Tennis2D", "UR5Reacher"}
     
-    print(f"Training with {args.algo} on {args.env} environment.")
-    
     path = os.path.join("./data", args.env, args.algo + "_trained")
 
-    run(path)
+    if args.dry_run:
+        run_params, graph_params, _ = load_params(path)
+        dry_run(run_params, graph_params)
+    else:
+        print(f"Training with {args.algo} on {args.env} environment.")
+        run(path)
@@ -0,0 +1,37 @@
+"""Snapshots of model parameters written by the checkpoint writer."""
+
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from scripts.run.checkpoint_writer import AsyncCheckpointWriter, snapshot_tensors
+
+
+def make_model():
+    return torch.nn.Sequential(torch.nn.Linear(3, 4), torch.nn.BatchNorm1d(4))
+
+
+def test_snapshot_keeps_state_dict_metadata(tmp_path):
+    model = make_model()
+    state_dict = model.state_dict()
+    params = {"policy": state_dict, "optimizers": [{"lr": 1e-3}]}
+
+    snapshot = snapshot_tensors(params)
+    assert type(snapshot["policy"]) is type(state_dict)
+    assert snapshot["policy"]._metadata == state_dict._metadata
+    assert snapshot["optimizers"] == [{"lr": 1e-3}]
+    for key, value in state_dict.items():
+        assert torch.equal(snapshot["policy"][key], value)
+        assert snapshot["policy"][key].data_ptr() != value.data_ptr()
+
+    # the written file loads like the state dict itself
+    path = str(tmp_path / "params.pt")
+    writer = AsyncCheckpointWriter()
+    writer.save(params, path)
+    writer.close()
+    loaded = torch.load(path)
+    assert loaded["policy"]._metadata == state_dict._metadata
+    make_model().load_state_dict(loaded["policy"])
+    assert os.listdir(str(tmp_path)) == ["params.pt"]
@@ -0,0 +1,45 @@
+"""Batched GymWrapper.compute_reward against the loop over the goal
+dimensions it replaced."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mujoco_py")
+gym = pytest.importorskip("gym")
+
+import hac_envs
+
+
+def reference_compute_reward(env, achieved_goal, desired_goal):
+    """compute_reward of GymWrapper before it accepted batches of goals."""
+
+    tolerance = env.hac_env.end_goal_thresholds
+    reward = 0.
+    for a_goal, d_goal, tol in zip(achieved_goal, desired_goal, tolerance):
+        if np.absolute(a_goal - d_goal) > tol:
+            reward = -1.
+            break
+    return reward
+
+
+@pytest.mark.parametrize("env_id", ["UR5Reacher-v1", "PendulumHAC-v1", "AntFourRooms-v1"])
+def test_batched_compute_reward_matches_reference(env_id):
+    env = gym.make(env_id).unwrapped
+    rng = np.random.default_rng(0)
+    thresholds = np.asarray(env.hac_env.end_goal_thresholds)
+
+    # about half of the achieved goals lie within the thresholds, some 
+    # exactly on them
+    goal_space = env.observation_space["desired_goal"]
+    desired_goals = rng.uniform(goal_space.low, goal_space.high, size=(1000,) + goal_space.shape)
+    offsets = rng.uniform(-2., 2., size=desired_goals.shape)*thresholds
+    offsets[:100] = np.sign(offsets[:100])*thresholds
+    achieved_goals = desired_goals + offsets*(rng.random((1000, 1)) < 0.5)
+
+    expected = np.array([reference_compute_reward(env, a, d) for a, d in zip(achieved_goals, desired_goals)])
+    assert 0 < np.count_nonzero(expected) < len(expected)
+    batched = env.compute_reward(achieved_goals, desired_goals, {})
+    assert batched.shape == (1000,)
+    np.testing.assert_array_equal(batched, expected)
+    for a, d, reward in zip(achieved_goals[:100], desired_goals[:100], expected[:100]):
+        assert env.compute_reward(a, d, {}) == reward
@@ -0,0 +1,78 @@
+"""Resuming logs from recorded offsets has to give the same log directory
+as resuming from a copy of it (the behavior before offsets were recorded)."""
+
+import filecmp
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tianshou")
+
+from scripts.run.state_checkpoints import restore_logs, snapshot_logs
+
+
+COLUMNS = ("return", "length", "step", "time")
+
+
+def append_rows(log_dir, n_rows, rng, names=("session_train.csv", "subtask_0_train.csv")):
+    """Append n_rows rows of random numbers to CSV logs (creating them if necessary)."""
+
+    for name in names:
+        path = os.path.join(log_dir, name)
+        new_file = not os.path.isfile(path)
+        with open(path, "a") as f:
+            if new_file:
+                f.write("#{\"t_start\": 0.0}\n" + ",".join(COLUMNS) + "\n")
+            values = rng.uniform(-100., 100., size=(n_rows, len(COLUMNS)))
+            f.write("".join(",".join(f"{v:.6f}" for v in row) + "\n" for row in values))
+    with open(os.path.join(log_dir, "session.json"), "w") as f:
+        f.write("{\"n_rows\": %d}" % n_rows)
+
+
+def assert_dirs_equal(dir_a, dir_b):
+    names = sorted(os.listdir(dir_a))
+    assert names == sorted(os.listdir(dir_b))
+    _, mismatch, errors = filecmp.cmpfiles(dir_a, dir_b, names, shallow=False)
+    assert mismatch == [] and errors == []
+
+
+@pytest.mark.parametrize("n_snapshots", [1, 3])
+def test_resumed_logs_equal_copy(tmp_path, n_snapshots):
+    rng = np.random.default_rng(n_snapshots)
+    log_dir = str(tmp_path / "log")
+    os.makedirs(log_dir)
+
+    # training writes logs and saves snapshots, the line counts of later
+    # snapshots start from the previous ones
+    offsets = None
+    for i in range(n_snapshots):
+        append_rows(log_dir, 50 + i, rng)
+        checkpoint_dir = str(tmp_path / f"checkpoint_{i}")
+        os.makedirs(checkpoint_dir)
+        offsets = snapshot_logs(log_dir, checkpoint_dir, offsets)
+    copy_dir = str(tmp_path / "copy")
+    shutil.copytree(log_dir, copy_dir)
+    n_rows = sum(50 + i for i in range(n_snapshots))
+    assert all(offsets[name]["rows"] == n_rows + 2 for name in ("session_train.csv", "subtask_0_train.csv"))
+
+    # the process is killed after writing more rows and new log files
+    append_rows(log_dir, 7, rng, names=("session_train.csv", "subtask_0_train.csv", "session_test.csv"))
+    os.makedirs(os.path.join(log_dir, "extra"))
+
+    restore_logs(log_dir, checkpoint_dir, offsets)
+    assert_dirs_equal(log_dir, copy_dir)
+
+
+def test_restore_rejects_shortened_log(tmp_path):
+    log_dir = str(tmp_path / "log")
+    checkpoint_dir = str(tmp_path / "checkpoint")
+    os.makedirs(log_dir)
+    os.makedirs(checkpoint_dir)
+    append_rows(log_dir, 10, np.random.default_rng(0))
+    offsets = snapshot_logs(log_dir, checkpoint_dir)
+    with open(os.path.join(log_dir, "session_train.csv"), "r+b") as f:
+        f.truncate(5)
+    with pytest.raises(RuntimeError):
+        restore_logs(log_dir, checkpoint_dir, offsets)
@@ -0,0 +1,52 @@
+"""Plugin registry with an index of the modules defining the plugins."""
+
+import inspect
+import os
+import sys
+
+import pytest
+
+from scripts.run import plugins
+from scripts.run.plugins import PluginRegistry
+
+
+@pytest.fixture
+def package_dir(tmp_path, monkeypatch):
+    package_dir = tmp_path / "test_plugin_package"
+    package_dir.mkdir()
+    (package_dir / "__init__.py").write_text("")
+    (package_dir / "first.py").write_text("class FirstPlugin:\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield package_dir
+    for name in list(sys.modules):
+        if name.startswith("test_plugin_package"):
+            del sys.modules[name]
+
+
+def make_registry(tmp_path):
+    registry = PluginRegistry(index_path=str(tmp_path / "plugin_index.json"))
+    registry.add_kind("thing", "test_plugin_package", inspect.isclass)
+    return registry
+
+
+def test_directory_is_listed_once_per_process(tmp_path, package_dir, monkeypatch):
+    n_listed = []
+    listdir = os.listdir
+    monkeypatch.setattr(plugins.os, "listdir", lambda path: n_listed.append(path) or listdir(path))
+
+    registry = make_registry(tmp_path)
+    for _ in range(3):
+        assert registry.get("thing", "FirstPlugin").__name__ == "FirstPlugin"
+    assert len(n_listed) == 1
+
+
+def test_index_is_rebuilt_in_new_process_when_files_change(tmp_path, package_dir):
+    assert make_registry(tmp_path).get("thing", "FirstPlugin").__name__ == "FirstPlugin"
+    (package_dir / "second.py").write_text("class SecondPlugin:\n    pass\n")
+
+    # files added while a process runs are only found by later processes
+    registry = make_registry(tmp_path)
+    assert registry.get("thing", "SecondPlugin").__name__ == "SecondPlugin"
+    assert set(registry.get_all("thing")) == {"FirstPlugin", "SecondPlugin"}
+    with pytest.raises(KeyError):
+        registry.get("thing", "ThirdPlugin")
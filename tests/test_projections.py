@@ -0,0 +1,44 @@
+"""Batched projections of states to end goals and subgoals of the HAC
+environments against the scalar projections which read the simulation."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mujoco_py")
+
+from hac_envs import gym_envs
+
+
+DESIGNS = {
+        "UR5Reacher": gym_envs._design_ur5,
+        "PendulumHAC": gym_envs._design_pendulum,
+        "AntFourRooms": gym_envs._design_ant_four_rooms
+        }
+
+
+@pytest.mark.parametrize("name", list(DESIGNS))
+def test_batched_projections_match_scalar(name):
+    hac_env = DESIGNS[name]()(gym_envs.Flags())
+    hac_env.headless = True
+    rng = np.random.default_rng(0)
+
+    # random simulation states, angles and velocities go beyond the 
+    # ranges at which the projections wrap or clip them
+    states, end_goals, subgoals = [], [], []
+    for _ in range(500):
+        hac_env.sim.data.qpos[:] = rng.uniform(-10., 10., len(hac_env.sim.data.qpos))
+        hac_env.sim.data.qvel[:] = rng.uniform(-20., 20., len(hac_env.sim.data.qvel))
+        state = hac_env.get_state()
+        states.append(state)
+        end_goals.append(hac_env.project_state_to_end_goal(hac_env.sim, state))
+        subgoals.append(hac_env.project_state_to_subgoal(hac_env.sim, state))
+    states = np.array(states)
+
+    # the pendulum angle is recovered from cosine and sine, so allow for rounding errors
+    np.testing.assert_allclose(hac_env.project_states_to_end_goals(states), np.array(end_goals), rtol=0., atol=1e-9)
+    np.testing.assert_allclose(hac_env.project_states_to_subgoals(states), np.array(subgoals), rtol=0., atol=1e-9)
+
+    # end goals can also be written into a given array
+    out = np.empty((len(states), hac_env.end_goal_dim))
+    assert hac_env.project_states_to_end_goals(states, out=out) is out
+    np.testing.assert_allclose(out, np.array(end_goals), rtol=0., atol=1e-9)
@@ -0,0 +1,298 @@
+"""Kill-and-resume test of the checkpoints saved by run_from_files.
+
+A short HiTS run on Drawbridge is started in a subprocess and stopped
+with SIGTERM once it has saved a checkpoint. The run is relaunched and
+killed with SIGKILL in the middle of saving its next checkpoint (after
+the replay buffer segments and the checkpoint directory have been
+written, before step.json is replaced). A third launch has to resume
+from the checkpoint committed by the first one: same step, same replay
+buffer contents and logs truncated to the recorded offsets. A last
+launch checks that training continues and commits new checkpoints.
+Launching a run again after it has finished must not touch its model,
+and SIGTERM during testing has to be acted on before testing continues.
+
+The subprocesses run this file as a script (see the bottom of the file),
+which instruments scripts.run.state_checkpoints to record the replay
+buffers of the live process, to kill it while saving or to inspect the
+state right after resuming.
+"""
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAMS_DIR = os.path.join(REPO_DIR, "data", "Drawbridge", "hits_trained")
+TIMEOUT = 300.
+
+
+def replay_buffer_arrays(graph):
+    """Return dict mapping "<node id>/<key>" to the transitions in the buffer (oldest first)."""
+
+    from scripts.run.replay_snapshots import get_replay_buffers
+
+    arrays = {}
+    for node_id, buffer in get_replay_buffers(graph).items():
+        n = len(buffer)
+        positions = np.arange(buffer._index - n, buffer._index) % buffer._maxsize
+        for key, value in buffer._meta.__dict__.items():
+            if isinstance(value, np.ndarray):
+                arrays[f"{node_id}/{key}"] = value[positions]
+        arrays[f"{node_id}/n_added"] = np.array(buffer._n_added)
+    return arrays
+
+
+def write_run_dir(run_dir, n_steps=10**7, state_save_frequency=1):
+    """Drawbridge HiTS run which saves a checkpoint after every training episode.
+
+    Gradient steps are skipped and the networks are small so that
+    episodes are fast. The replay buffers are small enough to wrap
+    around within a few episodes."""
+
+    os.makedirs(run_dir)
+    shutil.copy(os.path.join(PARAMS_DIR, "varied_hp.json"), run_dir)
+    with open(os.path.join(PARAMS_DIR, "run_params.json")) as f:
+        run_params = json.load(f)
+    run_params.pop("model_save_frequency")
+    run_params.update(n_steps=n_steps, state_save_frequency=state_save_frequency, seed=1)
+    with open(os.path.join(run_dir, "run_params.json"), "w") as f:
+        json.dump(run_params, f, indent = 4)
+    with open(os.path.join(PARAMS_DIR, "graph_params.json")) as f:
+        graph_params = json.load(f)
+    for level_params in graph_params["level_params_list"]:
+        level_params["algo_kwargs"].update(learning_starts=10**9, batch_size=16, buffer_size=5000)
+        level_params["model_kwargs"]["hidden_layers"] = [8]
+    with open(os.path.join(run_dir, "graph_params.json"), "w") as f:
+        json.dump(graph_params, f, indent = 4)
+
+
+def launch(mode, run_dir, output_path):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with open(output_path, "w") as output:
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), mode, run_dir],
+                cwd=REPO_DIR, env=env, stdout=output, stderr=subprocess.STDOUT)
+
+
+def read_output(output_path):
+    with open(output_path) as f:
+        return f.read()
+
+
+def wait_for(condition, process, output_path):
+    t_start = time.monotonic()
+    while not condition():
+        assert process.poll() is None, f"Run exited early:\n{read_output(output_path)}"
+        assert time.monotonic() - t_start < TIMEOUT, f"Timed out:\n{read_output(output_path)}"
+        time.sleep(0.1)
+
+
+def wait_for_exit(process, output_path):
+    try:
+        return process.wait(TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        pytest.fail(f"Run did not exit:\n{read_output(output_path)}")
+
+
+def read_manifest(run_dir):
+    with open(os.path.join(run_dir, "state", "step.json")) as f:
+        return json.load(f)
+
+
+def checkpoint_dirs(run_dir):
+    return sorted(name for name in os.listdir(os.path.join(run_dir, "state")) if name.startswith("checkpoint_"))
+
+
+def test_kill_and_resume(tmp_path):
+    for module in ("torch", "tianshou", "graph_rl", "dyn_rl_benchmarks"):
+        pytest.importorskip(module)
+
+    run_dir = str(tmp_path / "run")
+    dump_dir = os.path.join(run_dir, "dumps")
+    write_run_dir(run_dir)
+    manifest_path = os.path.join(run_dir, "state", "step.json")
+
+    # first launch is preempted with SIGTERM after its first checkpoint and
+    # saves another one before stopping
+    output_path = str(tmp_path / "first.txt")
+    process = launch("record", run_dir, output_path)
+    wait_for(lambda: os.path.isfile(manifest_path), process, output_path)
+    process.send_signal(signal.SIGTERM)
+    assert wait_for_exit(process, output_path) == 0, read_output(output_path)
+    assert "Stopping run after saving state." in read_output(output_path)
+    manifest = read_manifest(run_dir)
+    step = manifest["step"]
+    assert step > 0
+    assert checkpoint_dirs(run_dir) == [manifest["checkpoint"]]
+    saved_buffers = dict(np.load(os.path.join(dump_dir, f"buffers_{step}.npz")))
+    saved_logs = {}
+    for name in manifest["logs"]:
+        with open(os.path.join(run_dir, "log", name), "rb") as f:
+            saved_logs[name] = f.read()
+
+    # second launch resumes and is killed while saving its first checkpoint
+    output_path = str(tmp_path / "second.txt")
+    process = launch("kill_while_saving", run_dir, output_path)
+    assert wait_for_exit(process, output_path) == -signal.SIGKILL, read_output(output_path)
+    output = read_output(output_path)
+    assert f"Current step:  {step}" in output
+    assert "Saving checkpoint" in output
+    assert read_manifest(run_dir) == manifest
+    # the incomplete checkpoint and the logs written after resuming are left behind
+    assert len(checkpoint_dirs(run_dir)) == 2
+    assert any(os.path.getsize(os.path.join(run_dir, "log", name)) > offset["offset"]
+            for name, offset in manifest["logs"].items())
+
+    # third launch has to restore the state committed by the first one
+    output_path = str(tmp_path / "third.txt")
+    process = launch("inspect", run_dir, output_path)
+    assert wait_for_exit(process, output_path) == 0, read_output(output_path)
+    with open(os.path.join(dump_dir, "resumed.json")) as f:
+        resumed = json.load(f)
+    assert resumed["step"] == step
+    resumed_buffers = dict(np.load(os.path.join(dump_dir, "resumed_buffers.npz")))
+    assert resumed_buffers.keys() == saved_buffers.keys()
+    for key, value in saved_buffers.items():
+        np.testing.assert_array_equal(resumed_buffers[key], value, err_msg=key)
+    assert sorted(resumed["logs"]) == sorted(manifest["logs"])
+    for name, offset in manifest["logs"].items():
+        with open(os.path.join(run_dir, "log", name), "rb") as f:
+            log = f.read()
+        assert len(log) == offset["offset"]
+        assert log == saved_logs[name][:offset["offset"]]
+        assert log.count(b"\n") == offset["rows"]
+
+    # fourth launch continues training and commits new checkpoints
+    output_path = str(tmp_path / "fourth.txt")
+    process = launch("record", run_dir, output_path)
+    wait_for(lambda: read_manifest(run_dir)["step"] > step, process, output_path)
+    process.send_signal(signal.SIGTERM)
+    assert wait_for_exit(process, output_path) == 0, read_output(output_path)
+    new_manifest = read_manifest(run_dir)
+    assert new_manifest["step"] > step
+    assert checkpoint_dirs(run_dir) == [new_manifest["checkpoint"]]
+    new_buffers = np.load(os.path.join(dump_dir, f"buffers_{new_manifest['step']}.npz"))
+    for node_id in new_manifest["replay_buffers"]:
+        assert new_buffers[f"{node_id}/n_added"] > saved_buffers[f"{node_id}/n_added"]
+
+
+def test_finished_run_is_not_restarted(tmp_path):
+    for module in ("torch", "tianshou", "graph_rl", "dyn_rl_benchmarks"):
+        pytest.importorskip(module)
+    from scripts.run.multi_run import get_run_status
+
+    run_dir = str(tmp_path / "run")
+    write_run_dir(run_dir, n_steps=300)
+    params_path = os.path.join(run_dir, "model", "params.pt")
+
+    # run until n_steps is reached, only the final step is kept
+    output_path = str(tmp_path / "first.txt")
+    process = launch("record", run_dir, output_path)
+    assert wait_for_exit(process, output_path) == 0, read_output(output_path)
+    manifest = read_manifest(run_dir)
+    step = manifest["step"]
+    assert manifest == {"step": step, "finished": True}
+    assert os.listdir(os.path.join(run_dir, "state")) == ["step.json"]
+    assert get_run_status(run_dir) == ("finished", step)
+    with open(params_path, "rb") as f:
+        params = f.read()
+
+    # launching the finished run again must leave its trained model alone, 
+    # also for manifests written before runs were marked as finished
+    for i, manifest in enumerate([manifest, {"step": step}]):
+        with open(os.path.join(run_dir, "state", "step.json"), "w") as f:
+            json.dump(manifest, f)
+        output_path = str(tmp_path / f"relaunch_{i}.txt")
+        process = launch("record", run_dir, output_path)
+        assert wait_for_exit(process, output_path) == 0, read_output(output_path)
+        output = read_output(output_path)
+        assert f"Run has already finished at step {step}." in output
+        assert "Current step:" not in output
+        assert read_manifest(run_dir) == manifest
+        with open(params_path, "rb") as f:
+            assert f.read() == params
+
+
+def test_sigterm_while_testing(tmp_path):
+    for module in ("torch", "tianshou", "graph_rl", "dyn_rl_benchmarks"):
+        pytest.importorskip(module)
+
+    run_dir = str(tmp_path / "run")
+    write_run_dir(run_dir, state_save_frequency=None)
+
+    # SIGTERM arrives during the first test phase, the checkpoint has to 
+    # be saved before testing continues
+    output_path = str(tmp_path / "output.txt")
+    process = launch("term_while_testing", run_dir, output_path)
+    assert wait_for_exit(process, output_path) == 0, read_output(output_path)
+    assert "Stopping run after saving state." in read_output(output_path)
+    with open(os.path.join(run_dir, "dumps", "signal.json")) as f:
+        step = json.load(f)["step"]
+    manifest = read_manifest(run_dir)
+    assert manifest["step"] == step
+    # no test results and no further training episodes have been logged
+    assert manifest["logs"]["session_test.csv"]["rows"] == 2
+    with open(os.path.join(run_dir, "log", "session_train.csv")) as f:
+        lengths = [float(line.split(",")[1]) for line in f.readlines()[2:]]
+    assert sum(lengths) == step
+
+
+def main(mode, run_dir):
+    """Run in run_dir with instrumented checkpoints (executed in a subprocess)."""
+
+    from scripts.run import run_from_files, state_checkpoints
+
+    dump_dir = os.path.join(run_dir, "dumps")
+    os.makedirs(dump_dir, exist_ok = True)
+
+    if mode == "record":
+        # keep the replay buffers of the live process of every checkpoint
+        save_checkpoint = state_checkpoints.save_checkpoint
+
+        def recording_save_checkpoint(dir_path, graph, step):
+            save_checkpoint(dir_path, graph, step)
+            np.savez(os.path.join(dump_dir, f"buffers_{step}.npz"), **replay_buffer_arrays(graph))
+        state_checkpoints.save_checkpoint = recording_save_checkpoint
+
+    elif mode == "kill_while_saving":
+        # die right before the checkpoint would be committed
+        def killing_write_manifest(state_dir, manifest):
+            sys.stdout.flush()
+            os.kill(os.getpid(), signal.SIGKILL)
+        state_checkpoints.write_manifest = killing_write_manifest
+
+    elif mode == "term_while_testing":
+        # send SIGTERM at the first step of testing
+        import graph_rl
+        step_env_and_graph = graph_rl.Session.step_env_and_graph
+
+        def terminating_step_env_and_graph(self, env_info, sess_info, *args, **kwargs):
+            if sess_info.testing and not os.path.isfile(os.path.join(dump_dir, "signal.json")):
+                with open(os.path.join(dump_dir, "signal.json"), "w") as f:
+                    json.dump({"step": sess_info.total_step}, f)
+                os.kill(os.getpid(), signal.SIGTERM)
+            return step_env_and_graph(self, env_info, sess_info, *args, **kwargs)
+        graph_rl.Session.step_env_and_graph = terminating_step_env_and_graph
+
+    elif mode == "inspect":
+        # record the resumed state instead of training
+        def inspecting_run_session(dir_path, graph, env, run_params, total_step_init=0, **kwargs):
+            np.savez(os.path.join(dump_dir, "resumed_buffers.npz"), **replay_buffer_arrays(graph))
+            with open(os.path.join(dump_dir, "resumed.json"), "w") as f:
+                json.dump({"step": total_step_init, "logs": sorted(os.listdir(os.path.join(dir_path, "log")))}, f)
+            sys.exit(0)
+        run_from_files.run_session = inspecting_run_session
+
+    run_from_files.run(run_dir)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])